@@ -0,0 +1,142 @@
+import heapq
+import math
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# 判定为疑似机器人的特征阈值
+# 发言间隔的变异系数（标准差/均值）低于该值视为“发言节奏过于规律”，人类发言通常是突发的（>1）
+_INTERVAL_CV = 0.5
+# 在其他黑名单机器人发言后平均多少秒内回复视为“秒回”
+_LATENCY_MEAN = 3.0
+# 消息平均长度超过该值视为“长篇回复”
+_LONG_MESSAGE = 80.0
+# 消息长度的变异系数低于该值视为“长度过于一致”
+_LENGTH_CV = 0.3
+# 计算“秒回”特征所需的最少样本数
+_MIN_LATENCY_SAMPLES = 5
+# 达到该分数才列为候选
+_CANDIDATE_SCORE = 2
+
+
+class RunningStats:
+    """Welford 在线算法：常数内存维护样本数、均值与方差"""
+
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def cv(self) -> float:
+        """变异系数；均值为 0 时返回无穷大"""
+        return self.std / self.mean if self.mean > 0 else float("inf")
+
+
+class SenderProfile:
+    """某个发送者在某个群中的发言统计"""
+
+    __slots__ = ("sender_name", "last_time", "interval", "latency", "length")
+
+    def __init__(self, sender_name: str):
+        self.sender_name = sender_name
+        self.last_time = 0.0
+        self.interval = RunningStats()
+        self.latency = RunningStats()
+        self.length = RunningStats()
+
+    @property
+    def messages(self) -> int:
+        return self.length.n
+
+    def score(self) -> Tuple[int, List[str]]:
+        """按各项特征打分，返回 (分数, 命中的特征说明)"""
+        reasons: List[str] = []
+        if self.interval.n >= 2 and self.interval.cv < _INTERVAL_CV:
+            reasons.append(f"发言间隔规律（均值 {self.interval.mean:.1f}s，变异系数 {self.interval.cv:.2f}）")
+        if self.latency.n >= _MIN_LATENCY_SAMPLES and self.latency.mean < _LATENCY_MEAN:
+            reasons.append(f"其他机器人发言后平均 {self.latency.mean:.1f}s 回复（{self.latency.n} 次）")
+        if self.length.mean > _LONG_MESSAGE:
+            reasons.append(f"消息平均长度 {self.length.mean:.0f} 字")
+        elif self.length.n >= 2 and self.length.cv < _LENGTH_CV:
+            reasons.append(f"消息长度过于一致（均值 {self.length.mean:.0f} 字，变异系数 {self.length.cv:.2f}）")
+        return len(reasons), reasons
+
+
+class BehaviorDetector:
+    """根据发言行为被动识别疑似机器人
+
+    在消息路径上按 (群, 发送者) 维护发言间隔、在黑名单机器人发言后的回复延迟
+    以及消息长度三项在线统计，每项只占常数内存；统计对象数量超过 max_senders 时
+    按最近最少使用淘汰。查询候选时才计算分数。
+    """
+
+    def __init__(self, max_senders: int = 4096, min_messages: int = 20, latency_window: float = 10.0):
+        self.max_senders = max(1, int(max_senders))
+        self.min_messages = max(2, int(min_messages))
+        self.latency_window = max(0.1, float(latency_window))
+        self._profiles: "OrderedDict[Tuple[str, str], SenderProfile]" = OrderedDict()
+        # 群号 -> (黑名单机器人最后发言时间, 发言者)；与统计对象共用容量上限
+        self._last_listed: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def observe(self, group_id: str, sender_id: str, sender_name: str, length: int,
+                listed: bool, now: Optional[float] = None):
+        """记录一条群消息；listed 表示发送者已在用户黑名单中"""
+        if now is None:
+            now = time.monotonic()
+        key = (group_id, sender_id)
+        profile = self._profiles.get(key)
+        if profile is None:
+            profile = SenderProfile(sender_name)
+            self._profiles[key] = profile
+            if len(self._profiles) > self.max_senders:
+                self._profiles.popitem(last=False)
+        else:
+            self._profiles.move_to_end(key)
+            profile.sender_name = sender_name
+            profile.interval.add(now - profile.last_time)
+        profile.last_time = now
+        profile.length.add(length)
+
+        last = self._last_listed.get(group_id)
+        if last is not None and last[1] != sender_id and now - last[0] <= self.latency_window:
+            profile.latency.add(now - last[0])
+        if listed:
+            self._last_listed[group_id] = (now, sender_id)
+            self._last_listed.move_to_end(group_id)
+            if len(self._last_listed) > self.max_senders:
+                self._last_listed.popitem(last=False)
+
+    def candidates(self, group_id: Optional[str] = None, exclude: frozenset = frozenset(),
+                   limit: int = 20) -> List[Tuple[int, str, str, SenderProfile, List[str]]]:
+        """返回疑似机器人候选 [(分数, 群号, 发送者, 统计, 特征说明)]，按分数从高到低"""
+        found = []
+        for (gid, sender_id), profile in self._profiles.items():
+            if group_id and gid != group_id:
+                continue
+            if sender_id in exclude or profile.messages < self.min_messages:
+                continue
+            score, reasons = profile.score()
+            if score >= _CANDIDATE_SCORE:
+                found.append((score, profile.messages, gid, sender_id, profile, reasons))
+        top = heapq.nlargest(max(1, limit), found, key=lambda item: (item[0], item[1]))
+        return [(score, gid, sender_id, profile, reasons) for score, _, gid, sender_id, profile, reasons in top]
+
+    def __len__(self) -> int:
+        return len(self._profiles)
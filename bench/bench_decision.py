@@ -0,0 +1,128 @@
+"""弱黑名单决策路径基准测试
+
+用合成流量驱动 check_weak_blacklist 与 intercept_llm_request，
+报告不同黑名单规模、命中率与群数量下的吞吐、p50/p99 延迟与峰值内存。
+
+用法（在插件目录下执行）：
+    python bench/bench_decision.py
+    python bench/bench_decision.py --sizes 10,100000 --hit-ratios 0,0.5 --groups 1,100 --messages 50000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeEvent, make_plugin  # noqa: E402
+
+
+def build_config(blacklist_size: int) -> Dict:
+    return {
+        "command_identifier": "bench",
+        "log_blocked_messages": False,
+        "user_settings": {
+            "enable": True,
+            "reply_probability": 0.3,
+            "max_interception_count": 5,
+            "blacklisted_users": [str(1_000_000 + i) for i in range(blacklist_size)],
+        },
+        "group_settings": {"enable": True, "blacklisted_groups": []},
+    }
+
+
+def build_traffic(blacklist_size: int, hit_ratio: float, groups: int, messages: int,
+                  seed: int) -> List[Tuple[str, str]]:
+    rng = random.Random(seed)
+    traffic = []
+    for _ in range(messages):
+        if rng.random() < hit_ratio:
+            sender = str(1_000_000 + rng.randrange(blacklist_size))
+        else:
+            sender = str(5_000_000 + rng.randrange(10 * blacklist_size + 1000))
+        traffic.append((sender, str(900_000 + rng.randrange(groups))))
+    return traffic
+
+
+async def drive(plugin, traffic: List[Tuple[str, str]], latencies: List[int] = None):
+    perf = time.perf_counter_ns
+    for sender, group in traffic:
+        event = FakeEvent(sender, group, "hello from bench")
+        start = perf()
+        await plugin.check_weak_blacklist(event)
+        await plugin.intercept_llm_request(event, None)
+        if latencies is not None:
+            latencies.append(perf() - start)
+
+
+def percentile(sorted_values: List[int], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[idx] / 1000.0
+
+
+async def run_case(size: int, hit_ratio: float, groups: int, messages: int, seed: int,
+                   measure_memory: bool) -> Dict[str, float]:
+    traffic = build_traffic(size, hit_ratio, groups, messages, seed)
+
+    plugin = make_plugin(build_config(size))
+    latencies: List[int] = []
+    wall_start = time.perf_counter()
+    await drive(plugin, traffic, latencies)
+    wall = time.perf_counter() - wall_start
+    await plugin.terminate()
+
+    peak_kb = 0.0
+    if measure_memory:
+        # 内存单独测一轮，避免 tracemalloc 的开销影响延迟数据
+        tracemalloc.start()
+        plugin = make_plugin(build_config(size))
+        await drive(plugin, traffic)
+        peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+        await plugin.terminate()
+
+    latencies.sort()
+    return {
+        "throughput": messages / wall if wall else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+        "peak_kb": peak_kb,
+    }
+
+
+def parse_list(value: str, cast):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+async def main_async(args):
+    print(f"{'黑名单':>8} {'命中率':>6} {'群数':>6} {'吞吐(条/s)':>12} {'p50(µs)':>9} {'p99(µs)':>9} {'峰值内存(KB)':>12}")
+    for size in args.sizes:
+        for hit_ratio in args.hit_ratios:
+            for groups in args.groups:
+                r = await run_case(size, hit_ratio, groups, args.messages, args.seed, not args.no_memory)
+                print(f"{size:>8} {hit_ratio:>6.2f} {groups:>6} {r['throughput']:>12.0f} "
+                      f"{r['p50']:>9.1f} {r['p99']:>9.1f} {r['peak_kb']:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="弱黑名单决策路径基准测试")
+    parser.add_argument("--sizes", type=lambda v: parse_list(v, int), default=[10, 1000, 100000],
+                        help="黑名单规模，逗号分隔")
+    parser.add_argument("--hit-ratios", type=lambda v: parse_list(v, float), default=[0.0, 0.1, 0.5],
+                        help="黑名单消息占比，逗号分隔")
+    parser.add_argument("--groups", type=lambda v: parse_list(v, int), default=[1, 50],
+                        help="群数量，逗号分隔")
+    parser.add_argument("--messages", type=int, default=20000, help="每组场景的消息数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="跳过峰值内存测量")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
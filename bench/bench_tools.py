@@ -0,0 +1,140 @@
+"""LLM 工具路径基准测试：scan_group_bots / scan_multiple_groups / batch_add_to_blacklist
+
+使用 bench/fakes.py 中的平台适配器替身生成 500-5000 人的合成成员列表，
+模拟 call_action("get_group_member_list") 与 event.get_group 的网络延迟；
+配置替身统计 save_config 调用并写入临时文件。对每种群规模报告：
+耗时、适配器调用次数、文件写入次数与配置保存次数。
+
+用法（在插件目录下执行）：
+    python bench/bench_tools.py
+    python bench/bench_tools.py --sizes 500,5000 --latency 0.2 --groups 20 --backend sqlite
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeAdapter, FakeEvent, make_plugin  # noqa: E402
+
+_GROUP_BASE = 700_000
+
+
+class FileWriteCounter:
+    """通过审计钩子统计以写入方式打开的文件与原子替换次数（所有线程）"""
+
+    def __init__(self):
+        self.opens = 0
+        self.replaces = 0
+        sys.addaudithook(self._hook)
+
+    def _hook(self, event: str, args: tuple):
+        if event == "open" and len(args) > 1 and isinstance(args[1], str) and set(args[1]) & set("wax+"):
+            self.opens += 1
+        elif event in ("os.replace", "os.rename"):
+            self.replaces += 1
+
+    def snapshot(self) -> tuple:
+        return self.opens, self.replaces
+
+
+def build_config(backend: str) -> Dict:
+    return {
+        "command_identifier": "bench",
+        "log_blocked_messages": False,
+        "bot_scan_concurrency": 5,
+        "user_settings": {"enable": True, "blacklisted_users": []},
+        "group_settings": {"enable": True, "blacklisted_groups": []},
+        "persistence_settings": {"storage_backend": backend},
+    }
+
+
+async def measure(name: str, size: int, adapter: FakeAdapter, plugin, writes: FileWriteCounter, coro) -> Dict:
+    calls_before = sum(adapter.calls.values())
+    saves_before = plugin.config.save_count
+    opens_before, replaces_before = writes.snapshot()
+    start = time.perf_counter()
+    result = await coro
+    wall = time.perf_counter() - start
+    # 持久化在写入线程中异步完成，等待落盘后再统计写入次数
+    await plugin._writer.drain()
+    opens, replaces = writes.snapshot()
+    return {
+        "name": name,
+        "size": size,
+        "wall_ms": wall * 1000,
+        "calls": sum(adapter.calls.values()) - calls_before,
+        "file_writes": opens - opens_before,
+        "replaces": replaces - replaces_before,
+        "saves": plugin.config.save_count - saves_before,
+        "result": result,
+    }
+
+
+def suspects_from_report(report: str) -> List[str]:
+    """从扫描结果中提取尚未拉黑的QQ号，模拟 LLM 随后调用 batch_add_to_blacklist"""
+    ids = []
+    for line in report.splitlines():
+        if line.startswith("- QQ:") and "未拉黑" in line:
+            ids.append(line[5:].split(" ", 1)[0])
+    return ids
+
+
+async def run_size(size: int, args, writes: FileWriteCounter) -> List[Dict]:
+    group_ids = [str(_GROUP_BASE + i) for i in range(args.groups)]
+    adapter = FakeAdapter({gid: size for gid in group_ids}, latency=args.latency,
+                          bot_ratio=args.bot_ratio, seed=args.seed)
+    with tempfile.TemporaryDirectory(prefix="rrbot-bench-tools-") as tmp:
+        plugin = make_plugin(build_config(args.backend), data_dir=Path(tmp),
+                             config_path=Path(tmp) / "config.json")
+        event = FakeEvent("10001", group_ids[0], "扫描一下群里的机器人", bot=adapter)
+        rows = []
+        rows.append(await measure("scan（首次）", size, adapter, plugin, writes,
+                                  plugin.scan_group_bots(event)))
+        rows.append(await measure("scan（缓存）", size, adapter, plugin, writes,
+                                  plugin.scan_group_bots(event)))
+        suspects = suspects_from_report(rows[0]["result"])
+        rows.append(await measure(f"batch_add×{len(suspects)}", size, adapter, plugin, writes,
+                                  plugin.batch_add_to_blacklist(event, ",".join(suspects))))
+        rows.append(await measure(f"scan_multiple×{args.groups}", size, adapter, plugin, writes,
+                                  plugin.scan_multiple_groups(event, "all")))
+        all_suspects = suspects_from_report(rows[-1]["result"])
+        rows.append(await measure(f"batch_add×{len(all_suspects)}", size, adapter, plugin, writes,
+                                  plugin.batch_add_to_blacklist(event, ",".join(all_suspects) or "0")))
+        await plugin.terminate()
+    return rows
+
+
+def parse_list(value: str, cast):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+async def main_async(args):
+    writes = FileWriteCounter()
+    print(f"后端 {args.backend}，接口延迟 {args.latency * 1000:.0f} ms，多群扫描 {args.groups} 个群")
+    print(f"{'场景':<18} {'成员数':>6} {'耗时(ms)':>10} {'接口调用':>8} {'写文件':>6} {'原子替换':>8} {'配置保存':>8}")
+    for size in args.sizes:
+        for r in await run_size(size, args, writes):
+            print(f"{r['name']:<18} {r['size']:>6} {r['wall_ms']:>10.1f} {r['calls']:>8} "
+                  f"{r['file_writes']:>6} {r['replaces']:>8} {r['saves']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 工具路径基准测试")
+    parser.add_argument("--sizes", type=lambda v: parse_list(v, int), default=[500, 1000, 2000, 5000],
+                        help="每个群的成员数，逗号分隔")
+    parser.add_argument("--groups", type=int, default=10, help="多群扫描的群数量")
+    parser.add_argument("--latency", type=float, default=0.05, help="每次适配器调用的模拟延迟（秒）")
+    parser.add_argument("--bot-ratio", type=float, default=0.02, help="名字带关键字的成员比例")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json", help="持久化后端")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
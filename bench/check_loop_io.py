@@ -0,0 +1,129 @@
+"""检查命令与工具调用期间事件循环线程上是否发生阻塞的文件 I/O
+
+用法：
+    python bench/check_loop_io.py
+
+分别以 JSON 与 SQLite 后端加载插件，执行 add/remove/policy/trace/audit/export/import/profile 等
+/rrbot 子命令以及黑名单相关的工具调用。通过审计钩子（sys.addaudithook）记录事件循环
+线程上的 open、os.replace、os.remove 等文件操作，并检查 SQLite 后端的写入是否
+都发生在写入线程中。发现阻塞 I/O 时列出调用位置并以非零状态退出。
+"""
+import asyncio
+import sys
+import tempfile
+import threading
+import traceback
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fakes import FakeEvent, make_plugin  # noqa: E402
+
+# 需要检查的审计事件：打开文件以及会修改文件系统的操作
+_FILE_EVENTS = {"open", "os.replace", "os.rename", "os.remove", "os.mkdir", "shutil.copyfile", "sqlite3.connect"}
+# 导入模块时读取源码与字节码不计入
+_IGNORED_SUFFIXES = (".py", ".pyc", ".so")
+
+
+class LoopIOMonitor:
+    """记录指定线程上发生的文件操作"""
+
+    def __init__(self):
+        self.thread_id: Optional[int] = None
+        self.violations: List[str] = []
+        sys.addaudithook(self._hook)
+
+    def _hook(self, event: str, args: tuple):
+        if self.thread_id is None or threading.get_ident() != self.thread_id or event not in _FILE_EVENTS:
+            return
+        target = str(args[0]) if args else ""
+        if target.endswith(_IGNORED_SUFFIXES):
+            return
+        self.record(f"{event} {target}")
+
+    def record(self, what: str):
+        stack = "".join(traceback.format_stack(limit=8)[:-2])
+        self.violations.append(f"{what}\n{stack}")
+
+
+def guard_storage(plugin, monitor: LoopIOMonitor):
+    """SQLite 写入不触发审计事件，直接检查调用线程"""
+    storage = plugin._storage
+    if storage is None:
+        return
+    for name in ("add_member", "add_members", "remove_member", "apply_counter_changes", "close"):
+        original = getattr(storage, name)
+
+        def guarded(*args, _original=original, _name=name, **kwargs):
+            if threading.get_ident() == monitor.thread_id:
+                monitor.record(f"SqliteStorage.{_name}")
+            return _original(*args, **kwargs)
+
+        setattr(storage, name, guarded)
+
+
+async def run_commands(plugin, monitor: LoopIOMonitor):
+    async def command(text: str):
+        return [r async for r in plugin._cmd_rrbot(FakeEvent("9", "g1", text))]
+
+    monitor.thread_id = threading.get_ident()
+    try:
+        await command("rrbot chk profile start 0")
+        for text in (
+            "rrbot chk add 10001",
+            "rrbot chk add group 20001",
+            "rrbot chk add 10002,10003",
+            "rrbot chk remove 10002",
+            "rrbot chk remove group 20001",
+            "rrbot chk policy set user:10001 0.5 3",
+            "rrbot chk policy del user:10001",
+            "rrbot chk list",
+            "rrbot chk audit",
+            "rrbot chk stats",
+            "rrbot chk trace dump",
+            "rrbot chk export",
+            "rrbot chk export user users.txt",
+            "rrbot chk import group users.txt",
+        ):
+            await command(text)
+        await plugin.batch_add_to_blacklist(FakeEvent("9", "g1"), "30001,30002,30003")
+        await plugin.export_blacklist(FakeEvent("9", "g1"), "all", "all.csv")
+        await plugin.import_blacklist(FakeEvent("9", "g1"), "all.csv")
+        for i in range(200):
+            await plugin.check_weak_blacklist(FakeEvent("10001", "g1", f"消息 {i}"))
+        await command("rrbot chk profile stop")
+        await plugin._counter_writer.flush()
+        await plugin.terminate()
+    finally:
+        monitor.thread_id = None
+
+
+def main() -> int:
+    monitor = LoopIOMonitor()
+    failed = False
+    for backend in ("json", "sqlite"):
+        config = {
+            "command_identifier": "chk",
+            "log_blocked_messages": False,
+            "user_settings": {"enable": True},
+            "group_settings": {"enable": True},
+            "persistence_settings": {"storage_backend": backend, "flush_threshold": 10},
+        }
+        with tempfile.TemporaryDirectory(prefix="rrbot-loopio-") as tmp:
+            plugin = make_plugin(config, data_dir=Path(tmp), config_path=Path(tmp) / "config.json")
+            guard_storage(plugin, monitor)
+            monitor.violations.clear()
+            asyncio.run(run_commands(plugin, monitor))
+            if monitor.violations:
+                failed = True
+                print(f"[{backend}] 事件循环线程上发生了 {len(monitor.violations)} 次阻塞 I/O：")
+                for violation in monitor.violations:
+                    print(violation)
+            else:
+                print(f"[{backend}] 未发现事件循环线程上的文件 I/O（配置保存 {plugin.config.save_count} 次）")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
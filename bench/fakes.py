@@ -0,0 +1,242 @@
+"""基准测试使用的 AstrBot 替身
+
+提供最小化的 ``astrbot.api`` 模块、消息事件与插件配置，使插件可以脱离
+AstrBot 与 QQ 适配器单独加载，用于测量插件自身的开销。
+"""
+import asyncio
+import importlib
+import json
+import logging
+import random
+import sys
+import tempfile
+import types
+from pathlib import Path
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+PLUGIN_PACKAGE = "astrbot_plugin_random_reply"
+
+logger = logging.getLogger("rrbot.bench")
+
+
+class _Filter:
+    """filter 装饰器替身：原样返回被装饰的函数"""
+
+    class EventMessageType:
+        ALL = "all"
+
+    @staticmethod
+    def _passthrough(*args, **kwargs):
+        return lambda func: func
+
+    event_message_type = _passthrough
+    on_llm_request = _passthrough
+    command = _passthrough
+
+
+class FakeStar:
+    def __init__(self, context: Any = None):
+        self.context = context
+
+
+class FakeStarTools:
+    data_dir: Optional[Path] = None
+
+    @classmethod
+    def get_data_dir(cls, name: str) -> Path:
+        if cls.data_dir is None:
+            cls.data_dir = Path(tempfile.mkdtemp(prefix="rrbot-bench-"))
+        cls.data_dir.mkdir(parents=True, exist_ok=True)
+        return cls.data_dir
+
+
+class FakeConfig(dict):
+    """AstrBotConfig 替身：统计 save_config 调用次数，可选写入临时文件"""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, path: Optional[Path] = None):
+        super().__init__(data or {})
+        self.path = path
+        self.save_count = 0
+
+    def save_config(self):
+        self.save_count += 1
+        if self.path is not None:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self, f, ensure_ascii=False)
+
+
+class FakeReply:
+    """消息链中的回复（引用）组件替身"""
+
+    def __init__(self, id: Any):
+        self.id = id
+
+
+class FakeEvent:
+    """AstrMessageEvent 替身，只实现插件用到的接口"""
+
+    __slots__ = ("sender_id", "group_id", "sender_name", "message_str", "message_obj",
+                 "bot", "_extras", "_result", "_stopped")
+
+    def __init__(self, sender_id: str, group_id: Optional[str], message_str: str = "",
+                 sender_name: str = "bench", message_id: Optional[str] = None,
+                 self_id: str = "10000", chain: Optional[List[Any]] = None, bot: Any = None):
+        self.sender_id = sender_id
+        self.group_id = group_id
+        self.sender_name = sender_name
+        self.message_str = message_str
+        self.message_obj = types.SimpleNamespace(
+            self_id=self_id, message_id=message_id, message=chain or [], group_id=group_id
+        )
+        self.bot = bot
+        self._extras: Dict[str, Any] = {}
+        self._result = None
+        self._stopped = False
+
+    def get_sender_id(self) -> str:
+        return self.sender_id
+
+    def get_group_id(self) -> Optional[str]:
+        return self.group_id
+
+    def get_sender_name(self) -> str:
+        return self.sender_name
+
+    def get_self_id(self) -> str:
+        return self.message_obj.self_id
+
+    def get_messages(self) -> List[Any]:
+        return self.message_obj.message
+
+    async def get_group(self, group_id: Optional[str] = None) -> Any:
+        if self.bot is None or not hasattr(self.bot, "get_group"):
+            return None
+        return await self.bot.get_group(group_id or self.group_id)
+
+    def set_extra(self, key: str, value: Any):
+        self._extras[key] = value
+
+    def get_extra(self, key: str, default: Any = None) -> Any:
+        return self._extras.get(key, default)
+
+    def plain_result(self, text: str) -> str:
+        return text
+
+    def set_result(self, result: Any):
+        self._result = result
+
+    def get_result(self) -> Any:
+        return self._result
+
+    def stop_event(self):
+        self._stopped = True
+
+    def is_stopped(self) -> bool:
+        return self._stopped
+
+
+class FakeAdapter:
+    """平台适配器替身：为每个群生成合成成员列表，模拟 call_action 与 get_group 的延迟
+
+    成员中 bot_ratio 比例的昵称或群名片带有“机器人”“Bot”等关键字。
+    calls 按接口名统计调用次数。
+    """
+
+    _BOT_NAMES = ("机器人", "Bot", "bot", "助手", "BOT")
+
+    def __init__(self, rosters: Dict[str, int], latency: float = 0.05, bot_ratio: float = 0.02, seed: int = 42):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        rng = random.Random(seed)
+        self.rosters: Dict[str, List[Dict[str, Any]]] = {}
+        base = 2_000_000
+        for group_id, size in rosters.items():
+            members = []
+            for i in range(size):
+                user_id = base + i
+                nickname, card = f"用户{user_id}", ""
+                if rng.random() < bot_ratio:
+                    name = f"{rng.choice(('小', '阿', ''))}{rng.choice(self._BOT_NAMES)}{i % 100}"
+                    if rng.random() < 0.5:
+                        card = name
+                    else:
+                        nickname = name
+                members.append({"user_id": user_id, "nickname": nickname, "card": card})
+            self.rosters[group_id] = members
+            base += size
+
+    async def call_action(self, action: str, **kwargs) -> Any:
+        self.calls[action] += 1
+        await asyncio.sleep(self.latency)
+        if action == "get_group_list":
+            return [{"group_id": int(gid), "group_name": f"群{gid}"} for gid in self.rosters]
+        if action == "get_group_member_list":
+            return [dict(m) for m in self.rosters.get(str(kwargs.get("group_id")), [])]
+        raise ValueError(f"unsupported action: {action}")
+
+    async def get_group(self, group_id: Optional[str]) -> Any:
+        self.calls["get_group"] += 1
+        await asyncio.sleep(self.latency)
+        members = self.rosters.get(str(group_id))
+        if members is None:
+            return None
+        return types.SimpleNamespace(
+            group_name=f"群{group_id}",
+            members=[types.SimpleNamespace(user_id=m["user_id"], nickname=m["nickname"]) for m in members],
+        )
+
+
+def install_astrbot_stubs():
+    """注册 astrbot.api 替身模块（仅供基准测试进程使用）"""
+    if getattr(sys.modules.get("astrbot"), "__rrbot_bench__", False):
+        return
+
+    def module(name: str) -> types.ModuleType:
+        mod = types.ModuleType(name)
+        sys.modules[name] = mod
+        return mod
+
+    astrbot = module("astrbot")
+    astrbot.__rrbot_bench__ = True
+    api = module("astrbot.api")
+    api.logger = logger
+    api.AstrBotConfig = FakeConfig
+    api.llm_tool = lambda *args, **kwargs: (lambda func: func)
+    event = module("astrbot.api.event")
+    event.filter = _Filter
+    event.AstrMessageEvent = FakeEvent
+    star = module("astrbot.api.star")
+    star.Context = object
+    star.Star = FakeStar
+    star.StarTools = FakeStarTools
+    star.register = lambda *args, **kwargs: (lambda cls: cls)
+    components = module("astrbot.api.message_components")
+    components.Reply = FakeReply
+    astrbot.api = api
+    api.event = event
+    api.star = star
+    api.message_components = components
+
+
+def load_plugin_submodule(name: str):
+    """以包的形式加载插件中的模块"""
+    install_astrbot_stubs()
+    if PLUGIN_PACKAGE not in sys.modules:
+        package = types.ModuleType(PLUGIN_PACKAGE)
+        package.__path__ = [str(PLUGIN_DIR)]
+        sys.modules[PLUGIN_PACKAGE] = package
+    return importlib.import_module(f"{PLUGIN_PACKAGE}.{name}")
+
+
+def load_plugin_module():
+    """以包的形式加载插件 main 模块"""
+    return load_plugin_submodule("main")
+
+
+def make_plugin(config: Dict[str, Any], data_dir: Optional[Path] = None, config_path: Optional[Path] = None):
+    """使用替身配置创建插件实例，每次使用独立的数据目录"""
+    main = load_plugin_module()
+    FakeStarTools.data_dir = data_dir or Path(tempfile.mkdtemp(prefix="rrbot-bench-"))
+    return main.WeakBlacklistPlugin(None, FakeConfig(config, config_path))
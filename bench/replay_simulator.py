@@ -0,0 +1,327 @@
+"""离线回放模拟器：为 reply_probability 与 max_interception_count 调参
+
+读取录制的消息日志（JSONL，每行包含 sender、group、timestamp），按与
+check_weak_blacklist 相同的判断逻辑回放：黑名单索引（blacklist_index）、
+回复策略表（policy_table，含覆盖规则）、速率缩放（rate_tracker）与 decision.decide。
+在多个随机种子与参数组合上批量模拟，输出每组参数的期望拦截率、
+最长机器人连续对话长度以及节省的 LLM 调用次数。
+
+决策参数默认取自 --config 指定的插件配置，缺省项使用插件的默认值（速率缩放默认开启，
+阈值 6 条/分钟）；--probabilities / --max-counts 给出时替换全局默认值作为调参网格，
+覆盖规则仍然生效。复读检测与回复链深度依赖消息内容，日志中没有这些信息，不参与回放。
+
+所有 (参数组合 × 种子) 作为并行的“通道”一起推进：速率只取决于时间戳，每条消息只计算一次；
+每个通道使用独立的 random.Random(种子)，安装了 numpy 时各通道的判断向量化计算，
+否则逐通道调用 decide，两种实现对同一种子给出相同结果。
+
+用法（在插件目录下执行）：
+    python bench/replay_simulator.py messages.jsonl --probabilities 0.05:0.5:0.05 --max-counts 0,3,5,8,12 --seeds 20
+    python bench/replay_simulator.py messages.jsonl --config plugin_config.json --csv > result.csv
+
+日志行示例：{"sender": "123456", "group": "987654", "timestamp": 1700000000.5}
+未通过 --config/--users/--groups 指定黑名单时，日志中的所有发送者都视为黑名单用户。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import load_plugin_submodule  # noqa: E402
+
+decision = load_plugin_submodule("decision")
+rate_tracker = load_plugin_submodule("rate_tracker")
+policy_table = load_plugin_submodule("policy_table")
+blacklist_index = load_plugin_submodule("blacklist_index")
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖
+    np = None
+
+# (目标键, 类型, 群号, 速率（未超过阈值时为 0）, 覆盖规则给出的概率, 覆盖规则给出的最大拦截次数)
+Step = Tuple[str, str, str, float, Optional[float], Optional[float]]
+# 每批预先生成的随机数个数（每个通道）
+_RANDOM_BLOCK = 1024
+
+
+class ReplaySettings:
+    """从插件配置读取的决策参数，缺省项与插件默认值一致"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.policy = policy_table.PolicyTable.build(config)
+        # 只含覆盖规则的策略表：lookup 在没有覆盖规则命中时返回 None
+        self.overrides = policy_table.PolicyTable(
+            {"user": (None, None), "group": (None, None)}, self.policy.overrides, [], ())
+        index = blacklist_index.BlacklistIndex.build(config, (), ())
+        self.users: Optional[Set[str]] = set(index.users)
+        self.groups: Set[str] = set(index.groups)
+        rate_cfg = config.get("rate_settings")
+        rate_cfg = rate_cfg if isinstance(rate_cfg, dict) else {}
+        self.rate_enabled = bool(rate_cfg.get("enable", True))
+        self.rate_threshold = float(rate_cfg.get("threshold_per_minute", 6.0))
+        self.rate_window = float(rate_cfg.get("window", 60.0))
+        self.rate_max_entries = int(rate_cfg.get("max_entries", 4096))
+
+
+def read_log(path: str) -> List[Tuple[str, str, float]]:
+    """读取 JSONL 消息日志，按时间排序"""
+    messages = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+                sender = str(entry.get("sender", entry.get("sender_id")))
+                group = str(entry.get("group", entry.get("group_id", "")) or "")
+                timestamp = float(entry.get("timestamp", entry.get("ts")))
+            except (json.JSONDecodeError, TypeError, ValueError) as e:
+                print(f"跳过第 {line_no} 行：{e}", file=sys.stderr)
+                continue
+            messages.append((sender, group, timestamp))
+    messages.sort(key=lambda m: m[2])
+    return messages
+
+
+def build_steps(messages: List[Tuple[str, str, float]], settings: ReplaySettings,
+                threshold: float) -> List[Step]:
+    """筛出黑名单消息，预先计算每条消息的速率与覆盖规则（与调参网格无关）
+
+    threshold 为每秒条数，0 表示不启用速率缩放；与插件一样只统计黑名单消息的速率。
+    """
+    tracker = rate_tracker.RateTracker(window=settings.rate_window, max_entries=settings.rate_max_entries)
+    users, groups = settings.users, settings.groups
+    steps: List[Step] = []
+    for sender, group, timestamp in messages:
+        if users is None or sender in users:
+            kind, target_id = "user", sender
+        elif group and group in groups:
+            kind, target_id = "group", group
+        else:
+            continue
+        rate = 0.0
+        if threshold > 0:
+            rate = tracker.observe(f"u:{sender}", timestamp)
+            if group:
+                rate = max(rate, tracker.observe(f"g:{group}", timestamp))
+            if rate <= threshold:
+                rate = 0.0
+        override_probability, override_max = settings.overrides.lookup(kind, sender, group or None)
+        steps.append((f"{kind}:{target_id}", kind, group, rate, override_probability, override_max))
+    return steps
+
+
+def _lane_rngs(seeds: List[int]) -> List[random.Random]:
+    return [random.Random(seed) for seed in seeds]
+
+
+def simulate_python(steps: List[Step], lane_p: Dict[str, List[float]], lane_m: Dict[str, List[float]],
+                    seeds: List[int], threshold: float) -> Tuple[List[int], List[int]]:
+    """逐通道调用 decide 模拟，返回每个通道的 (拦截次数, 最长连续回复)"""
+    lanes = len(seeds)
+    rngs = _lane_rngs(seeds)
+    counts: Dict[str, List[int]] = {}
+    runs: Dict[str, List[int]] = {}
+    suppressed = [0] * lanes
+    longest = [0] * lanes
+    decide = decision.decide
+    scale = rate_tracker.scale_probability
+    suppressed_outcome = decision.OUTCOME_SUPPRESSED
+    for target, kind, group, rate, override_p, override_m in steps:
+        c = counts.get(target)
+        if c is None:
+            c = counts[target] = [0] * lanes
+        run = runs.get(group)
+        if run is None:
+            run = runs[group] = [0] * lanes
+        kind_p, kind_m = lane_p[kind], lane_m[kind]
+        for lane in range(lanes):
+            probability = kind_p[lane] if override_p is None else override_p
+            max_count = kind_m[lane] if override_m is None else override_m
+            if rate:
+                probability = scale(probability, rate, threshold)
+            outcome, c[lane] = decide(c[lane], probability, max_count, rngs[lane].random())
+            if outcome == suppressed_outcome:
+                suppressed[lane] += 1
+                run[lane] = 0
+            else:
+                run[lane] += 1
+                if run[lane] > longest[lane]:
+                    longest[lane] = run[lane]
+    return suppressed, longest
+
+
+def simulate_numpy(steps: List[Step], lane_p: Dict[str, List[float]], lane_m: Dict[str, List[float]],
+                   seeds: List[int], threshold: float) -> Tuple[List[int], List[int]]:
+    """向量化模拟，逻辑与 decision.decide 一致；随机数与纯 Python 实现来自相同的通道随机源"""
+    lanes = len(seeds)
+    rngs = _lane_rngs(seeds)
+    p = {kind: np.asarray(values, dtype=np.float64) for kind, values in lane_p.items()}
+    limit = {kind: np.asarray(values, dtype=np.float64) for kind, values in lane_m.items()}
+    counts: Dict[str, "np.ndarray"] = {}
+    runs: Dict[str, "np.ndarray"] = {}
+    suppressed = np.zeros(lanes, dtype=np.int64)
+    longest = np.zeros(lanes, dtype=np.int64)
+    draws = None
+    for idx, (target, kind, group, rate, override_p, override_m) in enumerate(steps):
+        offset = idx % _RANDOM_BLOCK
+        if offset == 0:
+            block = min(_RANDOM_BLOCK, len(steps) - idx)
+            draws = np.array([[rng.random() for _ in range(block)] for rng in rngs], dtype=np.float64).T
+        c = counts.get(target)
+        if c is None:
+            c = np.zeros(lanes, dtype=np.int64)
+        run = runs.get(group)
+        if run is None:
+            run = np.zeros(lanes, dtype=np.int64)
+        probability = p[kind] if override_p is None else override_p
+        max_count = limit[kind] if override_m is None else override_m
+        if rate:
+            # 与 scale_probability 相同的运算顺序，保证两种实现的浮点结果一致
+            probability = probability * threshold / rate
+        allowed = (c + 1 >= max_count) | (draws[offset] <= probability)
+        counts[target] = np.where(allowed, 0, c + 1)
+        suppressed += ~allowed
+        run = np.where(allowed, run + 1, 0)
+        runs[group] = run
+        np.maximum(longest, run, out=longest)
+    return suppressed.tolist(), longest.tolist()
+
+
+def parse_grid(value: str, cast) -> List:
+    """解析 "a,b,c" 或 "start:stop:step"（含 stop）形式的参数列表"""
+    values = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" in part:
+            start, stop, step = (float(x) for x in part.split(":"))
+            n = int(round((stop - start) / step)) + 1
+            values.extend(cast(round(start + i * step, 10)) for i in range(n))
+        else:
+            values.append(cast(part))
+    return values
+
+
+def load_settings(args) -> ReplaySettings:
+    """读取插件配置并叠加命令行给出的黑名单与速率参数"""
+    config: Dict[str, Any] = {}
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    settings = ReplaySettings(config)
+    if not args.config:
+        settings.users = None
+        settings.groups = set()
+    if args.users:
+        settings.users = (settings.users or set()) | {u.strip() for u in args.users.split(",") if u.strip()}
+    if args.groups:
+        settings.groups |= {g.strip() for g in args.groups.split(",") if g.strip()}
+    if settings.users is None and settings.groups:
+        settings.users = set()
+    if args.rate_threshold is not None:
+        settings.rate_enabled = args.rate_threshold > 0
+        settings.rate_threshold = args.rate_threshold
+    if args.rate_window is not None:
+        settings.rate_window = args.rate_window
+    return settings
+
+
+def _format_param(value: Optional[float], width: int, spec: str = "") -> str:
+    return f"{'配置':>{width}}" if value is None else f"{value:>{width}{spec}}"
+
+
+def run(args, out=sys.stdout):
+    messages = read_log(args.log)
+    settings = load_settings(args)
+    threshold = settings.rate_threshold / 60.0 if settings.rate_enabled else 0.0
+    steps = build_steps(messages, settings, threshold)
+    if not steps:
+        print("日志中没有黑名单消息。", file=sys.stderr)
+        return []
+
+    # 未给出网格的参数沿用配置中的全局默认值（按用户/群分别取值），以 None 表示
+    probabilities = args.probabilities or [None]
+    max_counts = args.max_counts or [None]
+    combos = [(p, m) for p in probabilities for m in max_counts]
+    seeds = [args.seed + i for i in range(args.seeds)]
+    # 通道顺序：参数组合为主序，种子为次序
+    lane_p: Dict[str, List[float]] = {}
+    lane_m: Dict[str, List[float]] = {}
+    for kind, (default_p, default_m) in settings.policy.defaults.items():
+        lane_p[kind] = [default_p if p is None else policy_table.parse_probability(p)
+                        for p, _ in combos for _ in seeds]
+        lane_m[kind] = [default_m if m is None else policy_table.parse_max_interception_count(m)
+                        for _, m in combos for _ in seeds]
+    lane_seeds = [seed for _ in combos for seed in seeds]
+
+    started = time.perf_counter()
+    use_numpy = np is not None and not args.pure_python
+    simulate = simulate_numpy if use_numpy else simulate_python
+    suppressed, longest = simulate(steps, lane_p, lane_m, lane_seeds, threshold)
+    elapsed = time.perf_counter() - started
+
+    total = len(steps)
+    n_seeds = len(seeds)
+    rows = []
+    for idx, (p, m) in enumerate(combos):
+        lane_slice = slice(idx * n_seeds, (idx + 1) * n_seeds)
+        s = suppressed[lane_slice]
+        streak = longest[lane_slice]
+        rows.append({
+            "reply_probability": p,
+            "max_interception_count": m,
+            "suppression_rate": sum(s) / n_seeds / total,
+            "llm_calls_saved": sum(s) / n_seeds,
+            "longest_streak_mean": sum(streak) / n_seeds,
+            "longest_streak_max": max(streak),
+        })
+
+    if args.csv:
+        out.write(",".join(rows[0].keys()) + "\n")
+        for row in rows:
+            out.write(",".join("config" if v is None else f"{v:g}" if isinstance(v, float) else str(v)
+                               for v in row.values()) + "\n")
+    else:
+        rate_text = f"速率阈值 {settings.rate_threshold:g} 条/分钟" if threshold > 0 else "速率缩放关闭"
+        out.write(f"黑名单消息 {total} 条，{len(combos)} 组参数 × {n_seeds} 个种子，{rate_text}，"
+                  f"耗时 {elapsed:.2f}s（{'numpy' if use_numpy else '纯 Python'}）\n")
+        out.write(f"{'概率':>6} {'保底':>5} {'拦截率':>8} {'节省调用':>10} {'最长连续(均值)':>14} {'最长连续(最大)':>14}\n")
+        for row in rows:
+            out.write(f"{_format_param(row['reply_probability'], 6, '.2f')} "
+                      f"{_format_param(row['max_interception_count'], 5)} "
+                      f"{row['suppression_rate'] * 100:>7.1f}% {row['llm_calls_saved']:>10.1f} "
+                      f"{row['longest_streak_mean']:>14.2f} {row['longest_streak_max']:>14}\n")
+    return rows
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="弱黑名单参数离线回放模拟器")
+    parser.add_argument("log", help="JSONL 消息日志，每行包含 sender、group、timestamp")
+    parser.add_argument("--probabilities", type=lambda v: parse_grid(v, float),
+                        help="回复概率列表，如 0.1,0.3 或 0.05:0.5:0.05；省略时使用配置中的值")
+    parser.add_argument("--max-counts", type=lambda v: parse_grid(v, int),
+                        help="最大连续拦截次数列表，0 表示禁用保底；省略时使用配置中的值")
+    parser.add_argument("--seeds", type=int, default=10, help="每组参数的随机种子数")
+    parser.add_argument("--seed", type=int, default=0, help="起始种子")
+    parser.add_argument("--config", help="插件配置 JSON，从中读取黑名单、回复策略与 rate_settings")
+    parser.add_argument("--users", help="额外的黑名单用户，逗号分隔")
+    parser.add_argument("--groups", help="额外的黑名单群，逗号分隔")
+    parser.add_argument("--rate-threshold", type=float,
+                        help="速率阈值（条/分钟），覆盖 rate_settings.threshold_per_minute；0 表示不启用")
+    parser.add_argument("--rate-window", type=float, help="速率统计窗口（秒），覆盖 rate_settings.window")
+    parser.add_argument("--pure-python", action="store_true", help="即使安装了 numpy 也使用纯 Python 实现")
+    parser.add_argument("--csv", action="store_true", help="以 CSV 输出")
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
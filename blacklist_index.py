@@ -0,0 +1,63 @@
+from typing import Any, Dict, FrozenSet, Iterable, Tuple
+
+
+class BlacklistIndex:
+    """预编译的弱黑名单成员索引
+
+    由配置中的黑名单与动态维护的黑名单合并而成，构建后只读。
+    每条消息只需做两次集合成员判断，不再重复分配集合。
+    按ID排序的列表在第一次分页查询时生成，并随索引一起缓存到下次重建。
+    """
+
+    __slots__ = ("users", "groups", "users_enabled", "groups_enabled",
+                 "user_section", "group_section", "_sorted")
+
+    def __init__(self, users: FrozenSet[str], groups: FrozenSet[str],
+                 users_enabled: bool, groups_enabled: bool,
+                 user_section: Any, group_section: Any):
+        self.users = users
+        self.groups = groups
+        self.users_enabled = users_enabled
+        self.groups_enabled = groups_enabled
+        # 构建时引用的原始配置节，用于识别 dashboard 替换了配置对象
+        self.user_section = user_section
+        self.group_section = group_section
+        self._sorted: Dict[str, Tuple[str, ...]] = {}
+
+    @classmethod
+    def build(cls, config: Dict[str, Any],
+              managed_users: Iterable[str], managed_groups: Iterable[str]) -> "BlacklistIndex":
+        """从配置与动态黑名单编译索引"""
+        user_section = config.get("user_settings")
+        group_section = config.get("group_settings")
+        user_cfg = user_section if isinstance(user_section, dict) else {}
+        group_cfg = group_section if isinstance(group_section, dict) else {}
+
+        users_enabled = bool(user_cfg.get("enable", True))
+        groups_enabled = bool(group_cfg.get("enable", True))
+
+        users: FrozenSet[str] = frozenset()
+        if users_enabled:
+            users = frozenset(str(uid) for uid in user_cfg.get("blacklisted_users", [])) | frozenset(managed_users)
+
+        groups: FrozenSet[str] = frozenset()
+        if groups_enabled:
+            groups = frozenset(str(gid) for gid in group_cfg.get("blacklisted_groups", [])) | frozenset(managed_groups)
+
+        return cls(users, groups, users_enabled, groups_enabled, user_section, group_section)
+
+    def members(self, kind: str) -> FrozenSet[str]:
+        return self.groups if kind == "group" else self.users
+
+    def sorted_ids(self, kind: str) -> Tuple[str, ...]:
+        """按ID排序的成员列表，每个索引只排序一次"""
+        ids = self._sorted.get(kind)
+        if ids is None:
+            ids = tuple(sorted(self.members(kind)))
+            self._sorted[kind] = ids
+        return ids
+
+    def is_stale(self, config: Dict[str, Any]) -> bool:
+        """配置节对象被整体替换（如后台重载配置）时视为过期"""
+        return (config.get("user_settings") is not self.user_section
+                or config.get("group_settings") is not self.group_section)
@@ -0,0 +1,129 @@
+import csv
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# 导入文件中可识别的类型列取值
+_TYPE_ALIASES = {"user": "user", "u": "user", "group": "group", "g": "group"}
+# 导入结果中保留的无效条目示例数量
+_INVALID_SAMPLES = 20
+# 导出时每次写入的行数
+_WRITE_CHUNK = 4096
+
+
+class ImportResult:
+    """逐行解析导入文件的结果：按类型收集的ID与无效条目统计"""
+
+    __slots__ = ("ids", "invalid", "invalid_samples", "lines")
+
+    def __init__(self):
+        self.ids: Dict[str, List[str]] = {"user": [], "group": []}
+        self.invalid = 0
+        self.invalid_samples: List[str] = []
+        self.lines = 0
+
+    def add_invalid(self, line_no: int, text: str):
+        self.invalid += 1
+        if len(self.invalid_samples) < _INVALID_SAMPLES:
+            self.invalid_samples.append(f"第{line_no}行: {text[:64]}")
+
+
+def resolve_exchange_file(exchange_dir: Path, file_name: str) -> Path:
+    """把用户提供的文件名限制在导入导出目录内，拒绝包含路径的名称
+
+    导入导出只在数据目录下单独的子目录中进行，插件自身的状态文件（动态黑名单、计数、数据库）
+    不在该目录中，无法通过导出覆盖或通过导入读取。
+    """
+    file_name = file_name.strip()
+    if (not file_name or file_name in (".", "..") or "/" in file_name or "\\" in file_name
+            or file_name.endswith(".tmp")):
+        raise ValueError(f"文件名 '{file_name}' 无效，只能是导入导出目录下的文件名")
+    return exchange_dir / file_name
+
+
+def parse_id_lines(lines: Iterable[str], default_type: str,
+                   is_valid: Callable[[str], bool]) -> ImportResult:
+    """逐行解析换行分隔或 CSV 格式的ID列表
+
+    每行可以是单个ID（类型为 default_type），也可以是 "类型,ID[,其他列]" 的 CSV 行；
+    空行、以 # 开头的注释行与 "type,id" 表头会被跳过。整个过程只保留解析出的ID，
+    不会把文件整体读入内存。
+    """
+    result = ImportResult()
+    for line_no, row in enumerate(csv.reader(lines), start=1):
+        result.lines = line_no
+        fields = [field.strip() for field in row]
+        if not fields or not fields[0] or fields[0].startswith("#"):
+            continue
+        first = fields[0].lower()
+        if first == "type" and len(fields) > 1 and fields[1].lower() == "id":
+            continue
+        target_type = _TYPE_ALIASES.get(first)
+        if target_type is not None and len(fields) > 1:
+            target_id = fields[1]
+        else:
+            target_type, target_id = default_type, fields[0]
+        if is_valid(target_id):
+            result.ids[target_type].append(target_id)
+        else:
+            result.add_invalid(line_no, ",".join(fields))
+    return result
+
+
+def read_id_file(path: Path, default_type: str, is_valid: Callable[[str], bool]) -> ImportResult:
+    """流式读取并解析ID文件（在线程池中调用）"""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return parse_id_lines(f, default_type, is_valid)
+
+
+def iter_export_rows(targets: Dict[str, List[str]], as_csv: bool) -> Iterator[str]:
+    """生成导出文件的各行：CSV 带类型列，纯文本每行一个ID"""
+    if as_csv:
+        yield "type,id\n"
+    for target_type, target_ids in targets.items():
+        for target_id in target_ids:
+            yield f"{target_type},{target_id}\n" if as_csv else f"{target_id}\n"
+
+
+def write_id_file(path: Path, rows: Iterable[str], overwrite: bool = False) -> int:
+    """分块写入临时文件后移动到目标位置，返回写入的行数（在线程池中调用）
+
+    overwrite 为 False 时目标文件已存在则抛出 FileExistsError，不会替换已有文件；
+    为 True 时原子替换。
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    count = 0
+    chunk: List[str] = []
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= _WRITE_CHUNK:
+                f.writelines(chunk)
+                count += len(chunk)
+                chunk.clear()
+        f.writelines(chunk)
+        count += len(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    if overwrite:
+        os.replace(tmp_path, path)
+        return count
+    try:
+        # 硬链接在目标已存在时失败，检查与创建是同一个原子操作
+        os.link(tmp_path, path)
+    finally:
+        os.remove(tmp_path)
+    return count
+
+
+def export_targets(index_users: Iterable[str], index_groups: Iterable[str],
+                   target_type: Optional[str]) -> Dict[str, List[str]]:
+    """按类型整理要导出的ID（排序后输出，便于比较不同实例的导出文件）"""
+    targets: Dict[str, List[str]] = {}
+    if target_type in (None, "user"):
+        targets["user"] = sorted(index_users)
+    if target_type in (None, "group"):
+        targets["group"] = sorted(index_groups)
+    return targets
+
@@ -0,0 +1,194 @@
+import sys
+import time
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+
+class _CounterEntry:
+    """单个计数项：连续拦截次数与最后一次更新的时间戳"""
+
+    __slots__ = ("count", "last_seen")
+
+    def __init__(self, count: int, last_seen: float):
+        self.count = count
+        self.last_seen = last_seen
+
+
+_MISSING = object()
+
+
+class CounterStore(MutableMapping):
+    """有容量上限、按时间衰减的拦截计数存储
+
+    对外保持 ``Dict[str, int]`` 的用法。每项记录最后更新时间：
+    超过 decay_seconds 未更新的连续拦截视为已中断，读取时归零并移除；
+    写入时顺带清理最旧的过期项，数量超过 max_entries 时淘汰最久未更新的项。
+    内部字典按更新顺序排列（更新即重新插入到末尾），最旧的项总在最前面；
+    另按计数值分桶维护一份索引（桶内同样按更新顺序排列），按计数从多到少遍历时无需排序。
+    """
+
+    def __init__(self, max_entries: int = 10000, decay_seconds: float = 86400.0,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        self.max_entries = max(1, int(max_entries))
+        # 0 或负数表示不衰减
+        self.decay_seconds = float(decay_seconds) if decay_seconds and decay_seconds > 0 else 0.0
+        self.on_evict = on_evict
+        self._entries: Dict[str, _CounterEntry] = {}
+        self.evicted = 0
+        # 计数值 -> 该计数的键（按更新顺序排列的有序集合）
+        self._by_count: Dict[int, Dict[str, None]] = {}
+
+    def _is_stale(self, entry: _CounterEntry, now: float) -> bool:
+        return self.decay_seconds > 0 and now - entry.last_seen > self.decay_seconds
+
+    def _index_add(self, key: str, count: int):
+        bucket = self._by_count.get(count)
+        if bucket is None:
+            bucket = self._by_count[count] = {}
+        bucket[key] = None
+
+    def _index_remove(self, key: str, count: int):
+        bucket = self._by_count.get(count)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._by_count[count]
+
+    def _evict(self, key: str):
+        self._index_remove(key, self._entries.pop(key).count)
+        self.evicted += 1
+        if self.on_evict is not None:
+            self.on_evict(key)
+
+    def get(self, key: str, default=None, now: Optional[float] = None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if self.decay_seconds > 0:
+            if now is None:
+                now = time.time()
+            if self._is_stale(entry, now):
+                self._evict(key)
+                return default
+        return entry.count
+
+    def set(self, key: str, count: int, now: Optional[float] = None):
+        """写入计数并刷新最后更新时间"""
+        if now is None:
+            now = time.time()
+        entries = self._entries
+        entry = entries.pop(key, None)
+        if entry is None:
+            entry = _CounterEntry(count, now)
+        else:
+            self._index_remove(key, entry.count)
+            entry.count = count
+            entry.last_seen = now
+        entries[key] = entry
+        self._index_add(key, count)
+
+        # 每次写入最多顺带清理两个过期项，摊还 O(1)
+        if self.decay_seconds > 0:
+            for _ in range(2):
+                oldest = next(iter(entries))
+                if oldest == key or not self._is_stale(entries[oldest], now):
+                    break
+                self._evict(oldest)
+        while len(entries) > self.max_entries:
+            self._evict(next(iter(entries)))
+
+    def restore(self, key: str, count: int, last_seen: float):
+        """按原有时间戳恢复计数（用于加载持久化数据）"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._index_remove(key, old.count)
+        self._entries[key] = _CounterEntry(int(count), float(last_seen))
+        self._index_add(key, int(count))
+
+    def load(self, records: Dict[str, Tuple[int, float]]):
+        """批量恢复计数，按时间戳排序以保持淘汰顺序"""
+        for key, (count, last_seen) in sorted(records.items(), key=lambda item: item[1][1]):
+            self.restore(str(key), count, last_seen)
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def last_seen(self, key: str) -> Optional[float]:
+        entry = self._entries.get(key)
+        return entry.last_seen if entry is not None else None
+
+    def iter_recent(self, now: Optional[float] = None) -> Iterator[Tuple[str, int, float]]:
+        """按最后更新时间从新到旧遍历未过期的计数项：(ID, 计数, 最后更新时间)
+
+        内部字典本身按更新顺序排列，逆序遍历即可，无需排序；遇到第一个过期项即可停止。
+        遍历期间不能修改计数。
+        """
+        if now is None:
+            now = time.time()
+        for key, entry in reversed(self._entries.items()):
+            if self._is_stale(entry, now):
+                break
+            yield key, entry.count, entry.last_seen
+
+    def iter_by_count(self, now: Optional[float] = None) -> Iterator[Tuple[str, int, float]]:
+        """按计数从多到少遍历计数大于 0 且未过期的计数项，计数相同时从新到旧：(ID, 计数, 最后更新时间)
+
+        只对不同的计数值排序（数量通常不超过最大拦截次数），各桶内逆序遍历即可；
+        调用方只取一页时遍历在取够后即停止。遍历期间不能修改计数。
+        """
+        if now is None:
+            now = time.time()
+        entries = self._entries
+        for count in sorted(self._by_count, reverse=True):
+            if count <= 0:
+                break
+            for key in reversed(self._by_count[count]):
+                entry = entries[key]
+                if not self._is_stale(entry, now):
+                    yield key, count, entry.last_seen
+
+    def to_records(self, now: Optional[float] = None) -> Dict[str, Tuple[int, float]]:
+        """导出未过期的计数及其最后更新时间，用于持久化"""
+        if now is None:
+            now = time.time()
+        return {key: (entry.count, entry.last_seen)
+                for key, entry in self._entries.items() if not self._is_stale(entry, now)}
+
+    def memory_footprint(self) -> int:
+        """估算占用的内存字节数（字典、计数索引、键与计数项）"""
+        total = sys.getsizeof(self._entries) + sys.getsizeof(self._by_count)
+        total += sum(sys.getsizeof(bucket) for bucket in self._by_count.values())
+        for key, entry in self._entries.items():
+            total += sys.getsizeof(key) + sys.getsizeof(entry)
+        return total
+
+    def __getitem__(self, key: str) -> int:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, count: int):
+        self.set(key, count)
+
+    def __delitem__(self, key: str):
+        self._index_remove(key, self._entries.pop(key).count)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def pop(self, key: str, default=None):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self._index_remove(key, entry.count)
+        return entry.count
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self._by_count.clear()
@@ -0,0 +1,21 @@
+from typing import Tuple
+
+# 决策结果
+OUTCOME_SUPPRESSED = 0
+OUTCOME_PROBABILITY = 1
+OUTCOME_GUARANTEE = 2
+OUTCOME_NAMES = ("suppressed", "probability_allowed", "guarantee_allowed")
+
+
+def decide(current_count: int, reply_probability: float, max_interception_count: float,
+           random_value: float) -> Tuple[int, int]:
+    """弱黑名单的核心判断，返回 (决策结果, 新的连续拦截计数)
+
+    check_weak_blacklist 与离线回放模拟器共用此函数，保证两者行为一致：
+    连续拦截达到上限时保底回复；否则随机值不超过回复概率时放行；其余情况拦截并计数加一。
+    """
+    if current_count + 1 >= max_interception_count:
+        return OUTCOME_GUARANTEE, 0
+    if random_value <= reply_probability:
+        return OUTCOME_PROBABILITY, 0
+    return OUTCOME_SUPPRESSED, current_count + 1
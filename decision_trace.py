@@ -0,0 +1,139 @@
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .decision import OUTCOME_GUARANTEE, OUTCOME_NAMES, OUTCOME_PROBABILITY
+
+# 决策记录字段，记录本身是按此顺序排列的元组，只包含原始值
+TRACE_FIELDS = (
+    "timestamp", "kind", "target_id", "sender_id", "sender_name", "group_id",
+    "outcome", "previous_count", "max_count", "probability", "random_value", "message",
+)
+
+# 记录中保留的消息长度，显示时再截断到 _PREVIEW_CHARS
+_MESSAGE_CHARS = 64
+_PREVIEW_CHARS = 50
+
+
+def make_record(kind: str, target_id: str, sender_id: str, sender_name: str, group_id: Optional[str],
+                outcome: int, previous_count: int, max_count: float, probability: float, random_value: float,
+                message: str) -> Tuple:
+    """构造一条决策记录（热路径：只组装元组，不做格式化）"""
+    return (time.time(), kind, target_id, sender_id, sender_name, group_id, outcome, previous_count,
+            max_count, probability, random_value, message[:_MESSAGE_CHARS])
+
+
+def format_record(record: Tuple) -> str:
+    """把决策记录格式化为日志文本"""
+    (_, kind, target_id, _, sender_name, _, outcome, previous_count, max_count,
+     probability, random_value, message) = record
+    sender_name = sender_name or "未知用户"
+    if kind == "user":
+        log_identifier = f"用户: {sender_name}({target_id})"
+    else:
+        log_identifier = f"群聊: {target_id} 中的用户: {sender_name}"
+    if outcome == OUTCOME_GUARANTEE:
+        return f"弱黑名单保底回复 - {log_identifier}, 已达到最大拦截次数: {previous_count}/{max_count}"
+    if outcome == OUTCOME_PROBABILITY:
+        return (f"弱黑名单概率允许回复 - {log_identifier}, "
+                f"概率: {probability:.2f}, 随机值: {random_value:.3f}, 重置拦截计数")
+    message_preview = message[:_PREVIEW_CHARS] + ("..." if len(message) > _PREVIEW_CHARS else "")
+    return f"弱黑名单拦截 - {log_identifier}, 消息: {message_preview}, 拦截计数: {previous_count + 1}/{max_count}"
+
+
+def record_to_dict(record: Tuple) -> Dict[str, Any]:
+    """转换为可 JSON 序列化的字典，用于导出"""
+    data = dict(zip(TRACE_FIELDS, record))
+    data["outcome"] = OUTCOME_NAMES[data["outcome"]]
+    if data["max_count"] == float("inf"):
+        data["max_count"] = None
+    return data
+
+
+class DecisionTrace:
+    """固定容量的决策记录环形缓冲区，写满后覆盖最旧的记录"""
+
+    __slots__ = ("capacity", "total", "_records", "_next")
+
+    def __init__(self, capacity: int = 500):
+        self.capacity = max(1, int(capacity))
+        self.total = 0
+        self._records: List[Optional[Tuple]] = [None] * self.capacity
+        self._next = 0
+
+    def record(self, record: Tuple):
+        self._records[self._next] = record
+        self._next = (self._next + 1) % self.capacity
+        self.total += 1
+
+    def recent(self, n: Optional[int] = None) -> List[Tuple]:
+        """返回最近 n 条记录，最新的在前"""
+        size = len(self)
+        n = size if n is None else max(0, min(int(n), size))
+        out = []
+        idx = self._next
+        for _ in range(n):
+            idx = (idx - 1) % self.capacity
+            out.append(self._records[idx])
+        return out
+
+    def clear(self):
+        self._records = [None] * self.capacity
+        self._next = 0
+        self.total = 0
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def render_text(self, n: int = 20) -> str:
+        """生成 /rrbot trace 的文本"""
+        records = self.recent(n)
+        if not records:
+            return "暂无决策记录。"
+        lines = [f"最近 {len(records)} 条弱黑名单决策（共记录 {self.total} 条，保留最近 {self.capacity} 条）："]
+        for record in records:
+            stamp = time.strftime("%H:%M:%S", time.localtime(record[0]))
+            lines.append(f"[{stamp}] {format_record(record)}")
+        return "\n".join(lines)
+
+    def to_jsonl(self) -> str:
+        """按时间顺序导出为 JSONL 文本"""
+        return "".join(
+            json.dumps(record_to_dict(record), ensure_ascii=False) + "\n" for record in reversed(self.recent())
+        )
+
+
+class LogSampler:
+    """决策日志的采样与限速：按比例采样，并用令牌桶限制每分钟条数"""
+
+    __slots__ = ("sample_rate", "max_per_minute", "dropped", "_tokens", "_last")
+
+    def __init__(self, sample_rate: float = 1.0, max_per_minute: float = 60.0):
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        # 0 或负数表示不限速
+        self.max_per_minute = float(max_per_minute)
+        self.dropped = 0
+        self._tokens = self.max_per_minute
+        self._last = time.monotonic()
+
+    def allow(self) -> bool:
+        """本条日志是否输出；被丢弃的条数累计在 dropped 中"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.dropped += 1
+            return False
+        if self.max_per_minute > 0:
+            now = time.monotonic()
+            self._tokens = min(self.max_per_minute,
+                               self._tokens + (now - self._last) * self.max_per_minute / 60.0)
+            self._last = now
+            if self._tokens < 1.0:
+                self.dropped += 1
+                return False
+            self._tokens -= 1.0
+        return True
+
+    def take_dropped(self) -> int:
+        """取出并清零自上次输出以来丢弃的条数"""
+        dropped, self.dropped = self.dropped, 0
+        return dropped
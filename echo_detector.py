@@ -0,0 +1,85 @@
+import heapq
+import time
+from collections import OrderedDict, deque
+from typing import Deque, FrozenSet, Optional, Tuple
+
+# 以 3 字符的滑动片段计算相似度（对中文与英文都适用）
+_SHINGLE = 3
+# 每条消息最多参与计算的字符数，保证单条消息的开销有上界
+_MAX_CHARS = 256
+# MinHash（bottom-k）草图大小：每条消息只保留最小的 k 个片段哈希
+SKETCH_SIZE = 16
+
+
+def _normalize(text: str) -> str:
+    """忽略大小写与空白，避免只差空格或大小写的消息被视为不同"""
+    return "".join(text[:_MAX_CHARS * 2].lower().split())[:_MAX_CHARS]
+
+
+def minhash_sketch(text: str, k: int = SKETCH_SIZE) -> Optional[FrozenSet[int]]:
+    """计算 bottom-k MinHash 草图，复杂度与消息长度成正比；文本过短时返回 None"""
+    text = _normalize(text)
+    if len(text) < _SHINGLE:
+        return None
+    hashes = {hash(text[i:i + _SHINGLE]) for i in range(len(text) - _SHINGLE + 1)}
+    if len(hashes) > k:
+        return frozenset(heapq.nsmallest(k, hashes))
+    return frozenset(hashes)
+
+
+def sketch_similarity(a: FrozenSet[int], b: Tuple[int, ...]) -> float:
+    """两个草图的 Jaccard 相似度估计"""
+    shared = len(a.intersection(b))
+    return shared / (len(a) + len(b) - shared)
+
+
+class EchoDetector:
+    """按群记录最近消息的 MinHash 草图，识别近似重复的“复读”消息
+
+    每个群只保留最近 window_size 条且不超过 window_seconds 秒的草图（每条最多
+    SKETCH_SIZE 个整数），群数量超过 max_groups 时按最近最少使用淘汰，内存占用有固定上界。
+    """
+
+    def __init__(self, window_size: int = 16, window_seconds: float = 300.0, max_groups: int = 256,
+                 similarity: float = 0.5, min_length: int = 8):
+        self.window_size = max(1, int(window_size))
+        self.window_seconds = max(1.0, float(window_seconds))
+        self.max_groups = max(1, int(max_groups))
+        self.similarity = max(0.0, min(1.0, float(similarity)))
+        self.min_length = max(_SHINGLE, int(min_length))
+        self._windows: "OrderedDict[str, Deque[Tuple[Tuple[int, ...], float]]]" = OrderedDict()
+
+    def observe(self, group_id: str, text: str, now: Optional[float] = None) -> bool:
+        """记录一条群消息，返回它是否与窗口内最近的消息近似重复"""
+        if not text or len(text) < self.min_length:
+            return False
+        sketch = minhash_sketch(text)
+        if sketch is None:
+            return False
+        if now is None:
+            now = time.monotonic()
+
+        window = self._windows.get(group_id)
+        if window is None:
+            window = deque(maxlen=self.window_size)
+            self._windows[group_id] = window
+            if len(self._windows) > self.max_groups:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(group_id)
+            expire_before = now - self.window_seconds
+            while window and window[0][1] < expire_before:
+                window.popleft()
+
+        duplicate = False
+        threshold = self.similarity
+        for previous, _ in window:
+            if sketch_similarity(sketch, previous) >= threshold:
+                duplicate = True
+                break
+        # 窗口中以元组保存，比 frozenset 占用更少内存
+        window.append((tuple(sketch), now))
+        return duplicate
+
+    def __len__(self) -> int:
+        return len(self._windows)
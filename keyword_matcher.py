@@ -0,0 +1,126 @@
+import re
+import unicodedata
+from typing import Dict, List, Optional, Pattern, Tuple
+
+# 以该前缀开头的关键字按正则表达式处理
+REGEX_PREFIX = "re:"
+
+
+class KeywordMatcher:
+    """基于 Aho-Corasick 自动机的多关键字匹配器
+
+    关键字在构建时编译为一个自动机，每个名字只需线性扫描一次，
+    与关键字数量无关。支持可选的大小写折叠、全角/半角归一化（NFKC）
+    以及以 ``re:`` 开头的正则关键字（仅 allow_regex 为 True 时，即关键字来自后台配置时；
+    否则按字面量匹配）。命中多个关键字时返回列表中最靠前的一个，
+    与逐个关键字比较的旧行为一致。
+    """
+
+    __slots__ = ("keywords", "case_insensitive", "normalize_width", "allow_regex",
+                 "_goto", "_fail", "_out", "_regexes")
+
+    def __init__(self, keywords: List[str], case_insensitive: bool = False, normalize_width: bool = False,
+                 allow_regex: bool = False):
+        self.keywords = list(keywords)
+        self.case_insensitive = case_insensitive
+        self.normalize_width = normalize_width
+        self.allow_regex = allow_regex
+
+        # 自动机：goto 转移表、失败指针、每个状态可输出的最小关键字序号（-1 表示无）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[int] = [-1]
+        self._regexes: List[Tuple[int, Pattern]] = []
+
+        for idx, keyword in enumerate(self.keywords):
+            if allow_regex and keyword.startswith(REGEX_PREFIX):
+                flags = re.IGNORECASE if case_insensitive else 0
+                try:
+                    self._regexes.append((idx, re.compile(keyword[len(REGEX_PREFIX):], flags)))
+                except re.error:
+                    # 非法正则退化为普通字面量匹配
+                    self._insert(self.normalize(keyword), idx)
+                continue
+            self._insert(self.normalize(keyword), idx)
+        self._build_fail_links()
+
+    @classmethod
+    def from_string(cls, keywords: str, case_insensitive: bool = False, normalize_width: bool = False,
+                    allow_regex: bool = False) -> "KeywordMatcher":
+        """从英文逗号分隔的关键字字符串构建"""
+        keyword_list = [k.strip() for k in keywords.split(",") if k.strip()]
+        return cls(keyword_list, case_insensitive, normalize_width, allow_regex)
+
+    def normalize(self, text: str) -> str:
+        """按配置对文本做与关键字相同的归一化"""
+        if self.normalize_width:
+            text = unicodedata.normalize("NFKC", text)
+        if self.case_insensitive:
+            text = text.casefold()
+        return text
+
+    def _insert(self, word: str, idx: int):
+        if not word:
+            return
+        state = 0
+        for ch in word:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(-1)
+            state = nxt
+        if self._out[state] < 0 or idx < self._out[state]:
+            self._out[state] = idx
+
+    def _build_fail_links(self):
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                inherited = out[fail[nxt]]
+                if inherited >= 0 and (out[nxt] < 0 or inherited < out[nxt]):
+                    out[nxt] = inherited
+
+    def _scan(self, text: str, best: int) -> int:
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            found = out[state]
+            if found >= 0 and (best < 0 or found < best):
+                best = found
+                if best == 0:
+                    break
+        return best
+
+    def match(self, *texts: str) -> Optional[str]:
+        """返回在任一文本中命中的最靠前关键字，未命中返回 None"""
+        best = -1
+        for text in texts:
+            if text and len(self._goto) > 1:
+                best = self._scan(self.normalize(text), best)
+                if best == 0:
+                    return self.keywords[0]
+        for idx, pattern in self._regexes:
+            if best >= 0 and idx > best:
+                break
+            if any(text and pattern.search(self.normalize(text)) for text in texts):
+                best = idx
+                break
+        return self.keywords[best] if best >= 0 else None
+
+    def __bool__(self) -> bool:
+        return bool(self.keywords)
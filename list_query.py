@@ -0,0 +1,120 @@
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .counter_store import CounterStore
+
+# 排序方式：按ID、按拦截次数（从多到少）、按最后拦截时间（从新到旧）
+ORDERS = ("id", "count", "recent")
+_ORDER_ALIASES = {"id": "id", "count": "count", "hits": "count", "recent": "recent", "time": "recent"}
+
+
+class ListQuery:
+    """一次 list 查询的参数"""
+
+    __slots__ = ("target_type", "page", "order", "prefix", "substring")
+
+    def __init__(self, target_type: Optional[str] = None, page: int = 1, order: str = "id",
+                 prefix: str = "", substring: str = ""):
+        self.target_type = target_type
+        self.page = page
+        self.order = order
+        self.prefix = prefix
+        self.substring = substring
+
+    @property
+    def filtered(self) -> bool:
+        return bool(self.prefix or self.substring)
+
+    def to_args(self, target_type: str, page: int) -> str:
+        """生成查询另一页时的参数，保留排序与过滤条件"""
+        parts = [target_type, str(page)]
+        if self.order != "id":
+            parts.append(f"by:{self.order}")
+        if self.prefix:
+            parts.append(f"prefix:{self.prefix}")
+        if self.substring:
+            parts.append(f"find:{self.substring}")
+        return " ".join(parts)
+
+
+def parse_list_args(args: Sequence[str]) -> ListQuery:
+    """解析 list 参数：[user|group] [页码] [by:id|count|recent] [prefix:前缀] [find:关键字]"""
+    query = ListQuery()
+    for arg in args:
+        lowered = arg.lower()
+        if lowered in ("user", "u", "group", "g") and query.target_type is None:
+            query.target_type = "group" if lowered in ("group", "g") else "user"
+        elif arg.isdigit():
+            query.page = max(1, int(arg))
+        elif lowered.startswith("by:"):
+            order = _ORDER_ALIASES.get(lowered[3:])
+            if order is None:
+                raise ValueError(f"未知的排序方式 '{arg[3:]}'，可选 {'/'.join(ORDERS)}")
+            query.order = order
+        elif lowered.startswith("prefix:") and len(arg) > 7:
+            query.prefix = arg[7:]
+        elif lowered.startswith("find:") and len(arg) > 5:
+            query.substring = arg[5:]
+        else:
+            raise ValueError(f"无法识别的参数 '{arg}'")
+    return query
+
+
+def _prefix_range(sorted_ids: Tuple[str, ...], prefix: str) -> Tuple[int, int]:
+    """二分查找以 prefix 开头的ID在有序列表中的区间"""
+    lo = bisect_left(sorted_ids, prefix)
+    hi = bisect_left(sorted_ids, prefix + "\U0010ffff", lo)
+    return lo, hi
+
+
+def _matches(target_id: str, query: ListQuery) -> bool:
+    return target_id.startswith(query.prefix) and query.substring in target_id
+
+
+def _select_page(candidates: Iterable[Tuple[str, int, float]], offset: int,
+                 size: int) -> Tuple[List[Tuple[str, int, float]], int, bool]:
+    """从已按顺序排列的候选中取出一页
+
+    只遍历到本页之后的第一个候选为止：返回 (本页条目, 已遍历到的条目数, 是否已遍历完)。
+    未遍历完时条目数只是下限，说明后面还有更多。
+    """
+    items: List[Tuple[str, int, float]] = []
+    total = 0
+    for candidate in candidates:
+        if total >= offset + size:
+            return items, total + 1, False
+        if total >= offset:
+            items.append(candidate)
+        total += 1
+    return items, total, True
+
+
+def query_page(sorted_ids: Tuple[str, ...], members: frozenset, counters: CounterStore,
+               query: ListQuery, page_size: int) -> Tuple[List[Tuple[str, int, Optional[float]]], int, bool]:
+    """返回一页结果 [(ID, 拦截次数, 最后拦截时间)]、符合条件的总数以及总数是否精确
+
+    - 按ID排序：直接使用索引中缓存的有序列表，前缀搜索为二分查找，只为本页的条目读取计数，总数精确；
+    - 按最后拦截时间：逆序遍历按更新顺序排列的计数存储，不排序；
+    - 按拦截次数：遍历计数存储按计数值分桶维护的索引，不排序。
+    后两种方式只列出有拦截记录的目标（按拦截次数时只列出当前计数大于 0 的目标），
+    遍历到本页之后的第一个条目即停止，此时总数只是下限。
+    """
+    offset = (query.page - 1) * page_size
+
+    if query.order == "id":
+        ids: Sequence[str] = sorted_ids
+        if query.prefix:
+            lo, hi = _prefix_range(sorted_ids, query.prefix)
+            ids = sorted_ids[lo:hi]
+        if query.substring:
+            ids = [target_id for target_id in ids if query.substring in target_id]
+        page_ids = ids[offset:offset + page_size]
+        return [(target_id, counters.get(target_id, 0), counters.last_seen(target_id))
+                for target_id in page_ids], len(ids), True
+
+    source = counters.iter_recent() if query.order == "recent" else counters.iter_by_count()
+    candidates: Iterator[Tuple[str, int, float]] = (
+        entry for entry in source
+        if entry[0] in members and (not query.filtered or _matches(entry[0], query))
+    )
+    return _select_page(candidates, offset, page_size)
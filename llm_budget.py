@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class _Bucket:
+    """令牌桶状态：剩余令牌与上次补充时间"""
+
+    __slots__ = ("tokens", "last")
+
+    def __init__(self, tokens: float, last: float):
+        self.tokens = tokens
+        self.last = last
+
+
+class LLMBudget:
+    """按目标限制 LLM 请求次数的令牌桶
+
+    每个目标每 period 秒最多 limit 次请求，令牌按时间连续补充，允许短时突发到 limit。
+    目标数量超过上限时按最近最少使用淘汰（被淘汰的目标视为满额）。
+    """
+
+    def __init__(self, limit: float, period: float = 3600.0, max_entries: int = 4096):
+        self.limit = max(1.0, float(limit))
+        self.period = max(1.0, float(period))
+        self.refill_rate = self.limit / self.period
+        self.max_entries = max(1, int(max_entries))
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+
+    def _refill(self, key: str, now: float) -> _Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _Bucket(self.limit, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+            return bucket
+        elapsed = now - bucket.last
+        if elapsed > 0:
+            bucket.tokens = min(self.limit, bucket.tokens + elapsed * self.refill_rate)
+            bucket.last = now
+        self._buckets.move_to_end(key)
+        return bucket
+
+    def available(self, key: str, now: Optional[float] = None) -> bool:
+        """目标是否还有剩余额度（不消耗）"""
+        if now is None:
+            now = time.monotonic()
+        return self._refill(key, now).tokens >= 1.0
+
+    def consume(self, key: str, now: Optional[float] = None):
+        """消耗一次额度"""
+        if now is None:
+            now = time.monotonic()
+        bucket = self._refill(key, now)
+        bucket.tokens = max(0.0, bucket.tokens - 1.0)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+def _content_chars(content: Any) -> int:
+    """OpenAI 格式消息内容的字符数：字符串或由文本片段组成的列表"""
+    if isinstance(content, str):
+        return len(content)
+    if isinstance(content, list):
+        total = 0
+        for part in content:
+            if isinstance(part, dict):
+                text = part.get("text")
+                if isinstance(text, str):
+                    total += len(text)
+            elif isinstance(part, str):
+                total += len(part)
+        return total
+    return 0
+
+
+def estimate_request_tokens(req: Any, chars_per_token: float = 2.0, output_tokens: int = 300) -> int:
+    """粗略估算一次 LLM 请求的 token 数：输入按字符数折算，加上预估的输出长度"""
+    if req is None:
+        return int(output_tokens)
+    chars = len(getattr(req, "prompt", None) or "") + len(getattr(req, "system_prompt", None) or "")
+    for message in getattr(req, "contexts", None) or []:
+        if isinstance(message, dict):
+            chars += _content_chars(message.get("content"))
+    return int(chars / max(0.1, chars_per_token)) + int(output_tokens)
@@ -1,12 +1,43 @@
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api.star import Context, Star, register, StarTools
 from astrbot.api import logger, AstrBotConfig, llm_tool
+import asyncio
 import random
 import os
+import sys
 import json
+import re
 import shutil
+import time
+import zlib
 from pathlib import Path
-from typing import Tuple, Optional, Dict, Set, List, Any
+from typing import Tuple, Optional, Dict, Set, List, Any, FrozenSet
+
+from .blacklist_index import BlacklistIndex
+from .blacklist_io import export_targets, iter_export_rows, read_id_file, resolve_exchange_file, write_id_file
+from .policy_table import PolicyTable, format_override, format_target, parse_override, parse_target
+from .persistence import CounterJournal, CounterSnapshot, PersistenceWriter, atomic_write_json, atomic_write_text
+from .storage import SqliteStorage, SqliteCounterWriter
+from .keyword_matcher import KeywordMatcher
+from .list_query import ListQuery, parse_list_args, query_page
+from .member_cache import MemberDiff, MemberListCache, MemberSnapshot
+from .rate_tracker import RateTracker, scale_probability
+from .echo_detector import EchoDetector
+from .behavior_detector import BehaviorDetector
+from .reply_chain import ReplyChainTracker, find_reply_id
+from .llm_budget import LLMBudget, estimate_request_tokens
+from .counter_store import CounterStore
+from .decision import OUTCOME_GUARANTEE, OUTCOME_PROBABILITY, OUTCOME_SUPPRESSED, decide
+from .metrics import PluginMetrics, PrometheusTextfileExporter
+from .decision_trace import DecisionTrace, LogSampler, format_record, make_record
+from .shared_state import SharedStateStore, SharedStateSync
+from .profiler import PluginProfiler, profiled
+
+
+# QQ号/群号等目标ID：字母数字及少量分隔符，长度不超过64
+_TARGET_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.:@-]{1,64}$")
+# list 命令每页显示的条目数
+_LIST_PAGE_SIZE = 20
 
 
 @register("astrbot_plugin_random_reply", "柯尔", "rrbot机器人防尬聊插件", "v1.0.1", "https://github.com/Luna-channel/random-reply")
@@ -16,47 +47,51 @@ class WeakBlacklistPlugin(Star):
     def _load_interception_counters(self):
         """加载用户和群聊被拦截次数记录"""
         # 加载用户拦截计数器
-        try:
-            if os.path.exists(self.user_counters_path):
-                with open(self.user_counters_path, 'r', encoding='utf-8') as f:
-                    self.user_interception_counters = json.load(f)
-                    # 确保所有值都是整数类型
-                    for key in self.user_interception_counters:
-                        self.user_interception_counters[key] = int(self.user_interception_counters[key])
-            else:
-                self.user_interception_counters = {}
-        except (json.JSONDecodeError, OSError, ValueError) as e:
-            logger.error(f"加载用户拦截计数器失败: {e}")
-            self.user_interception_counters = {}
-
+        self._load_counter_file(self.user_counters_path, self.user_interception_counters, "用户")
         # 加载群聊拦截计数器
+        self._load_counter_file(self.group_counters_path, self.group_interception_counters, "群聊")
+
+    def _load_counter_file(self, path: Path, store: CounterStore, label: str):
+        """从 JSON 文件加载计数，每项为 [计数, 最后更新时间]
+
+        兼容旧版本只保存计数的格式，此时以文件修改时间作为最后更新时间。
+        """
+        store.clear()
         try:
-            if os.path.exists(self.group_counters_path):
-                with open(self.group_counters_path, 'r', encoding='utf-8') as f:
-                    self.group_interception_counters = json.load(f)
-                    # 确保所有值都是整数类型
-                    for key in self.group_interception_counters:
-                        self.group_interception_counters[key] = int(self.group_interception_counters[key])
-            else:
-                self.group_interception_counters = {}
-        except (json.JSONDecodeError, OSError, ValueError) as e:
-            logger.error(f"加载群聊拦截计数器失败: {e}")
-            self.group_interception_counters = {}
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                mtime = os.path.getmtime(path)
+                records = {}
+                for key, value in data.items():
+                    if isinstance(value, list):
+                        records[str(key)] = (int(value[0]), float(value[1]))
+                    else:
+                        records[str(key)] = (int(value), mtime)
+                store.load(records)
+        except (json.JSONDecodeError, OSError, ValueError, AttributeError, IndexError, TypeError) as e:
+            logger.error(f"加载{label}拦截计数器失败: {e}")
+            store.clear()
 
     def _save_interception_counters(self):
-        """保存用户和群聊被拦截次数记录"""
-        try:
-            # 保存用户拦截计数器
-            with open(self.user_counters_path, 'w', encoding='utf-8') as f:
-                json.dump(self.user_interception_counters, f, ensure_ascii=False, indent=2)
-            
-            # 保存群聊拦截计数器
-            with open(self.group_counters_path, 'w', encoding='utf-8') as f:
-                json.dump(self.group_interception_counters, f, ensure_ascii=False, indent=2)
-                
-            logger.debug("弱黑名单拦截计数器已保存")
-        except Exception as e:
-            logger.error(f"保存拦截计数器失败: {e}")
+        """保存用户和群聊被拦截次数记录：在事件循环中复制快照，由写入线程原子替换文件"""
+        snapshot = self._snapshot_interception_counters()
+        self._writer.schedule("user_counters", "保存用户拦截计数器",
+                              atomic_write_json, self.user_counters_path, snapshot["user"])
+        self._writer.schedule("group_counters", "保存群聊拦截计数器",
+                              atomic_write_json, self.group_counters_path, snapshot["group"])
+
+    def _on_counter_evicted(self, kind: str, key: str):
+        """计数项因过期或容量上限被淘汰时，同步删除持久化记录"""
+        if self._counter_writer is not None:
+            self._counter_writer.record(kind, key, None)
+
+    def _snapshot_interception_counters(self) -> CounterSnapshot:
+        """复制当前计数器及各项的最后更新时间，供后台线程写入快照"""
+        return {
+            "user": self.user_interception_counters.to_records(),
+            "group": self.group_interception_counters.to_records(),
+        }
 
     def _load_managed_blacklist(self):
         """加载通过命令动态维护的黑名单"""
@@ -77,22 +112,47 @@ class WeakBlacklistPlugin(Star):
             self.managed_blacklisted_groups = set()
 
     def _save_managed_blacklist(self):
-        """保存通过命令动态维护的黑名单"""
-        try:
-            payload = {
-                "users": sorted(self.managed_blacklisted_users),
-                "groups": sorted(self.managed_blacklisted_groups)
-            }
-            with open(self.managed_blacklist_path, 'w', encoding='utf-8') as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"保存动态黑名单失败: {e}")
+        """保存通过命令动态维护的黑名单：快照在事件循环中生成，写盘交给写入线程"""
+        payload = {
+            "users": sorted(self.managed_blacklisted_users),
+            "groups": sorted(self.managed_blacklisted_groups)
+        }
+        self._writer.schedule("managed_blacklist", "保存动态黑名单",
+                              atomic_write_json, self.managed_blacklist_path, payload)
+
+    def _save_config(self):
+        """在写入线程中调用框架的 save_config 保存插件配置，连续多次修改只保存最新状态"""
+        self._writer.schedule("config", "保存配置文件", self.config.save_config)
+
+    def _persist_managed_change(self, target_type: str, target_id: str, action: str):
+        """持久化一次动态黑名单变更：SQLite 后端单行写入，JSON 后端整文件重写"""
+        if self._storage is not None:
+            write = self._storage.add_member if action == "add" else self._storage.remove_member
+            self._writer.schedule(None, "保存动态黑名单", write, target_type, target_id)
+            return
+        self._save_managed_blacklist()
+
+    def _persist_managed_batch(self, target_type: str, target_ids: List[str]):
+        """持久化一批新增的动态黑名单：SQLite 后端单个事务，JSON 后端重写一次文件"""
+        if self._storage is not None:
+            self._writer.schedule(None, "保存动态黑名单", self._storage.add_members, target_type, list(target_ids))
+            return
+        self._save_managed_blacklist()
 
     def _get_config_section(self, key: str) -> Dict[str, Any]:
         """安全获取配置中的子对象"""
         value = self.config.get(key, {})
         return value if isinstance(value, dict) else {}
 
+    def _get_float_setting(self, section: Dict[str, Any], key: str, default: float) -> float:
+        """读取数值配置，非法时回退默认值"""
+        value = section.get(key, default)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            logger.warning(f"{key} 配置值 '{value}' 非法，使用默认值 {default}")
+            return default
+
     def _get_user_config(self) -> Dict[str, Any]:
         """获取用户配置节"""
         return self._get_config_section("user_settings")
@@ -101,60 +161,46 @@ class WeakBlacklistPlugin(Star):
         """获取群聊配置节"""
         return self._get_config_section("group_settings")
 
-    def _get_reply_probability(self, blacklist_type: str) -> float:
-        """获取回复概率配置"""
-        if blacklist_type == "group":
-            group_cfg = self._get_group_config()
-            value = group_cfg.get("reply_probability", self.config.get("group_reply_probability", 0.3))
-        else:
-            user_cfg = self._get_user_config()
-            value = user_cfg.get("reply_probability", self.config.get("reply_probability", 0.3))
-        try:
-            return float(value)
-        except (TypeError, ValueError):
-            logger.warning(f"{blacklist_type} reply_probability 配置值 '{value}' 非法，使用默认值 0.3")
-            return 0.3
-
-    def _get_max_interception_count(self, blacklist_type: str) -> Any:
-        """获取最大拦截次数配置"""
-        if blacklist_type == "group":
-            group_cfg = self._get_group_config()
-            return group_cfg.get("max_interception_count", self.config.get("max_group_interception_count", 8))
-        user_cfg = self._get_user_config()
-        return user_cfg.get("max_interception_count", self.config.get("max_interception_count", 5))
-
-    def _get_combined_blacklists(self) -> Tuple[Set[str], Set[str]]:
-        """合并配置中的黑名单与动态维护的黑名单"""
-        user_cfg = self._get_user_config()
-        users_enabled = bool(user_cfg.get("enable", True))
-        group_cfg = self._get_group_config()
-        groups_enabled = bool(group_cfg.get("enable", True))
+    def _get_policy_table(self) -> PolicyTable:
+        """获取编译后的回复策略表，配置节被替换或规则被修改后重新编译"""
+        table = self._policy_table
+        if table is None or table.is_stale(self.config):
+            table = PolicyTable.build(self.config)
+            self._policy_table = table
+        return table
 
-        config_users: Set[str] = set()
-        if users_enabled:
-            config_users.update(str(uid) for uid in user_cfg.get("blacklisted_users", []))
-            config_users.update(self.managed_blacklisted_users)
+    def _invalidate_blacklist_index(self):
+        """黑名单来源发生变化时使索引失效，下次访问时重新编译"""
+        self._blacklist_index = None
 
-        config_groups: Set[str] = set()
-        if groups_enabled:
-            config_groups.update(str(gid) for gid in group_cfg.get("blacklisted_groups", []))
-            config_groups.update(self.managed_blacklisted_groups)
+    def _get_blacklist_index(self) -> BlacklistIndex:
+        """获取当前有效的黑名单索引，必要时重新编译"""
+        index = self._blacklist_index
+        if index is None or index.is_stale(self.config):
+            index = BlacklistIndex.build(
+                self.config,
+                self.managed_blacklisted_users | self._shared_users,
+                self.managed_blacklisted_groups | self._shared_groups,
+            )
+            self._blacklist_index = index
+        return index
 
-        return config_users, config_groups
+    def _get_combined_blacklists(self) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        """合并配置中的黑名单与动态维护的黑名单"""
+        index = self._get_blacklist_index()
+        return index.users, index.groups
 
-    
     def _check_blacklist_status(self, event: AstrMessageEvent) -> Tuple[bool, Optional[str], Optional[str]]:
         """检查消息是否来自黑名单用户或群聊"""
         sender_id = str(event.get_sender_id())
         group_id = event.get_group_id()
 
-        # 获取合并后的黑名单
-        blacklisted_users, blacklisted_groups = self._get_combined_blacklists()
-        
-        if sender_id in blacklisted_users:
+        index = self._get_blacklist_index()
+
+        if sender_id in index.users:
             return True, "user", sender_id
 
-        if group_id and str(group_id) in blacklisted_groups:
+        if group_id and str(group_id) in index.groups:
             return True, "group", str(group_id)
 
         return False, None, None
@@ -162,6 +208,66 @@ class WeakBlacklistPlugin(Star):
     @filter.event_message_type(filter.EventMessageType.ALL, priority=10)
     async def check_weak_blacklist(self, event: AstrMessageEvent):
         """检查弱黑名单并进行概率判断，包含保底回复机制"""
+        if self._profiler is not None:
+            with self._profiler:
+                self._check_weak_blacklist(event)
+            return
+        self._check_weak_blacklist(event)
+
+    def _check_weak_blacklist(self, event: AstrMessageEvent):
+        """执行弱黑名单判断，并记录决策耗时与结果指标"""
+        if self._shared_state is not None:
+            self._shared_state.ensure_started()
+        metrics = self._metrics
+        if metrics is None:
+            self._evaluate_weak_blacklist(event)
+            return
+
+        start = time.perf_counter_ns()
+        outcome = self._evaluate_weak_blacklist(event)
+        elapsed = time.perf_counter_ns() - start
+        if outcome is None:
+            metrics.record_decision(elapsed)
+        else:
+            group_id = event.get_group_id()
+            metrics.record_decision(elapsed, outcome, str(event.get_sender_id()),
+                                    str(group_id) if group_id else None)
+        if self._metrics_exporter is not None:
+            self._metrics_exporter.ensure_started()
+
+    def _evaluate_weak_blacklist(self, event: AstrMessageEvent) -> Optional[int]:
+        """执行弱黑名单判断并设置事件标记，返回决策结果（非黑名单消息返回 None）"""
+        # 复读检测：群内所有消息都进入窗口，只对黑名单消息降低回复概率
+        echo = False
+        if self._echo_detector is not None:
+            echo_group = event.get_group_id()
+            if echo_group:
+                echo = self._echo_detector.observe(str(echo_group), event.message_str or "")
+
+        # 行为统计：按群记录每个发送者的发言间隔、回复延迟与消息长度
+        if self._behavior_detector is not None:
+            behavior_group = event.get_group_id()
+            if behavior_group:
+                sender_id = str(event.get_sender_id())
+                self._behavior_detector.observe(
+                    str(behavior_group), sender_id, event.get_sender_name() or "",
+                    len(event.message_str or ""), sender_id in self._get_blacklist_index().users,
+                )
+
+        # 回复链深度：由引用关系与黑名单发送者的交替发言推算
+        chain_depth = 0
+        if self._chain_tracker is not None:
+            chain_group = event.get_group_id()
+            if chain_group:
+                sender_id = str(event.get_sender_id())
+                message_obj = event.message_obj
+                message_id = getattr(message_obj, "message_id", None)
+                chain_depth = self._chain_tracker.observe(
+                    str(chain_group), str(message_id) if message_id not in (None, "") else None, sender_id,
+                    sender_id in self._get_blacklist_index().users,
+                    find_reply_id(getattr(message_obj, "message", None)),
+                )
+
         # 检查是否在黑名单中
         is_blacklisted, blacklist_type, target_id = self._check_blacklist_status(event)
         
@@ -172,87 +278,166 @@ class WeakBlacklistPlugin(Star):
             
             if sender_id in self.user_interception_counters:
                 del self.user_interception_counters[sender_id]
+                self._counter_writer.record("user", sender_id, None)
+                if self._shared_state is not None:
+                    self._shared_state.delete("user", sender_id)
             
             if group_id and str(group_id) in self.group_interception_counters:
                 del self.group_interception_counters[str(group_id)]
+                self._counter_writer.record("group", str(group_id), None)
+                if self._shared_state is not None:
+                    self._shared_state.delete("group", str(group_id))
             
-            return
+            return None
         
-        # 根据黑名单类型获取相应配置
+        # 根据黑名单类型获取计数，从策略表取回复概率与最大拦截次数（0或负数已解析为禁用保底）
         if blacklist_type == "user":
-            reply_probability = self._get_reply_probability("user")
-            max_interception_cfg = self._get_max_interception_count("user")
-            current_count = self.user_interception_counters.get(target_id, 0)
             counters_dict = self.user_interception_counters
         else:  # group
-            reply_probability = self._get_reply_probability("group")
-            max_interception_cfg = self._get_max_interception_count("group")
-            current_count = self.group_interception_counters.get(target_id, 0)
             counters_dict = self.group_interception_counters
-        
-        log_messages = bool(self.config.get("log_blocked_messages", True))
-        
-        # 确保概率在合理范围内
-        reply_probability = max(0.0, min(1.0, reply_probability))
-        
-        # 解析最大拦截次数，0或负数表示禁用保底机制
-        try:
-            max_interception_count = int(max_interception_cfg)
-            if max_interception_count <= 0:
-                max_interception_count = float('inf')  # 禁用保底机制
-        except (ValueError, TypeError):
-            logger.warning(f"max_interception_count 配置值 '{max_interception_cfg}' 非法，使用默认值")
-            max_interception_count = 5 if blacklist_type == "user" else 8
-        
+        current_count = counters_dict.get(target_id, 0)
+        group_id = event.get_group_id()
+        reply_probability, max_interception_count = self._get_policy_table().lookup(
+            blacklist_type, str(event.get_sender_id()), str(group_id) if group_id else None
+        )
+
+        # 按消息速率降低回复概率：取该用户与所在群中较高的速率
+        if self._rate_tracker is not None:
+            now = time.monotonic()
+            rate = self._rate_tracker.observe(f"u:{event.get_sender_id()}", now)
+            if group_id:
+                rate = max(rate, self._rate_tracker.observe(f"g:{group_id}", now))
+            reply_probability = scale_probability(reply_probability, rate, self._rate_threshold)
+
+        # 与近期群消息近似重复时降低回复概率（保底机制仍然有效）
+        if echo:
+            reply_probability *= self._echo_factor
+            if self._metrics is not None:
+                self._metrics.echo_detected += 1
+
+        # 对话链超过 free_depth 跳后每深一层乘以一次系数；达到深度上限时直接拦截，不触发保底
+        if chain_depth > self._chain_free_depth:
+            reply_probability *= self._chain_factor ** (chain_depth - self._chain_free_depth)
+        chain_capped = 0 < self._chain_max_depth <= chain_depth
+
         # 决定是否回复
-        should_suppress_reply = True
         random_value = random.random()
-        sender_name = event.get_sender_name() or "未知用户"
-        
-        # 生成日志标识
-        if blacklist_type == "user":
-            log_identifier = f"用户: {sender_name}({target_id})"
-        else:
-            log_identifier = f"群聊: {target_id} 中的用户: {sender_name}"
-        
-        # 检查是否触发保底回复
-        if current_count + 1 >= max_interception_count:
-            # 保底回复，重置计数
-            should_suppress_reply = False
-            if log_messages:
-                logger.info(f"弱黑名单保底回复 - {log_identifier}, "
-                           f"已达到最大拦截次数: {current_count}/{max_interception_count}")
-            counters_dict[target_id] = 0
-        # 如果不是保底回复，进行概率判断
-        elif random_value <= reply_probability:
-            # 概率允许回复，重置计数
-            should_suppress_reply = False
-            if log_messages and current_count > 0:
-                logger.info(f"弱黑名单概率允许回复 - {log_identifier}, "
-                           f"概率: {reply_probability:.2f}, 随机值: {random_value:.3f}, 重置拦截计数")
-            counters_dict[target_id] = 0
+        if chain_capped:
+            outcome, new_count = OUTCOME_SUPPRESSED, current_count + 1
+            reply_probability = 0.0
+            if self._metrics is not None:
+                self._metrics.chain_capped += 1
         else:
-            # 拦截回复，增加计数
-            should_suppress_reply = True
-            counters_dict[target_id] = current_count + 1
-            if log_messages:
-                message_preview = event.message_str[:50] + ("..." if len(event.message_str) > 50 else "")
-                logger.info(f"弱黑名单拦截 - {log_identifier}, "
-                           f"消息: {message_preview}, 拦截计数: {counters_dict[target_id]}/{max_interception_count}")
-        
+            outcome, new_count = decide(current_count, reply_probability, max_interception_count, random_value)
+        should_suppress_reply = outcome not in (OUTCOME_GUARANTEE, OUTCOME_PROBABILITY)
+        counters_dict[target_id] = new_count
+        self._counter_writer.record(blacklist_type, target_id, new_count)
+        if self._shared_state is not None:
+            # 以消息键去重：多个实例拦截同一条消息时共享计数只加一
+            message_key = self._message_key(event)
+            if should_suppress_reply:
+                self._shared_state.increment(blacklist_type, target_id, message_key)
+            else:
+                self._shared_state.reset(blacklist_type, target_id, message_key)
+
+        # 决策记录：只组装原始值，日志按采样与限速输出，格式化推迟到真正输出时
+        log_messages = self._log_blocked_messages and (outcome != OUTCOME_PROBABILITY or current_count > 0)
+        if self._decision_trace is not None or log_messages:
+            record = make_record(
+                blacklist_type, target_id, str(event.get_sender_id()), event.get_sender_name(),
+                str(group_id) if group_id else None, outcome, current_count, max_interception_count,
+                reply_probability, random_value, event.message_str or "",
+            )
+            if self._decision_trace is not None:
+                self._decision_trace.record(record)
+            if log_messages and self._log_sampler.allow():
+                dropped = self._log_sampler.take_dropped()
+                suffix = f"（此前省略 {dropped} 条）" if dropped else ""
+                logger.info(format_record(record) + suffix)
+
         # 设置事件标记
         event.set_extra("weak_blacklist_suppress_reply", should_suppress_reply)
+        return outcome
 
     @filter.on_llm_request()
     async def intercept_llm_request(self, event: AstrMessageEvent, req):
         """在LLM请求阶段拦截（如果被标记为需要拦截）"""
-        if event.get_extra("weak_blacklist_suppress_reply") is True:
+        if self._profiler is not None:
+            with self._profiler:
+                await self._intercept_llm_request(event, req)
+            return
+        await self._intercept_llm_request(event, req)
+
+    async def _intercept_llm_request(self, event: AstrMessageEvent, req):
+        """按决策标记、LLM 预算与多实例回复选举决定是否阻止本次 LLM 请求"""
+        start = time.perf_counter_ns() if self._metrics is not None else 0
+        prevented = False
+        suppress = event.get_extra("weak_blacklist_suppress_reply")
+        # 先检查预算（不扣减）：预算不足的实例不参加回复选举，把这条消息留给其他实例
+        use_budget = suppress is not True and (self._group_budget is not None or self._user_budget is not None)
+        now = time.monotonic()
+        budget_denied = use_budget and not self._llm_budget_available(event, suppress is False, now)
+        # 回复选举：本实例决定回复的黑名单消息，只有取得租约的实例真正回复
+        if suppress is False and not budget_denied and self._reply_election and not await self._shared_state.elect(
+                self._message_key(event), self._reply_lease_seconds):
+            event.set_extra("weak_blacklist_suppress_reply", True)
+            suppress = True
+            logger.debug(f"[RandomReply] 其他实例已回复该消息，跳过: {event.get_sender_id()}")
+        # 确定由本实例回复后才扣减预算
+        if use_budget and not budget_denied and suppress is not True:
+            self._consume_llm_budget(event, suppress is False, now)
+        # 黑名单消息通过了预算与选举，确实会回复：对话链记为已回复
+        if suppress is False and not budget_denied and self._chain_tracker is not None:
+            group_id = event.get_group_id()
+            if group_id:
+                self._chain_tracker.mark_replied(str(group_id), str(event.get_sender_id()))
+        if suppress is True or budget_denied:
             # 阻止LLM调用，直接设置空结果并停止事件传播
             # 这样retry插件不会介入，因为根本没有LLM调用发生
             event.set_result(event.plain_result(""))
             event.stop_event()
             event.set_extra("weak_blacklist_suppress_reply", False)
+            prevented = True
+        if self._metrics is not None:
+            tokens = estimate_request_tokens(req, self._budget_chars_per_token, self._budget_output_tokens) if prevented else 0
+            self._metrics.record_intercept(time.perf_counter_ns() - start, prevented, tokens, budget_denied)
+
+    def _budget_keys(self, event: AstrMessageEvent, listed: bool) -> Tuple[Optional[str], Optional[str]]:
+        """返回需要检查的 (群预算键, 用户预算键)，对应的预算未启用时为 None"""
+        group_id = event.get_group_id()
+        group_key = str(group_id) if group_id and self._group_budget is not None else None
+        user_key = str(event.get_sender_id()) if listed and self._user_budget is not None else None
+        return group_key, user_key
+
+    def _llm_budget_available(self, event: AstrMessageEvent, listed: bool, now: float) -> bool:
+        """按群（以及黑名单用户）的令牌桶检查 LLM 请求额度，不扣减"""
+        group_key, user_key = self._budget_keys(event, listed)
+        if group_key is not None and not self._group_budget.available(group_key, now):
+            logger.debug(f"[RandomReply] 群 {group_key} 的 LLM 请求额度已用完，跳过本次请求")
+            return False
+        if user_key is not None and not self._user_budget.available(user_key, now):
+            logger.debug(f"[RandomReply] 用户 {user_key} 的 LLM 请求额度已用完，跳过本次请求")
+            return False
+        return True
+
+    def _consume_llm_budget(self, event: AstrMessageEvent, listed: bool, now: float):
+        """扣减 LLM 请求额度；调用前须已通过 _llm_budget_available 检查，两个桶同时扣减"""
+        group_key, user_key = self._budget_keys(event, listed)
+        if group_key is not None:
+            self._group_budget.consume(group_key, now)
+        if user_key is not None:
+            self._user_budget.consume(user_key, now)
     
+    def _message_key(self, event: AstrMessageEvent) -> str:
+        """跨实例识别同一条消息，用于回复租约与共享计数去重
+
+        各实例看到的消息 ID 不一定相同，改用群号、发送者、时间戳与内容摘要。
+        """
+        group_id = event.get_group_id() or ""
+        timestamp = getattr(event.message_obj, "timestamp", None) or 0
+        digest = zlib.crc32((event.message_str or "").encode("utf-8"))
+        return f"{group_id}:{event.get_sender_id()}:{timestamp}:{digest:08x}"
+
     @filter.command("rrbot")
     async def _cmd_rrbot(self, event: AstrMessageEvent):
         """
@@ -297,20 +482,102 @@ class WeakBlacklistPlugin(Star):
         
         # 列表命令
         if subcommand == "list":
-            yield reply(self._get_list_text())
+            yield reply(self._get_list_text(args[2:]))
             return
         
-        # 添加/移除命令
-        if subcommand in {"add", "remove"}:
+        # 运行统计命令
+        if subcommand == "stats":
+            if self._metrics is None:
+                yield reply("运行统计未启用，请在配置 metrics_settings 中开启。")
+                return
+            if len(args) > 2 and args[2].lower() == "reset":
+                self._metrics.reset()
+                yield reply("运行统计已清零。")
+                return
+            yield reply(self._metrics.render_text() + "\n" + self._get_storage_summary())
+            return
+
+        # 回复策略命令
+        if subcommand == "policy":
+            yield reply(self._handle_policy_command(args[2:]))
+            return
+
+        # 决策记录命令
+        if subcommand == "trace":
+            if self._decision_trace is None:
+                yield reply("决策记录未启用，请在配置 trace_settings 中设置 capacity。")
+                return
+            option = args[2].lower() if len(args) > 2 else ""
+            if option == "dump":
+                yield reply(await self._dump_decision_trace())
+                return
+            try:
+                count = int(option) if option else 20
+            except ValueError:
+                yield reply(f"格式错误，应为：{self.command_prefix} {self.command_identifier} trace [条数|dump]")
+                return
+            yield reply(self._decision_trace.render_text(max(1, count)))
+            return
+
+        # 导出与导入命令
+        if subcommand == "export":
+            target_type, file_name, overwrite = self._parse_io_args(args[2:])
+            yield reply(await self._export_blacklist(target_type, file_name, overwrite))
+            return
+
+        if subcommand == "import":
+            target_type, file_name, _ = self._parse_io_args(args[2:])
+            if not file_name:
+                yield reply(f"格式错误，应为：{self.command_prefix} {self.command_identifier} import [user|group] <文件名>")
+                return
+            yield reply(await self._import_blacklist(target_type or "user", file_name))
+            logger.info(f"弱黑名单命令：import {file_name} by {event.get_sender_id()}")
+            return
+
+        # 黑名单变更审计命令
+        if subcommand == "audit":
+            yield reply(await self._get_audit_text(args[2:]))
+            return
+
+        # 行为识别候选命令
+        if subcommand == "suspects":
+            option = args[2] if len(args) > 2 else ""
+            group_id = None if option.lower() == "all" else (option or event.get_group_id())
+            yield reply(self._get_behavior_candidates_text(str(group_id) if group_id else None))
+            return
+
+        # 性能分析命令
+        if subcommand == "profile":
+            yield reply(await self._handle_profile_command(args[2:]))
+            return
+
+        # 多群扫描命令
+        if subcommand == "scan":
+            group_ids = ",".join(args[2:]) if len(args) > 2 else "all"
+            yield reply(await self._scan_groups_report(event, group_ids))
+            return
+
+        # 添加命令（支持一次添加多个ID）
+        if subcommand == "add":
+            target_type, target_ids = self._parse_command_targets(args[2:])
+            if not target_ids:
+                yield reply(f"格式错误，应为：{self.command_prefix} {self.command_identifier} add [user|group] <QQ号/群号> [更多ID...]")
+                return
+
+            added, duplicates, invalid = self._bulk_add_to_managed_blacklist(target_type, target_ids)
+            yield reply(self._format_bulk_add_feedback(target_type, added, duplicates, invalid))
+            if added:
+                logger.info(f"弱黑名单命令：add {target_type} {','.join(added)} by {event.get_sender_id()}")
+            return
+
+        # 移除命令
+        if subcommand == "remove":
             target_type, target_id = self._parse_command_target(args[2:])
             if not target_id:
-                yield reply(f"格式错误，应为：{self.command_prefix} {self.command_identifier} add/remove [user|group] <QQ号/群号>")
+                yield reply(f"格式错误，应为：{self.command_prefix} {self.command_identifier} remove [user|group] <QQ号/群号>")
                 return
             
-            if subcommand == "add":
-                success, feedback = self._add_to_managed_blacklist(target_type, target_id)
-            else:
-                success, feedback = self._remove_from_managed_blacklist(target_type, target_id)
+            success, feedback = self._remove_from_managed_blacklist(target_type, target_id)
             
             yield reply(feedback)
             if success:
@@ -326,44 +593,205 @@ class WeakBlacklistPlugin(Star):
         lines = [
             "随机回复插件命令帮助：",
             f"{self.command_prefix} {identifier_hint} help  - 查看该帮助",
-            f"{self.command_prefix} {identifier_hint} list  - 查看当前弱黑名单及拦截计数",
-            f"{self.command_prefix} {identifier_hint} add [user|group] <ID>    - 添加用户或群聊到弱黑名单（默认 user）",
-            f"{self.command_prefix} {identifier_hint} remove [user|group] <ID> - 从动态弱黑名单移除指定目标"
+            f"{self.command_prefix} {identifier_hint} list [user|group] [页码] [by:id|count|recent] [prefix:前缀] [find:关键字] - 分页查看弱黑名单及拦截计数",
+            f"{self.command_prefix} {identifier_hint} add [user|group] <ID> [ID...] - 添加用户或群聊到弱黑名单（默认 user，可一次添加多个）",
+            f"{self.command_prefix} {identifier_hint} remove [user|group] <ID> - 从动态弱黑名单移除指定目标",
+            f"{self.command_prefix} {identifier_hint} stats [reset] - 查看（或清零）拦截效果与耗时统计",
+            f"{self.command_prefix} {identifier_hint} policy [set <目标> <概率> [保底次数] | del <目标>] - 查看或修改按群/用户覆盖的回复策略",
+            f"{self.command_prefix} {identifier_hint} trace [条数|dump] - 查看最近的决策记录（默认 20 条），dump 导出为 JSONL 文件",
+            f"{self.command_prefix} {identifier_hint} export [user|group|all] [文件名] [overwrite] - 把弱黑名单导出到数据目录下的 exports 目录（默认全部，CSV 格式；同名文件已存在时需加 overwrite 才会覆盖）",
+            f"{self.command_prefix} {identifier_hint} import [user|group] <文件名> - 从 exports 目录中的 CSV 或每行一个ID的文件批量导入",
+            f"{self.command_prefix} {identifier_hint} audit [条数] [user|group <ID>] - 查看动态黑名单的添加与移除记录（仅 SQLite 后端）",
+            f"{self.command_prefix} {identifier_hint} suspects [群号|all] - 查看按发言行为识别的疑似机器人（默认当前群）",
+            f"{self.command_prefix} {identifier_hint} profile start [秒数] [mem] | stop - 开启或结束性能分析（默认 60 秒后自动结束），报告写入数据目录",
+            f"{self.command_prefix} {identifier_hint} scan [all|群号...] - 并发扫描多个群中的疑似机器人（默认全部已加入的群）"
         ]
         return "\n".join(lines)
     
-    def _get_list_text(self) -> str:
-        """返回列表文本"""
-        users, groups = self._get_combined_blacklists()
-        user_cfg = self._get_user_config()
-        group_cfg = self._get_group_config()
-        users_enabled = bool(user_cfg.get("enable", True))
-        groups_enabled = bool(group_cfg.get("enable", True))
+    def _handle_policy_command(self, args: List[str]) -> str:
+        """处理 policy 子命令：查看、设置或删除覆盖规则，修改后写回配置并重新编译策略表"""
+        usage = (f"格式：{self.command_prefix} {self.command_identifier} policy set <目标> <概率|-> [保底次数]\n"
+                 f"或：{self.command_prefix} {self.command_identifier} policy del <目标>\n"
+                 "目标为 user:<QQ号>、group:<群号> 或 group:<群号>/user:<QQ号>，保底次数为 0 表示禁用保底")
+        action = args[0].lower() if args else ""
+        if not action or action == "list":
+            return self._get_policy_table().render_text()
+        if action not in ("set", "del") or len(args) < 2:
+            return usage
+
+        try:
+            key = parse_target(args[1])
+            if action == "set":
+                if len(args) < 3:
+                    return usage
+                probability = "" if args[2] == "-" else args[2]
+                line = f"{format_target(key)}={probability}" + (f",{args[3]}" if len(args) > 3 else "")
+                key, policy = parse_override(line)
+        except ValueError as e:
+            return f"策略格式错误：{e}\n{usage}"
+
+        overrides = dict(self._get_policy_table().overrides)
+        if action == "set":
+            overrides[key] = policy
+            feedback = f"已设置回复策略：{format_override(key, policy)}"
+        elif overrides.pop(key, None) is None:
+            return f"{format_target(key)} 没有覆盖规则。"
+        else:
+            feedback = f"已删除 {format_target(key)} 的回复策略。"
+
+        section = dict(self._get_config_section("policy_settings"))
+        section["overrides"] = [format_override(k, v) for k, v in overrides.items()]
+        self.config["policy_settings"] = section
+        self._policy_table = None
+        self._save_config()
+        return feedback
+
+    async def _handle_profile_command(self, args: List[str]) -> str:
+        """处理 profile 子命令：start [秒数] [mem] 开启分析，stop 结束并写出报告"""
+        usage = f"格式：{self.command_prefix} {self.command_identifier} profile start [秒数] [mem] | stop"
+        action = args[0].lower() if args else ""
+        if not action:
+            if self._profiler is None:
+                return f"性能分析未开启。{usage}"
+            elapsed = time.time() - self._profiler.started_at
+            return f"性能分析进行中（已 {elapsed:.0f} 秒，{self._profiler.entries} 次调用）。"
+        if action == "stop":
+            if self._profiler is None:
+                return "性能分析未开启。"
+            return await self._stop_profiling()
+        if action != "start":
+            return usage
+        if self._profiler is not None:
+            return "性能分析已在进行中，请先 stop。"
+
+        seconds = 60.0
+        memory = False
+        for option in args[1:]:
+            if option.lower() == "mem":
+                memory = True
+                continue
+            try:
+                seconds = max(0.0, float(option))
+            except ValueError:
+                return usage
+        self._profiler = PluginProfiler(memory=memory)
+        if seconds > 0:
+            self._profile_stop_handle = asyncio.get_running_loop().call_later(seconds, self._auto_stop_profiling)
+        duration = f"{seconds:g} 秒后自动结束" if seconds > 0 else "直到手动 stop"
+        return f"已开启性能分析（{duration}{'，含内存快照' if memory else ''}）。"
+
+    def _auto_stop_profiling(self):
+        self._profile_stop_handle = None
+        self._profile_stop_task = asyncio.ensure_future(self._stop_profiling())
+
+    def _structure_sizes(self) -> Dict[str, int]:
+        """估算计数器与黑名单结构的内存占用（字节）"""
+        index = self._get_blacklist_index()
+        sizes = {
+            "用户拦截计数": self.user_interception_counters.memory_footprint(),
+            "群聊拦截计数": self.group_interception_counters.memory_footprint(),
+        }
+        for name, members in (("用户黑名单索引", index.users), ("群聊黑名单索引", index.groups)):
+            sizes[name] = sys.getsizeof(members) + sum(sys.getsizeof(item) for item in members)
+        return sizes
+
+    async def _stop_profiling(self) -> str:
+        """结束性能分析，把文本报告与 pstats 文件写入数据目录"""
+        profiler = self._profiler
+        if profiler is None:
+            return "性能分析未开启。"
+        self._profiler = None
+        if self._profile_stop_handle is not None:
+            self._profile_stop_handle.cancel()
+            self._profile_stop_handle = None
+
+        report = profiler.stop(Path(__file__).resolve().parent, self._structure_sizes())
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(now))}_{int(now * 1000) % 1000:03d}"
+        text_path = self.data_dir / f"profile_{stamp}.txt"
+        stats_path = self.data_dir / f"profile_{stamp}.prof"
+        try:
+            await self._writer.run(atomic_write_text, text_path, report)
+            await self._writer.run(profiler.dump, stats_path)
+        except Exception as e:
+            logger.error(f"[RandomReply] 写入性能分析报告失败: {e}")
+            return f"写入性能分析报告失败：{e}"
+        logger.info(f"[RandomReply] 性能分析已结束，报告: {text_path}")
+        return f"性能分析已结束（{profiler.entries} 次调用），报告已写入 {text_path}，pstats 文件 {stats_path.name}"
+
+    async def _dump_decision_trace(self) -> str:
+        """把决策记录导出到数据目录下的 JSONL 文件，写盘在线程池中完成"""
+        text = self._decision_trace.to_jsonl()
+        path = self.data_dir / f"decision_trace_{time.strftime('%Y%m%d_%H%M%S')}.jsonl"
+        try:
+            await self._writer.run(atomic_write_text, path, text)
+        except Exception as e:
+            logger.error(f"[RandomReply] 导出决策记录失败: {e}")
+            return f"导出决策记录失败：{e}"
+        return f"已导出 {len(self._decision_trace)} 条决策记录到 {path}"
+
+    def _get_list_text(self, args: Optional[List[str]] = None) -> str:
+        """返回分页的黑名单列表文本，支持按类型、前缀/关键字过滤与排序"""
+        try:
+            query = parse_list_args(args or [])
+        except ValueError as e:
+            return (f"{e}\n格式：{self.command_prefix} {self.command_identifier} list [user|group] [页码] "
+                    "[by:id|count|recent] [prefix:前缀] [find:关键字]")
+
+        index = self._get_blacklist_index()
         lines = ["弱黑名单当前状态："]
+        kinds = (query.target_type,) if query.target_type else ("user", "group")
+        for kind in kinds:
+            lines.extend(self._render_list_section(index, kind, query))
 
-        if not users_enabled:
-            lines.append("用户弱黑名单：已禁用。")
-        elif users:
-            lines.append("用户：")
-            for uid in sorted(users):
-                count = self.user_interception_counters.get(uid, 0)
-                source = "动态" if uid in self.managed_blacklisted_users else "配置"
-                lines.append(f"- {uid}（{source}，拦截 {count} 次）")
+        footprint = (self.user_interception_counters.memory_footprint()
+                     + self.group_interception_counters.memory_footprint())
+        lines.append(f"拦截计数：用户 {len(self.user_interception_counters)} 项，"
+                     f"群聊 {len(self.group_interception_counters)} 项，约占内存 {footprint / 1024:.1f} KB")
+        return "\n".join(lines)
+
+    def _render_list_section(self, index: BlacklistIndex, kind: str, query: ListQuery) -> List[str]:
+        """渲染一种类型的一页黑名单"""
+        if kind == "group":
+            type_name, enabled = "群聊", index.groups_enabled
+            managed, counters = self.managed_blacklisted_groups, self.group_interception_counters
         else:
-            lines.append("用户黑名单为空。")
-
-        if not groups_enabled:
-            lines.append("群聊弱黑名单：已禁用。")
-        elif groups:
-            lines.append("群聊：")
-            for gid in sorted(groups):
-                count = self.group_interception_counters.get(gid, 0)
-                source = "动态" if gid in self.managed_blacklisted_groups else "配置"
-                lines.append(f"- {gid}（{source}，拦截 {count} 次）")
+            type_name, enabled = "用户", index.users_enabled
+            managed, counters = self.managed_blacklisted_users, self.user_interception_counters
+
+        if not enabled:
+            return [f"{type_name}弱黑名单：已禁用。"]
+        members = index.members(kind)
+        if not members:
+            return [f"{type_name}黑名单为空。"]
+
+        items, total, complete = query_page(index.sorted_ids(kind), members, counters, query, _LIST_PAGE_SIZE)
+        if not total:
+            return [f"{type_name}：没有符合条件的目标。"]
+        order_name = {"id": "按ID", "count": "按拦截次数", "recent": "按最后拦截时间"}[query.order]
+        if complete:
+            pages = (total + _LIST_PAGE_SIZE - 1) // _LIST_PAGE_SIZE
+            lines = [f"{type_name}（共 {total} 个，{order_name}，第 {query.page}/{pages} 页）："]
         else:
-            lines.append("群聊黑名单为空。")
+            # 按计数或时间排序时只遍历到本页为止，总数未知
+            pages = query.page + 1
+            lines = [f"{type_name}（{order_name}，第 {query.page} 页，后面还有更多）："]
+        for target_id, count, last_seen in items:
+            source = "动态" if target_id in managed else "配置"
+            seen = f"，最后 {time.strftime('%m-%d %H:%M', time.localtime(last_seen))}" if last_seen else ""
+            lines.append(f"- {target_id}（{source}，拦截 {count} 次{seen}）")
+        if not items:
+            lines.append("该页没有内容。")
+        elif query.page < pages:
+            lines.append(f"下一页：{self.command_prefix} {self.command_identifier} list {query.to_args(kind, query.page + 1)}")
+        return lines
 
-        return "\n".join(lines)
+    def _get_storage_summary(self) -> str:
+        """拦截计数存储的规模、淘汰情况与持久化写入失败次数，附在 stats 输出末尾"""
+        users, groups = self.user_interception_counters, self.group_interception_counters
+        return (f"拦截计数：用户 {len(users)} 项、群聊 {len(groups)} 项（上限各 {users.max_entries} 项），"
+                f"因过期或超出容量已淘汰用户 {users.evicted} 项、群聊 {groups.evicted} 项\n"
+                f"持久化写入失败 {self._writer.failures} 次（详见错误日志）")
 
     def _parse_command_target(self, args: List[str]) -> Tuple[str, Optional[str]]:
         """解析命令中的目标类型与ID"""
@@ -386,8 +814,140 @@ class WeakBlacklistPlugin(Star):
 
         return target_type, target_id
 
+    def _parse_command_targets(self, args: List[str]) -> Tuple[str, List[str]]:
+        """解析命令中的目标类型与多个ID（支持空格或英文逗号分隔）"""
+        if not args:
+            return "user", []
+
+        first = args[0].lower()
+        target_type = "user"
+        if first in {"user", "u", "group", "g"}:
+            target_type = "group" if first in {"group", "g"} else "user"
+            args = args[1:]
+
+        target_ids = [part.strip() for arg in args for part in arg.split(",") if part.strip()]
+        return target_type, target_ids
+
+    async def _get_audit_text(self, args: List[str]) -> str:
+        """列出最近的动态黑名单变更记录，可按目标过滤；查询在写入线程中执行"""
+        if self._storage is None:
+            return "审计记录仅在 SQLite 后端下保存，请将 persistence_settings.storage_backend 设置为 sqlite。"
+        limit = 20
+        if args and args[0].isdigit():
+            limit = max(1, min(200, int(args[0])))
+            args = args[1:]
+        target_type, target_id = self._parse_command_target(args) if args else ("user", None)
+        rows = await self._writer.run(self._storage.recent_audit, limit, target_type, target_id)
+        scope = f"{'群聊' if target_type == 'group' else '用户'} {target_id} 的" if target_id else ""
+        if not rows:
+            return f"暂无{scope}黑名单变更记录。"
+        actions = {"add": "添加", "remove": "移除"}
+        lines = [f"最近 {len(rows)} 条{scope}黑名单变更记录："]
+        for ts, action, row_type, row_id in rows:
+            when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
+            lines.append(f"- {when} {actions.get(action, action)} {'群聊' if row_type == 'group' else '用户'} {row_id}")
+        return "\n".join(lines)
+
+    def _get_behavior_candidates_text(self, group_id: Optional[str], limit: int = 20) -> str:
+        """列出发言行为像机器人、但尚未加入弱黑名单的发送者"""
+        if self._behavior_detector is None:
+            return "行为识别未启用，请在配置 behavior_settings 中开启。"
+        candidates = self._behavior_detector.candidates(group_id, self._get_blacklist_index().users, limit)
+        scope = f"群 {group_id} " if group_id else "所有群"
+        if not candidates:
+            return (f"{scope}中暂未发现行为可疑的账号（已统计 {len(self._behavior_detector)} 个发送者，"
+                    f"至少 {self._behavior_detector.min_messages} 条消息后才会评估）。")
+        lines = [f"{scope}中按发言行为识别的疑似机器人（{len(candidates)} 个）："]
+        for score, gid, sender_id, profile, reasons in candidates:
+            name = f" {profile.sender_name}" if profile.sender_name else ""
+            lines.append(f"- {sender_id}{name}（群 {gid}，{profile.messages} 条消息）：{'；'.join(reasons)}")
+        lines.append("确认后可使用 add 命令或 batch_add_to_blacklist 工具加入弱黑名单。")
+        return "\n".join(lines)
+
+    def _parse_io_args(self, args: List[str]) -> Tuple[Optional[str], str, bool]:
+        """解析 export/import 的参数：[user|group|all] [文件名] [overwrite]，类型为 all 或省略时返回 None"""
+        target_type: Optional[str] = None
+        overwrite = bool(args) and args[-1].lower() == "overwrite"
+        if overwrite:
+            args = args[:-1]
+        if args and args[0].lower() in {"user", "u", "group", "g", "all"}:
+            first = args[0].lower()
+            target_type = None if first == "all" else ("group" if first in {"group", "g"} else "user")
+            args = args[1:]
+        return target_type, args[0] if args else "", overwrite
+
+    async def _export_blacklist(self, target_type: Optional[str], file_name: str = "",
+                                overwrite: bool = False) -> str:
+        """把当前弱黑名单（配置 + 动态）流式写入导入导出目录下的文件
+
+        导出全部类型或文件名以 .csv 结尾时写入带类型列的 CSV，否则每行一个ID。
+        同名文件已存在时只有 overwrite 为 True 才会替换。
+        ID 列表在事件循环中复制，写盘在写入线程中分块完成。
+        """
+        if not file_name:
+            suffix = "csv" if target_type is None else "txt"
+            file_name = f"blacklist_export_{target_type or 'all'}_{time.strftime('%Y%m%d_%H%M%S')}.{suffix}"
+        try:
+            path = resolve_exchange_file(self.exchange_dir, file_name)
+        except ValueError as e:
+            return str(e)
+
+        index = self._get_blacklist_index()
+        targets = export_targets(index.users, index.groups, target_type)
+        as_csv = target_type is None or path.suffix.lower() == ".csv"
+        try:
+            await self._writer.run(write_id_file, path, iter_export_rows(targets, as_csv), overwrite)
+        except FileExistsError:
+            return f"导入导出目录中已存在文件 {path.name}，如需覆盖请在命令末尾加上 overwrite。"
+        except Exception as e:
+            logger.error(f"[RandomReply] 导出弱黑名单失败: {e}")
+            return f"导出弱黑名单失败：{e}"
+        counts = "，".join(f"{'群聊' if kind == 'group' else '用户'} {len(ids)} 个" for kind, ids in targets.items())
+        return f"已导出弱黑名单（{counts}）到 {path}"
+
+    async def _import_blacklist(self, target_type: str, file_name: str) -> str:
+        """从导入导出目录下的文件导入弱黑名单
+
+        文件在写入线程中逐行解析与校验，每种类型作为一个批次写入动态黑名单，
+        只持久化一次、同步配置一次。未标明类型的行按 target_type 处理。
+        """
+        try:
+            path = resolve_exchange_file(self.exchange_dir, file_name)
+        except ValueError as e:
+            return str(e)
+        try:
+            result = await self._writer.run(read_id_file, path, target_type, self._is_valid_target_id)
+        except FileNotFoundError:
+            return f"导入导出目录中不存在文件 {file_name}（{self.exchange_dir}）。"
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            logger.error(f"[RandomReply] 读取导入文件失败: {e}")
+            return f"读取导入文件失败：{e}"
+
+        lines = [f"已读取 {path.name}（{result.lines} 行）："]
+        duplicate_total = 0
+        invalid_total = result.invalid
+        for kind, target_ids in result.ids.items():
+            if not target_ids:
+                continue
+            added, duplicates, invalid = self._bulk_add_to_managed_blacklist(kind, target_ids)
+            duplicate_total += len(duplicates)
+            invalid_total += len(invalid)
+            lines.append(f"{'群聊' if kind == 'group' else '用户'}：新增 {len(added)} 个，重复 {len(duplicates)} 个")
+            if added:
+                logger.info(f"[RandomReply] 从 {path.name} 导入 {len(added)} 个{kind}到弱黑名单")
+        if len(lines) == 1:
+            lines.append("没有可导入的有效ID。")
+        lines.append(f"合计重复 {duplicate_total} 个，无效 {invalid_total} 个")
+        if result.invalid_samples:
+            lines.append("无效条目示例：" + "；".join(result.invalid_samples[:5]))
+        return "\n".join(lines)
+
     def _sync_to_config(self, target_type: str, target_id: str, action: str = "add"):
         """将动态黑名单变更同步到 dashboard 配置，使其在后台界面可见"""
+        self._sync_many_to_config(target_type, [target_id], action)
+
+    def _sync_many_to_config(self, target_type: str, target_ids: List[str], action: str = "add"):
+        """将一批动态黑名单变更同步到 dashboard 配置，只保存一次"""
         try:
             if target_type == "group":
                 cfg_key = "group_settings"
@@ -400,37 +960,90 @@ class WeakBlacklistPlugin(Star):
             if not isinstance(section, dict):
                 section = {}
             current_list = list(section.get(list_key, []))
+            present = {str(item) for item in current_list}
 
             if action == "add":
-                if target_id not in current_list:
-                    current_list.append(target_id)
+                for target_id in target_ids:
+                    if target_id not in present:
+                        current_list.append(target_id)
+                        present.add(target_id)
             elif action == "remove":
-                if target_id in current_list:
-                    current_list.remove(target_id)
+                removing = set(target_ids) & present
+                if removing:
+                    current_list = [item for item in current_list if str(item) not in removing]
 
             section[list_key] = current_list
             self.config[cfg_key] = section
-            self.config.save_config()
-            logger.debug(f"已同步弱黑名单变更到配置: {action} {target_type} {target_id}")
+            self._invalidate_blacklist_index()
+            self._save_config()
+            logger.debug(f"已同步弱黑名单变更到配置: {action} {target_type} {len(target_ids)} 项")
         except Exception as e:
             logger.error(f"同步黑名单到配置文件失败: {e}")
 
+    def _is_valid_target_id(self, target_id: str) -> bool:
+        """校验QQ号/群号等目标ID格式"""
+        return bool(_TARGET_ID_PATTERN.match(target_id))
+
+    def _bulk_add_to_managed_blacklist(self, target_type: str, target_ids: List[str]) -> Tuple[List[str], List[str], List[str]]:
+        """批量向动态黑名单中添加目标
+
+        整批ID只对索引做一次校验与去重，一次性写入内存、持久化一次并同步配置一次。
+        返回 (已添加, 重复, 无效) 三个列表。
+        """
+        index = self._get_blacklist_index()
+        if target_type == "group":
+            existing, managed = index.groups, self.managed_blacklisted_groups
+        else:
+            existing, managed = index.users, self.managed_blacklisted_users
+
+        added: List[str] = []
+        duplicates: List[str] = []
+        invalid: List[str] = []
+        seen: Set[str] = set()
+        for raw_id in target_ids:
+            target_id = str(raw_id).strip()
+            if not self._is_valid_target_id(target_id):
+                invalid.append(target_id)
+            elif target_id in seen or target_id in existing or target_id in managed:
+                duplicates.append(target_id)
+            else:
+                added.append(target_id)
+            seen.add(target_id)
+
+        if not added:
+            return added, duplicates, invalid
+
+        managed.update(added)
+        self._invalidate_blacklist_index()
+        self._persist_managed_batch(target_type, added)
+        if self._shared_state is not None:
+            self._shared_state.member_changed(target_type, added, True)
+        self._sync_many_to_config(target_type, added, "add")
+        return added, duplicates, invalid
+
+    def _format_bulk_add_feedback(self, target_type: str, added: List[str], duplicates: List[str], invalid: List[str]) -> str:
+        """生成批量添加结果文本"""
+        type_name = "群聊" if target_type == "group" else "用户"
+        lines = []
+        if added:
+            lines.append(f"已将 {len(added)} 个{type_name}添加至弱黑名单：{', '.join(added)}")
+        if duplicates:
+            lines.append(f"跳过 {len(duplicates)} 个已存在的{type_name}：{', '.join(duplicates)}")
+        if invalid:
+            lines.append(f"忽略 {len(invalid)} 个格式无效的ID：{', '.join(invalid)}")
+        return "\n".join(lines) if lines else "没有执行任何操作。"
+
     def _add_to_managed_blacklist(self, target_type: str, target_id: str) -> Tuple[bool, str]:
         """向动态黑名单中添加目标"""
         target_id = str(target_id)
-        config_users, config_groups = self._get_combined_blacklists()
+        added, duplicates, invalid = self._bulk_add_to_managed_blacklist(target_type, [target_id])
 
-        if target_type == "group":
-            if target_id in config_groups:
+        if invalid:
+            return False, f"ID {target_id} 格式无效。"
+        if duplicates:
+            if target_type == "group":
                 return False, f"群聊 {target_id} 已存在于黑名单中。"
-            self.managed_blacklisted_groups.add(target_id)
-        else:
-            if target_id in config_users:
-                return False, f"用户 {target_id} 已存在于黑名单中。"
-            self.managed_blacklisted_users.add(target_id)
-
-        self._save_managed_blacklist()
-        self._sync_to_config(target_type, target_id, "add")
+            return False, f"用户 {target_id} 已存在于黑名单中。"
         return True, f"已将 {target_type} {target_id} 添加至弱黑名单。"
 
     def _remove_from_managed_blacklist(self, target_type: str, target_id: str) -> Tuple[bool, str]:
@@ -438,21 +1051,87 @@ class WeakBlacklistPlugin(Star):
         target_id = str(target_id)
 
         if target_type == "group":
-            if target_id in self.managed_blacklisted_groups:
-                self.managed_blacklisted_groups.remove(target_id)
-                self.group_interception_counters.pop(target_id, None)
-                self._save_managed_blacklist()
-                self._sync_to_config(target_type, target_id, "remove")
-                return True, f"已将群聊 {target_id} 从弱黑名单移除。"
-            return False, f"群聊 {target_id} 不在动态黑名单中（配置文件中的请在后台操作）。"
-
-        if target_id in self.managed_blacklisted_users:
-            self.managed_blacklisted_users.remove(target_id)
-            self.user_interception_counters.pop(target_id, None)
-            self._save_managed_blacklist()
+            managed, shared, counters = self.managed_blacklisted_groups, self._shared_groups, self.group_interception_counters
+            type_name = "群聊"
+        else:
+            managed, shared, counters = self.managed_blacklisted_users, self._shared_users, self.user_interception_counters
+            type_name = "用户"
+
+        if target_id not in managed and target_id not in shared:
+            return False, f"{type_name} {target_id} 不在动态黑名单中（配置文件中的请在后台操作）。"
+
+        if counters.pop(target_id, None) is not None:
+            self._counter_writer.record(target_type, target_id, None)
+        if target_id in managed:
+            managed.remove(target_id)
+            self._invalidate_blacklist_index()
+            self._persist_managed_change(target_type, target_id, "remove")
             self._sync_to_config(target_type, target_id, "remove")
-            return True, f"已将用户 {target_id} 从弱黑名单移除。"
-        return False, f"用户 {target_id} 不在动态黑名单中（配置文件中的请在后台操作）。"
+        if self._shared_state is not None:
+            # 移除同步给所有实例，包括由其他实例添加的目标
+            self._shared_state.member_changed(target_type, [target_id], False)
+            self._shared_state.delete(target_type, target_id)
+            if target_id in shared:
+                self._on_shared_members_changed(
+                    self._shared_users - {target_id} if target_type == "user" else self._shared_users,
+                    self._shared_groups - {target_id} if target_type == "group" else self._shared_groups,
+                )
+        return True, f"已将{type_name} {target_id} 从弱黑名单移除。"
+
+    def _on_shared_members_changed(self, users: FrozenSet[str], groups: FrozenSet[str]):
+        """共享黑名单发生变化：更新本地副本，其他实例移除的目标也从本实例的动态黑名单中移除"""
+        if users == self._shared_users and groups == self._shared_groups:
+            return
+        removed = (
+            ("user", self._shared_users - users, self.managed_blacklisted_users),
+            ("group", self._shared_groups - groups, self.managed_blacklisted_groups),
+        )
+        self._shared_users = users
+        self._shared_groups = groups
+        self._invalidate_blacklist_index()
+        for target_type, gone, managed in removed:
+            gone = sorted(gone & managed)
+            if not gone:
+                continue
+            managed.difference_update(gone)
+            for target_id in gone:
+                self._persist_managed_change(target_type, target_id, "remove")
+            self._sync_many_to_config(target_type, gone, "remove")
+            logger.info(f"[RandomReply] 其他实例已移除弱黑名单{target_type}: {', '.join(gone)}")
+
+    def _on_shared_counter_changed(self, kind: str, key: str, value: Optional[int]):
+        """合并了其他实例的计数后，写入本实例的计数日志或数据库"""
+        self._counter_writer.record(kind, key, value)
+
+    def _init_shared_state(self):
+        """按 shared_settings 连接多实例共享状态文件"""
+        shared_cfg = self._get_config_section("shared_settings")
+        path = str(shared_cfg.get("path", "")).strip()
+        if not bool(shared_cfg.get("enable", False)) or not path:
+            return
+        instance_id = str(shared_cfg.get("instance_id", "")).strip() or self.command_identifier or "default"
+        try:
+            store = SharedStateStore(Path(path), instance_id)
+        except Exception as e:
+            logger.error(f"[RandomReply] 打开共享状态文件失败，已禁用共享: {e}")
+            return
+        self._shared_state = SharedStateSync(
+            store,
+            {"user": self.user_interception_counters, "group": self.group_interception_counters},
+            self._on_shared_members_changed,
+            self._on_shared_counter_changed,
+            sync_interval=self._get_float_setting(shared_cfg, "sync_interval", 2.0),
+        )
+        self._reply_election = bool(shared_cfg.get("reply_election", False))
+        self._reply_lease_seconds = max(1.0, self._get_float_setting(shared_cfg, "lease_seconds", 30.0))
+        # 本实例已有的动态黑名单在首次同步时与共享文件对账：没有移除记录的加入共享，
+        # 离线期间已被其他实例移除的目标在拉取结果中缺失，按其他实例移除处理
+        self._shared_users = frozenset(self.managed_blacklisted_users)
+        self._shared_groups = frozenset(self.managed_blacklisted_groups)
+        self._shared_state.offer_members("user", sorted(self.managed_blacklisted_users))
+        self._shared_state.offer_members("group", sorted(self.managed_blacklisted_groups))
+        # 首次同步在收到第一条消息、启动后台同步任务时进行，不在加载插件时阻塞事件循环
+        logger.info(f"[RandomReply] 已启用多实例共享状态: {path}（实例 {instance_id}）")
 
     def _migrate_data_if_needed(self):
         """从旧数据目录迁移到新目录"""
@@ -480,19 +1159,61 @@ class WeakBlacklistPlugin(Star):
                     logger.info(f"[RandomReply] 检测到旧数据目录，开始迁移: {old_data_dir} -> {self.data_dir}")
                     for old_path in old_files:
                         if old_path.is_file():
-                            shutil.copy2(old_path, self.data_dir / old_path.name)
+                            # 先复制到临时文件再原子替换，中断时不会留下半截文件
+                            tmp_path = self.data_dir / (old_path.name + ".tmp")
+                            shutil.copy2(old_path, tmp_path)
+                            os.replace(tmp_path, self.data_dir / old_path.name)
                             logger.info(f"[RandomReply] 迁移文件: {old_path.name}")
                     logger.info(f"[RandomReply] 数据迁移完成，旧目录保留供备份: {old_data_dir}")
                     return  # 迁移成功后退出
 
+    def _create_counter_journal(self, flush_interval: float = 30.0, flush_threshold: int = 100) -> CounterJournal:
+        """创建基于 JSON 文件的计数器后写日志"""
+        return CounterJournal(
+            self.data_dir / "interception_counters.journal",
+            {"user": self.user_counters_path, "group": self.group_counters_path},
+            self._snapshot_interception_counters,
+            flush_interval=flush_interval,
+            flush_threshold=flush_threshold,
+        )
+
+    def _migrate_json_to_sqlite_if_needed(self):
+        """首次启用 SQLite 后端时，从旧的 JSON 文件一次性迁移数据"""
+        if self._storage.is_migrated():
+            return
+
+        # 读取 JSON 快照并重放尚未合并的增量日志
+        self._load_interception_counters()
+        self._load_managed_blacklist()
+        counters = {
+            "user": self.user_interception_counters,
+            "group": self.group_interception_counters,
+        }
+        replayed = self._create_counter_journal().replay(counters)
+
+        total = (len(self.managed_blacklisted_users) + len(self.managed_blacklisted_groups)
+                 + len(self.user_interception_counters) + len(self.group_interception_counters))
+        if total:
+            logger.info(f"[RandomReply] 检测到 JSON 数据，开始迁移到 SQLite: {self._storage.db_path}"
+                        f"（含增量日志 {replayed} 条）")
+        self._storage.import_state(self.managed_blacklisted_users, self.managed_blacklisted_groups,
+                                   self._snapshot_interception_counters())
+        if total:
+            logger.info("[RandomReply] SQLite 迁移完成，旧 JSON 文件保留供备份")
+
     def __init__(self, context: Context, config: AstrBotConfig):
         super().__init__(context)
         self.config = config
         
         # 初始化数据目录和文件路径（使用框架标准接口）
         self.data_dir: Path = StarTools.get_data_dir("astrbot_plugin_random_reply")
+        # export/import 只读写该子目录，与插件自身的状态文件隔离
+        self.exchange_dir = self.data_dir / "exports"
+        # 运行期的全部持久化写入都交给专用写入线程，事件循环不做磁盘 I/O
+        self._writer = PersistenceWriter()
         
-        # 自动数据迁移：从旧目录迁移到新目录
+        # 自动数据迁移：从旧目录迁移到新目录。一次性操作，且必须在下面同步加载状态文件之前完成，
+        # 因此与加载一样在初始化时同步执行；新目录已有数据时只做一次目录检查
         self._migrate_data_if_needed()
         
         self.user_counters_path = self.data_dir / "user_interception_counters.json"
@@ -500,14 +1221,155 @@ class WeakBlacklistPlugin(Star):
         self.managed_blacklist_path = self.data_dir / "managed_blacklist.json"
         
         # 初始化运行时数据
-        self.user_interception_counters: Dict[str, int] = {}
-        self.group_interception_counters: Dict[str, int] = {}
+        counter_cfg = self._get_config_section("counter_settings")
+        counter_max_entries = int(self._get_float_setting(counter_cfg, "max_entries", 10000))
+        counter_decay = self._get_float_setting(counter_cfg, "decay_seconds", 86400.0)
+        self._counter_writer = None
+        self.user_interception_counters = CounterStore(
+            counter_max_entries, counter_decay, lambda key: self._on_counter_evicted("user", key)
+        )
+        self.group_interception_counters = CounterStore(
+            counter_max_entries, counter_decay, lambda key: self._on_counter_evicted("group", key)
+        )
         self.managed_blacklisted_users: Set[str] = set()
         self.managed_blacklisted_groups: Set[str] = set()
         
         # 加载持久化数据
-        self._load_interception_counters()
-        self._load_managed_blacklist()
+        persistence_cfg = self._get_config_section("persistence_settings")
+        flush_interval = self._get_float_setting(persistence_cfg, "flush_interval", 30.0)
+        flush_threshold = int(self._get_float_setting(persistence_cfg, "flush_threshold", 100))
+        self.storage_backend = str(persistence_cfg.get("storage_backend", "json")).strip().lower()
+        self._storage: Optional[SqliteStorage] = None
+
+        if self.storage_backend == "sqlite":
+            self._storage = SqliteStorage(self.data_dir / "random_reply.db")
+            self._migrate_json_to_sqlite_if_needed()
+            self.managed_blacklisted_users, self.managed_blacklisted_groups = self._storage.load_blacklist()
+            counters = self._storage.load_counters()
+            self.user_interception_counters.load(counters.get("user", {}))
+            self.group_interception_counters.load(counters.get("group", {}))
+            # 计数器后写：合并后的变更批量 upsert 到 SQLite
+            self._counter_writer = SqliteCounterWriter(
+                self._storage, flush_interval=flush_interval, flush_threshold=flush_threshold
+            )
+            self._counter_writer.executor = self._writer.executor
+        else:
+            self._load_interception_counters()
+            self._load_managed_blacklist()
+            # 计数器后写日志：消息路径只改内存，由后台任务定期落盘
+            self._counter_writer = self._create_counter_journal(flush_interval, flush_threshold)
+            self._counter_writer.executor = self._writer.executor
+            counters = {
+                "user": self.user_interception_counters,
+                "group": self.group_interception_counters,
+            }
+            replayed = self._counter_writer.replay(counters)
+            if replayed:
+                logger.info(f"[RandomReply] 已从增量日志恢复 {replayed} 条拦截计数变更")
+
+        # 黑名单索引：仅在配置或动态黑名单变化时重新编译
+        self._blacklist_index: Optional[BlacklistIndex] = None
+        # 回复策略表：全局默认与覆盖规则编译后缓存
+        self._policy_table: Optional[PolicyTable] = None
+
+        # 多实例共享状态：其他实例添加的动态黑名单单独保存，不写入本实例配置
+        self._shared_users: FrozenSet[str] = frozenset()
+        self._shared_groups: FrozenSet[str] = frozenset()
+        self._shared_state: Optional[SharedStateSync] = None
+        self._reply_election = False
+        self._reply_lease_seconds = 30.0
+
+        # 速率感知：黑名单目标发言越快，回复概率越低
+        rate_cfg = self._get_config_section("rate_settings")
+        self._rate_tracker: Optional[RateTracker] = None
+        # 阈值配置为每分钟条数，内部以每秒计算
+        self._rate_threshold = self._get_float_setting(rate_cfg, "threshold_per_minute", 6.0) / 60.0
+        if bool(rate_cfg.get("enable", True)) and self._rate_threshold > 0:
+            self._rate_tracker = RateTracker(
+                window=self._get_float_setting(rate_cfg, "window", 60.0),
+                max_entries=int(self._get_float_setting(rate_cfg, "max_entries", 4096)),
+            )
+
+        # 复读检测：按群保存最近消息的 MinHash 草图
+        echo_cfg = self._get_config_section("echo_settings")
+        self._echo_detector: Optional[EchoDetector] = None
+        self._echo_factor = max(0.0, min(1.0, self._get_float_setting(echo_cfg, "probability_factor", 0.2)))
+        if bool(echo_cfg.get("enable", False)):
+            self._echo_detector = EchoDetector(
+                window_size=int(self._get_float_setting(echo_cfg, "window_size", 16)),
+                window_seconds=self._get_float_setting(echo_cfg, "window_seconds", 300.0),
+                max_groups=int(self._get_float_setting(echo_cfg, "max_groups", 256)),
+                similarity=self._get_float_setting(echo_cfg, "similarity", 0.5),
+                min_length=int(self._get_float_setting(echo_cfg, "min_length", 8)),
+            )
+
+        # 行为识别：不依赖昵称关键字，从发言统计中找出疑似机器人
+        behavior_cfg = self._get_config_section("behavior_settings")
+        self._behavior_detector: Optional[BehaviorDetector] = None
+        if bool(behavior_cfg.get("enable", False)):
+            self._behavior_detector = BehaviorDetector(
+                max_senders=int(self._get_float_setting(behavior_cfg, "max_senders", 4096)),
+                min_messages=int(self._get_float_setting(behavior_cfg, "min_messages", 20)),
+                latency_window=self._get_float_setting(behavior_cfg, "latency_window", 10.0),
+            )
+
+        # 回复链深度：机器人之间的对话越长，回复概率越低
+        chain_cfg = self._get_config_section("chain_settings")
+        self._chain_tracker: Optional[ReplyChainTracker] = None
+        self._chain_factor = max(0.0, min(1.0, self._get_float_setting(chain_cfg, "depth_factor", 0.6)))
+        self._chain_free_depth = max(0, int(self._get_float_setting(chain_cfg, "free_depth", 1)))
+        self._chain_max_depth = max(0, int(self._get_float_setting(chain_cfg, "max_depth", 0)))
+        if bool(chain_cfg.get("enable", False)):
+            self._chain_tracker = ReplyChainTracker(
+                max_entries=int(self._get_float_setting(chain_cfg, "max_entries", 8192)),
+                ttl=self._get_float_setting(chain_cfg, "ttl_seconds", 600.0),
+                window=self._get_float_setting(chain_cfg, "window_seconds", 60.0),
+            )
+
+        # LLM 请求预算：按群（以及黑名单用户）限制每个周期内的请求次数
+        budget_cfg = self._get_config_section("budget_settings")
+        self._group_budget: Optional[LLMBudget] = None
+        self._user_budget: Optional[LLMBudget] = None
+        self._budget_chars_per_token = self._get_float_setting(budget_cfg, "chars_per_token", 2.0)
+        self._budget_output_tokens = int(self._get_float_setting(budget_cfg, "output_tokens", 300))
+        if bool(budget_cfg.get("enable", False)):
+            budget_period = self._get_float_setting(budget_cfg, "period_seconds", 3600.0)
+            budget_max_entries = int(self._get_float_setting(budget_cfg, "max_entries", 4096))
+            group_limit = self._get_float_setting(budget_cfg, "group_limit", 60.0)
+            user_limit = self._get_float_setting(budget_cfg, "user_limit", 0.0)
+            if group_limit > 0:
+                self._group_budget = LLMBudget(group_limit, budget_period, budget_max_entries)
+            if user_limit > 0:
+                self._user_budget = LLMBudget(user_limit, budget_period, budget_max_entries)
+
+        # 运行指标：热路径只做计数，查询与导出时再格式化
+        metrics_cfg = self._get_config_section("metrics_settings")
+        self._metrics: Optional[PluginMetrics] = None
+        self._metrics_exporter: Optional[PrometheusTextfileExporter] = None
+        if bool(metrics_cfg.get("enable", True)):
+            self._metrics = PluginMetrics()
+            if bool(metrics_cfg.get("prometheus_textfile", False)):
+                self._metrics_exporter = PrometheusTextfileExporter(
+                    self._metrics,
+                    self.data_dir / "random_reply.prom",
+                    self._writer,
+                    interval=self._get_float_setting(metrics_cfg, "export_interval", 60.0),
+                )
+
+        # 决策记录与日志采样：最近的决策保存在环形缓冲区中，日志按比例采样并限速
+        trace_cfg = self._get_config_section("trace_settings")
+        trace_capacity = int(self._get_float_setting(trace_cfg, "capacity", 500))
+        self._decision_trace: Optional[DecisionTrace] = DecisionTrace(trace_capacity) if trace_capacity > 0 else None
+        self._log_blocked_messages = bool(self.config.get("log_blocked_messages", True))
+        self._log_sampler = LogSampler(
+            sample_rate=self._get_float_setting(trace_cfg, "log_sample_rate", 1.0),
+            max_per_minute=self._get_float_setting(trace_cfg, "log_max_per_minute", 60.0),
+        )
+
+        # 按需性能分析：仅在 profile start 后持有分析器
+        self._profiler: Optional[PluginProfiler] = None
+        self._profile_stop_handle: Optional[asyncio.TimerHandle] = None
+        self._profile_stop_task: Optional[asyncio.Future] = None
 
         # 读取配置
         self.command_identifier = str(self.config.get("command_identifier", "")).strip()
@@ -515,10 +1377,24 @@ class WeakBlacklistPlugin(Star):
         
         # 读取机器人扫描关键字配置
         self.bot_scan_keywords = str(self.config.get("bot_scan_keywords", "bot,Bot,BOT,机器人,助手")).strip()
+        self.bot_scan_case_insensitive = bool(self.config.get("bot_scan_case_insensitive", False))
+        self.bot_scan_normalize_width = bool(self.config.get("bot_scan_normalize_width", False))
+        # 关键字字符串 -> 预编译的匹配器，关键字变化时才重新构建
+        self._keyword_matchers: Dict[Tuple[str, bool], KeywordMatcher] = {}
+        # 多群扫描的并发数与单群超时
+        self.bot_scan_concurrency = max(1, int(self._get_float_setting(self.config, "bot_scan_concurrency", 5)))
+        self.bot_scan_timeout = max(1.0, self._get_float_setting(self.config, "bot_scan_timeout", 15.0))
+        # 群成员列表缓存：TTL 内直接复用，过期后与上一次快照做增量比较
+        self._member_cache = MemberListCache(
+            ttl=self._get_float_setting(self.config, "bot_scan_cache_ttl", 300.0),
+            max_groups=int(self._get_float_setting(self.config, "bot_scan_cache_max_groups", 64)),
+        )
         
         if not self.command_identifier:
             logger.warning("未配置 command_identifier，/rrbot 命令已禁用。")
 
+        self._init_shared_state()
+
         blacklisted_users, blacklisted_groups = self._get_combined_blacklists()
         logger.info(
             f"弱黑名单插件已加载 - "
@@ -526,7 +1402,29 @@ class WeakBlacklistPlugin(Star):
             f"群聊: {len(blacklisted_groups)}个(动态{len(self.managed_blacklisted_groups)})"
         )
 
+    def _get_keyword_matcher(self, keywords: str = "") -> KeywordMatcher:
+        """获取关键字对应的预编译匹配器，按关键字字符串缓存
+
+        未提供关键字时使用后台配置的 bot_scan_keywords，其中 re: 开头的关键字按正则匹配；
+        工具调用传入的关键字来自聊天内容，一律按字面量匹配，避免在事件循环中执行任意正则。
+        """
+        trusted = not keywords
+        if trusted:
+            keywords = self.bot_scan_keywords
+        cache_key = (keywords, trusted)
+        matcher = self._keyword_matchers.get(cache_key)
+        if matcher is None:
+            # 仅保留少量临时关键字组合，避免工具调用传入任意关键字导致缓存膨胀
+            if len(self._keyword_matchers) >= 16:
+                self._keyword_matchers.clear()
+            matcher = KeywordMatcher.from_string(
+                keywords, self.bot_scan_case_insensitive, self.bot_scan_normalize_width, allow_regex=trusted
+            )
+            self._keyword_matchers[cache_key] = matcher
+        return matcher
+
     @llm_tool(name="scan_group_bots")
+    @profiled
     async def scan_group_bots(
         self,
         event: AstrMessageEvent,
@@ -546,22 +1444,20 @@ class WeakBlacklistPlugin(Star):
             return "无法确定要扫描的群号：当前不在群聊中，且未指定 group_id。"
         group_id = str(group_id)
 
-        # 默认使用配置中的关键字
-        if not keywords:
-            keywords = self.bot_scan_keywords
+        # 未提供关键字时使用配置中的关键字
+        matcher = self._get_keyword_matcher(keywords)
+        if not matcher:
+            return "未提供有效的关键字。"
+        keyword_list = matcher.keywords
 
         try:
-            group = await event.get_group(group_id=group_id)
+            scanned = await self._scan_group_members(event, group_id, matcher)
         except Exception as e:
             logger.error(f"[RandomReply] 获取群 {group_id} 信息失败: {e}")
             return f"获取群 {group_id} 的成员列表失败，可能当前平台不支持此操作或群号无效。错误: {e}"
-
-        if not group or not group.members:
+        if scanned is None:
             return f"无法获取群 {group_id} 的成员列表，可能当前平台不支持此操作、机器人不在该群中或群号无效。"
-
-        keyword_list = [k.strip() for k in keywords.split(",") if k.strip()]
-        if not keyword_list:
-            return "未提供有效的关键字。"
+        snapshot, from_cache, new_suspects, has_baseline = scanned
 
         # 获取机器人自身ID，避免将自己加入黑名单
         self_id = str(getattr(event.message_obj, 'self_id', '')) if event.message_obj else ''
@@ -569,50 +1465,36 @@ class WeakBlacklistPlugin(Star):
         # 获取已在黑名单中的用户
         existing_users, _ = self._get_combined_blacklists()
 
-        # 尝试获取原始成员列表（含 nickname + card 双字段）
-        raw_members = None
-        try:
-            bot = getattr(event, 'bot', None)
-            if bot and hasattr(bot, 'call_action'):
-                raw_members = await bot.call_action("get_group_member_list", group_id=int(group_id))
-        except Exception as e:
-            logger.debug(f"[RandomReply] 获取原始成员列表失败，回退到 group.members: {e}")
-
+        group_name = snapshot.group_name or '未知群名'
+        member_count = len(snapshot.members)
         matched = []
-        if raw_members:
-            # 使用原始数据，同时检查 nickname 和 card（群备注）
-            for m in raw_members:
-                uid = str(m.get("user_id", ""))
-                nickname = m.get("nickname", "") or ""
-                card = m.get("card", "") or ""
-                if self_id and uid == self_id:
-                    continue
-                display_name = card if card else nickname
-                for kw in keyword_list:
-                    if kw in nickname or kw in card:
-                        status = "已在黑名单" if uid in existing_users else "未拉黑"
-                        matched.append({"user_id": uid, "nickname": display_name, "matched_keyword": kw, "status": status})
-                        break
-        else:
-            # 回退：仅使用 group.members（只有 nickname）
-            for member in group.members:
-                uid = str(member.user_id)
-                nickname = member.nickname or ""
-                if self_id and uid == self_id:
-                    continue
-                for kw in keyword_list:
-                    if kw in nickname:
-                        status = "已在黑名单" if uid in existing_users else "未拉黑"
-                        matched.append({"user_id": uid, "nickname": nickname, "matched_keyword": kw, "status": status})
-                        break
+        for uid, kw in snapshot.matches.items():
+            if self_id and uid == self_id:
+                continue
+            nickname, card = snapshot.members[uid]
+            display_name = card if card else nickname
+            status = "已在黑名单" if uid in existing_users else "未拉黑"
+            matched.append({"user_id": uid, "nickname": display_name, "matched_keyword": kw, "status": status})
+
+        cache_hint = ""
+        if from_cache:
+            age = int(time.monotonic() - snapshot.fetched_at)
+            cache_hint = f"（成员列表来自 {age} 秒前的缓存）"
 
         if not matched:
-            return f"在群 {group_id}（{group.group_name or '未知群名'}）中未找到名字包含关键字 {keyword_list} 的疑似机器人。共扫描 {len(group.members)} 名成员。"
+            return f"在群 {group_id}（{group_name}）中未找到名字包含关键字 {keyword_list} 的疑似机器人。共扫描 {member_count} 名成员。{cache_hint}"
 
-        lines = [f"群 {group_id}（{group.group_name or '未知群名'}）扫描结果，共 {len(group.members)} 名成员，发现 {len(matched)} 个疑似机器人："]
+        lines = [f"群 {group_id}（{group_name}）扫描结果，共 {member_count} 名成员，发现 {len(matched)} 个疑似机器人：{cache_hint}"]
         for m in matched:
             lines.append(f"- QQ:{m['user_id']} 昵称:\"{m['nickname']}\" 匹配关键字:\"{m['matched_keyword']}\" 状态:{m['status']}")
 
+        if has_baseline:
+            new_suspects = [uid for uid in new_suspects if not (self_id and uid == self_id)]
+            if new_suspects:
+                lines.append(f"\n自上次扫描以来新增疑似机器人 {len(new_suspects)} 个：{', '.join(new_suspects)}")
+            else:
+                lines.append("\n自上次扫描以来没有新增疑似机器人。")
+
         new_count = sum(1 for m in matched if m['status'] == '未拉黑')
         if new_count > 0:
             lines.append(f"\n其中 {new_count} 个尚未在黑名单中。如需将它们添加到弱黑名单，请调用 batch_add_to_blacklist 工具。")
@@ -623,7 +1505,202 @@ class WeakBlacklistPlugin(Star):
         logger.info(f"[RandomReply] 扫描群 {group_id} 完成: 发现 {len(matched)} 个疑似机器人")
         return result
 
+    async def _scan_group_members(self, event: AstrMessageEvent, group_id: str, matcher: KeywordMatcher
+                                  ) -> Optional[Tuple[MemberSnapshot, bool, List[str], bool]]:
+        """获取群成员快照并增量匹配关键字
+
+        返回 (快照, 是否来自缓存, 自上次扫描以来新命中的成员, 是否存在上一次扫描)，
+        无法获取成员列表时返回 None。
+        """
+        # 优先使用有效期内的缓存快照，避免重复拉取成员列表
+        snapshot = self._member_cache.get_fresh(group_id)
+        from_cache = snapshot is not None
+        previous, diff = None, None
+        if snapshot is None:
+            snapshot = await self._fetch_member_snapshot(event, group_id)
+            if snapshot is None:
+                return None
+            previous, diff = self._member_cache.put(snapshot)
+
+        # 只对新加入或改名的成员重新匹配
+        new_suspects, has_baseline = self._update_snapshot_matches(snapshot, previous, diff, matcher)
+        return snapshot, from_cache, new_suspects, has_baseline
+
+    async def _list_joined_groups(self, event: AstrMessageEvent) -> List[str]:
+        """获取机器人已加入的全部群号"""
+        bot = getattr(event, 'bot', None)
+        if not bot or not hasattr(bot, 'call_action'):
+            return []
+        groups = await bot.call_action("get_group_list") or []
+        return [str(g.get("group_id")) for g in groups if g.get("group_id")]
+
+    async def _scan_groups_report(self, event: AstrMessageEvent, group_ids: str = "", keywords: str = "") -> str:
+        """并发扫描多个群并生成去重后的汇总报告"""
+        matcher = self._get_keyword_matcher(keywords)
+        if not matcher:
+            return "未提供有效的关键字。"
+
+        requested = [gid.strip() for gid in group_ids.replace("，", ",").split(",") if gid.strip()]
+        if not requested or any(gid.lower() == "all" for gid in requested):
+            try:
+                targets = await self._list_joined_groups(event)
+            except Exception as e:
+                logger.error(f"[RandomReply] 获取已加入群列表失败: {e}")
+                return f"获取已加入的群列表失败，可能当前平台不支持此操作。错误: {e}"
+            if not targets:
+                return "无法获取机器人已加入的群列表，可能当前平台不支持此操作。请改为指定群号。"
+        else:
+            targets = requested
+        # 去重且保持顺序
+        targets = list(dict.fromkeys(targets))
+
+        semaphore = asyncio.Semaphore(self.bot_scan_concurrency)
+        timeout = self.bot_scan_timeout
+
+        async def scan_one(gid: str):
+            async with semaphore:
+                try:
+                    return gid, await asyncio.wait_for(self._scan_group_members(event, gid, matcher), timeout), None
+                except asyncio.TimeoutError:
+                    return gid, None, f"超时（>{timeout:g}秒）"
+                except Exception as e:
+                    return gid, None, str(e) or type(e).__name__
+
+        results = await asyncio.gather(*(scan_one(gid) for gid in targets))
+
+        self_id = str(getattr(event.message_obj, 'self_id', '')) if event.message_obj else ''
+        existing_users, _ = self._get_combined_blacklists()
+
+        # user_id -> 汇总信息，同一账号出现在多个群时只列一次
+        accounts: Dict[str, Dict[str, Any]] = {}
+        failed: List[str] = []
+        scanned_groups = 0
+        total_members = 0
+        for gid, scanned, error in results:
+            if scanned is None:
+                failed.append(f"{gid}（{error or '无法获取成员列表'}）")
+                continue
+            snapshot, _, new_suspects, _ = scanned
+            scanned_groups += 1
+            total_members += len(snapshot.members)
+            fresh = set(new_suspects)
+            for uid, kw in snapshot.matches.items():
+                if self_id and uid == self_id:
+                    continue
+                entry = accounts.get(uid)
+                if entry is None:
+                    nickname, card = snapshot.members[uid]
+                    entry = {"nickname": card if card else nickname, "keyword": kw, "groups": [], "new": False}
+                    accounts[uid] = entry
+                entry["groups"].append(gid)
+                if uid in fresh:
+                    entry["new"] = True
+
+        lines = [f"多群扫描完成：成功 {scanned_groups}/{len(targets)} 个群，共 {total_members} 名成员（含重复），"
+                 f"发现 {len(accounts)} 个不重复的疑似机器人。"]
+        for uid, entry in accounts.items():
+            status = "已在黑名单" if uid in existing_users else "未拉黑"
+            new_mark = " [新增]" if entry["new"] else ""
+            lines.append(f"- QQ:{uid} 昵称:\"{entry['nickname']}\" 匹配关键字:\"{entry['keyword']}\" "
+                         f"所在群:{','.join(entry['groups'])} 状态:{status}{new_mark}")
+        if failed:
+            lines.append(f"\n扫描失败 {len(failed)} 个群：{'; '.join(failed)}")
+
+        pending = [uid for uid in accounts if uid not in existing_users]
+        if pending:
+            lines.append(f"\n其中 {len(pending)} 个尚未在黑名单中。如需将它们添加到弱黑名单，请调用 batch_add_to_blacklist 工具。")
+
+        logger.info(f"[RandomReply] 多群扫描完成: {scanned_groups}/{len(targets)} 个群，发现 {len(accounts)} 个疑似机器人")
+        return "\n".join(lines)
+
+    async def _fetch_member_snapshot(self, event: AstrMessageEvent, group_id: str) -> Optional[MemberSnapshot]:
+        """从平台拉取群成员列表，优先使用含 nickname + card 的原始接口"""
+        previous = self._member_cache.peek(group_id)
+
+        raw_members = None
+        try:
+            bot = getattr(event, 'bot', None)
+            if bot and hasattr(bot, 'call_action'):
+                raw_members = await bot.call_action("get_group_member_list", group_id=int(group_id))
+        except Exception as e:
+            logger.debug(f"[RandomReply] 获取原始成员列表失败，回退到 group.members: {e}")
+
+        if raw_members:
+            # 群名只在首次扫描时额外获取一次，之后沿用上一次快照
+            group_name = previous.group_name if previous else ""
+            if not group_name:
+                try:
+                    group = await event.get_group(group_id=group_id)
+                    group_name = (group.group_name if group else "") or ""
+                except Exception as e:
+                    logger.debug(f"[RandomReply] 获取群 {group_id} 名称失败: {e}")
+            members = {
+                str(m.get("user_id", "")): (m.get("nickname", "") or "", m.get("card", "") or "")
+                for m in raw_members
+            }
+            return MemberSnapshot(group_id, group_name, members, has_card=True)
+
+        # 回退：仅使用 group.members（只有 nickname）
+        group = await event.get_group(group_id=group_id)
+        if not group or not group.members:
+            return None
+        members = {str(m.user_id): (m.nickname or "", "") for m in group.members}
+        return MemberSnapshot(group_id, group.group_name or "", members, has_card=False)
+
+    def _update_snapshot_matches(self, snapshot: MemberSnapshot, previous: Optional[MemberSnapshot],
+                                 diff: Optional[MemberDiff], matcher: KeywordMatcher) -> Tuple[List[str], bool]:
+        """增量更新快照的关键字匹配结果
+
+        返回 (自上次扫描以来新命中的成员, 是否存在可比较的上一次扫描)。
+        """
+        match_key = (tuple(matcher.keywords), matcher.case_insensitive, matcher.normalize_width, matcher.allow_regex)
+        if snapshot.match_key == match_key:
+            # 缓存命中且关键字未变：没有需要重新匹配的成员
+            return [], True
+
+        members = snapshot.members
+        has_card = snapshot.has_card
+        if previous is not None and diff is not None and previous.match_key == match_key:
+            renamed = set(diff.renamed)
+            matches = {uid: kw for uid, kw in previous.matches.items() if uid in members and uid not in renamed}
+            candidates = diff.changed
+            baseline = previous.matches
+        else:
+            # 首次扫描、关键字变化或基线被淘汰：全量匹配，不与上一次结果比较
+            matches = {}
+            candidates = list(members)
+            baseline = None
+
+        for uid in candidates:
+            nickname, card = members[uid]
+            kw = matcher.match(nickname, card) if has_card else matcher.match(nickname)
+            if kw is not None:
+                matches[uid] = kw
+
+        snapshot.matches = matches
+        snapshot.match_key = match_key
+        if baseline is None:
+            return [], False
+        return [uid for uid in candidates if uid in matches and uid not in baseline], True
+
+    @llm_tool(name="scan_multiple_groups")
+    @profiled
+    async def scan_multiple_groups(
+        self,
+        event: AstrMessageEvent,
+        group_ids: str = "",
+        keywords: str = "",
+    ) -> str:
+        """同时扫描多个QQ群（或机器人加入的全部群）中名字含有特定关键字的疑似机器人账号，返回去重后的汇总结果，同一账号出现在多个群时只列出一次。仅扫描并返回结果，不会执行添加操作。当用户想要检查多个群或所有群里的机器人时调用此工具。
+
+        Args:
+            group_ids(string): 要扫描的QQ群号列表，用英文逗号分隔；不提供或填写 all 则扫描机器人已加入的全部群
+            keywords(string): 用于识别机器人的关键字，用英文逗号分隔，不提供则使用后台配置的关键字
+        """
+        return await self._scan_groups_report(event, group_ids, keywords)
+
     @llm_tool(name="batch_add_to_blacklist")
+    @profiled
     async def batch_add_to_blacklist(
         self,
         event: AstrMessageEvent,
@@ -638,31 +1715,91 @@ class WeakBlacklistPlugin(Star):
         if not id_list:
             return "未提供有效的QQ号。"
 
-        added = []
-        skipped = []
-        for uid in id_list:
-            success, feedback = self._add_to_managed_blacklist("user", uid)
-            if success:
-                added.append(uid)
-                logger.info(f"[RandomReply] 通过工具调用添加用户 {uid} 到弱黑名单")
-            else:
-                skipped.append(f"{uid}({feedback})")
+        added, duplicates, invalid = self._bulk_add_to_managed_blacklist("user", id_list)
+        if added:
+            logger.info(f"[RandomReply] 通过工具调用添加 {len(added)} 个用户到弱黑名单: {', '.join(added)}")
 
         lines = []
         if added:
             lines.append(f"成功添加 {len(added)} 个用户到弱黑名单: {', '.join(added)}")
             lines.append("已同步到后台配置的 blacklisted_users 列表（跨群生效）。")
-        if skipped:
-            lines.append(f"跳过 {len(skipped)} 个用户: {', '.join(skipped)}")
+        if duplicates:
+            lines.append(f"跳过 {len(duplicates)} 个已在黑名单中的用户: {', '.join(duplicates)}")
+        if invalid:
+            lines.append(f"忽略 {len(invalid)} 个格式无效的QQ号: {', '.join(invalid)}")
 
         return "\n".join(lines) if lines else "没有执行任何操作。"
 
+    @llm_tool(name="find_behavior_bots")
+    @profiled
+    async def find_behavior_bots(
+        self,
+        event: AstrMessageEvent,
+        group_id: str = "",
+    ) -> str:
+        """根据最近的发言行为（发言间隔是否过于规律、是否在其他机器人发言后秒回、消息长度）找出疑似机器人账号，可以发现名字中不含关键字的机器人，且不需要获取群成员列表。仅返回候选结果，不会执行添加操作。
+
+        Args:
+            group_id(string): 要查看的QQ群号，不提供则默认为当前群聊，填写 all 查看所有群
+        """
+        group_id = group_id.strip()
+        if group_id.lower() == "all":
+            return self._get_behavior_candidates_text(None)
+        target = group_id or event.get_group_id()
+        return self._get_behavior_candidates_text(str(target) if target else None)
+
+    @llm_tool(name="export_blacklist")
+    @profiled
+    async def export_blacklist(
+        self,
+        event: AstrMessageEvent,
+        target_type: str = "all",
+        file_name: str = "",
+        overwrite: bool = False,
+    ) -> str:
+        """将当前弱黑名单导出为插件数据目录下 exports 目录中的文件，用于在多个机器人实例之间迁移黑名单。导出全部类型时为带类型列的 CSV 文件，只导出一种类型时每行一个ID。同名文件已存在时默认不覆盖。
+
+        Args:
+            target_type(string): 要导出的类型：user、group 或 all，默认 all
+            file_name(string): 导出的文件名（不含路径），不提供则自动生成
+            overwrite(boolean): 同名文件已存在时是否覆盖，默认 false
+        """
+        kind, _, _ = self._parse_io_args([target_type or "all"])
+        return await self._export_blacklist(kind, file_name, bool(overwrite))
+
+    @llm_tool(name="import_blacklist")
+    @profiled
+    async def import_blacklist(
+        self,
+        event: AstrMessageEvent,
+        file_name: str,
+        target_type: str = "user",
+    ) -> str:
+        """从插件数据目录下 exports 目录中的文件批量导入弱黑名单。文件可以是每行一个ID的文本，也可以是 "类型,ID" 格式的 CSV（如 export_blacklist 导出的文件）。返回新增、重复与无效条目的数量。
+
+        Args:
+            file_name(string): 数据目录中要导入的文件名（不含路径）
+            target_type(string): 未标明类型的行按此类型导入：user 或 group，默认 user
+        """
+        kind, _, _ = self._parse_io_args([target_type or "user"])
+        return await self._import_blacklist(kind or "user", file_name)
+
     async def terminate(self):
         """插件卸载时保存数据"""
         try:
-            self._save_interception_counters()
-            if self.managed_blacklisted_users or self.managed_blacklisted_groups:
+            if self._profiler is not None:
+                await self._stop_profiling()
+            await self._counter_writer.close()
+            if self._shared_state is not None:
+                await self._shared_state.close()
+            if self._metrics_exporter is not None:
+                await self._metrics_exporter.close()
+            if self._storage is None and (self.managed_blacklisted_users or self.managed_blacklisted_groups):
                 self._save_managed_blacklist()
+            # 等待已提交的写入全部完成后再关闭数据库
+            await self._writer.drain()
+            if self._storage is not None:
+                await self._writer.run(self._storage.close)
             
             blacklisted_users, blacklisted_groups = self._get_combined_blacklists()
             logger.info(
@@ -671,7 +1808,10 @@ class WeakBlacklistPlugin(Star):
             )
         except Exception as e:
             logger.error(f"插件停止时发生错误: {e}")
-            try:
-                self._save_interception_counters()
-            except Exception:
-                pass
+            if self._storage is None:
+                try:
+                    self._save_interception_counters()
+                except Exception:
+                    pass
+        finally:
+            await self._writer.close()
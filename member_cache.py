@@ -0,0 +1,88 @@
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class MemberSnapshot:
+    """某个群在某一时刻的成员列表快照及其关键字匹配结果"""
+
+    __slots__ = ("group_id", "group_name", "members", "has_card", "fetched_at",
+                 "match_key", "matches")
+
+    def __init__(self, group_id: str, group_name: str, members: Dict[str, Tuple[str, str]],
+                 has_card: bool, fetched_at: Optional[float] = None):
+        self.group_id = group_id
+        self.group_name = group_name
+        # user_id -> (nickname, card)
+        self.members = members
+        # 是否来自含群名片的原始成员列表
+        self.has_card = has_card
+        self.fetched_at = time.monotonic() if fetched_at is None else fetched_at
+        # 匹配结果对应的关键字（及匹配选项），变化时需要全量重新匹配
+        self.match_key: Optional[Tuple] = None
+        # user_id -> 命中的关键字
+        self.matches: Dict[str, str] = {}
+
+
+class MemberDiff:
+    """两次快照之间的成员变化"""
+
+    __slots__ = ("added", "renamed", "removed")
+
+    def __init__(self, added: List[str], renamed: List[str], removed: List[str]):
+        self.added = added
+        self.renamed = renamed
+        self.removed = removed
+
+    @property
+    def changed(self) -> List[str]:
+        """需要重新匹配的成员：新加入或改名"""
+        return self.added + self.renamed
+
+
+class MemberListCache:
+    """按群缓存成员列表，带 TTL 与 LRU 容量上限
+
+    过期的快照仍保留用于与下一次拉取结果做增量比较，
+    只有被 LRU 淘汰后才会丢失上一次的扫描基线。
+    """
+
+    def __init__(self, ttl: float = 300.0, max_groups: int = 64):
+        self.ttl = max(0.0, float(ttl))
+        self.max_groups = max(1, int(max_groups))
+        self._snapshots: "OrderedDict[str, MemberSnapshot]" = OrderedDict()
+
+    def peek(self, group_id: str) -> Optional[MemberSnapshot]:
+        """返回最近一次快照（可能已过期）"""
+        return self._snapshots.get(group_id)
+
+    def get_fresh(self, group_id: str) -> Optional[MemberSnapshot]:
+        """返回仍在有效期内的快照"""
+        snapshot = self._snapshots.get(group_id)
+        if snapshot is None or time.monotonic() - snapshot.fetched_at > self.ttl:
+            return None
+        self._snapshots.move_to_end(group_id)
+        return snapshot
+
+    def put(self, snapshot: MemberSnapshot) -> Tuple[Optional[MemberSnapshot], MemberDiff]:
+        """保存新快照，返回 (上一次快照, 成员变化)"""
+        previous = self._snapshots.pop(snapshot.group_id, None)
+        self._snapshots[snapshot.group_id] = snapshot
+        while len(self._snapshots) > self.max_groups:
+            self._snapshots.popitem(last=False)
+
+        if previous is None:
+            return None, MemberDiff(list(snapshot.members), [], [])
+
+        old_members = previous.members
+        added: List[str] = []
+        renamed: List[str] = []
+        for uid, names in snapshot.members.items():
+            old_names = old_members.get(uid)
+            if old_names is None:
+                added.append(uid)
+            elif old_names != names:
+                renamed.append(uid)
+        removed = [uid for uid in old_members if uid not in snapshot.members]
+        return previous, MemberDiff(added, renamed, removed)
+
@@ -0,0 +1,227 @@
+import asyncio
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .decision import OUTCOME_NAMES, OUTCOME_SUPPRESSED
+from .persistence import PersistenceWriter, atomic_write_text
+
+# 延迟直方图桶上界（微秒）
+LATENCY_BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+# 分目标统计的最大条目数，超出的目标合并到 "_other"
+_MAX_TARGETS = 1024
+_OTHER = "_other"
+
+
+def escape_label_value(value: str) -> str:
+    """按 Prometheus 文本格式转义标签值中的反斜杠、双引号与换行"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """固定桶的直方图，observe 只做一次二分查找与两次加法"""
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # 最后一个桶对应 +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """按桶上界估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return float(self.bounds[idx]) if idx < len(self.bounds) else float("inf")
+        return float("inf")
+
+
+class PluginMetrics:
+    """热路径指标：只做整数累加，格式化推迟到查询或导出时"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.messages_evaluated = 0
+        self.listed_messages = 0
+        self.outcomes = [0, 0, 0]
+        self.llm_calls_prevented = 0
+        self.llm_budget_denied = 0
+        self.estimated_tokens_saved = 0
+        self.budget_tokens_saved = 0
+        self.echo_detected = 0
+        self.chain_capped = 0
+        # 目标ID -> [拦截, 概率放行, 保底放行]
+        self.per_user: Dict[str, List[int]] = {}
+        self.per_group: Dict[str, List[int]] = {}
+        self.decision_latency = Histogram(LATENCY_BUCKETS_US)
+        self.intercept_latency = Histogram(LATENCY_BUCKETS_US)
+
+    @staticmethod
+    def _bump(table: Dict[str, List[int]], key: str, outcome: int):
+        row = table.get(key)
+        if row is None:
+            if len(table) >= _MAX_TARGETS:
+                key = _OTHER
+                row = table.get(key)
+            if row is None:
+                row = table[key] = [0, 0, 0]
+        row[outcome] += 1
+
+    def record_decision(self, latency_ns: int, outcome: Optional[int] = None,
+                        user_id: Optional[str] = None, group_id: Optional[str] = None):
+        """记录一次 check_weak_blacklist 决策；outcome 为 None 表示非黑名单消息"""
+        self.messages_evaluated += 1
+        self.decision_latency.observe(latency_ns / 1000.0)
+        if outcome is None:
+            return
+        self.listed_messages += 1
+        self.outcomes[outcome] += 1
+        if user_id:
+            self._bump(self.per_user, user_id, outcome)
+        if group_id:
+            self._bump(self.per_group, group_id, outcome)
+
+    def record_intercept(self, latency_ns: int, prevented: bool, tokens: int = 0, budget_denied: bool = False):
+        """记录一次 on_llm_request 阶段的处理；tokens 为被阻止请求的估算 token 数"""
+        self.intercept_latency.observe(latency_ns / 1000.0)
+        if prevented:
+            self.llm_calls_prevented += 1
+            self.estimated_tokens_saved += tokens
+            if budget_denied:
+                self.llm_budget_denied += 1
+                self.budget_tokens_saved += tokens
+
+    def reset(self):
+        self.__init__()
+
+    def render_text(self, top_n: int = 5) -> str:
+        """生成 /rrbot stats 的文本"""
+        uptime = int(time.time() - self.started_at)
+        listed = self.listed_messages
+        suppressed, probability, guarantee = self.outcomes
+        rate = suppressed / listed * 100 if listed else 0.0
+        lat = self.decision_latency
+        avg = lat.total / lat.count if lat.count else 0.0
+        lines = [
+            f"弱黑名单运行统计（{uptime} 秒内）：",
+            f"评估消息 {self.messages_evaluated} 条，其中黑名单消息 {listed} 条",
+            f"拦截 {suppressed} 次，概率放行 {probability} 次，保底放行 {guarantee} 次，拦截率 {rate:.1f}%",
+            f"已阻止 LLM 调用 {self.llm_calls_prevented} 次（估计节省约 {self.estimated_tokens_saved} tokens），"
+            f"识别近似重复的黑名单消息 {self.echo_detected} 条，回复链达到深度上限拦截 {self.chain_capped} 次",
+            f"超出预算被拒绝的 LLM 请求 {self.llm_budget_denied} 次（估计节省约 {self.budget_tokens_saved} tokens）",
+            f"决策耗时：平均 {avg:.1f}µs，p50 ≤{lat.quantile(0.5):g}µs，p99 ≤{lat.quantile(0.99):g}µs",
+        ]
+        for title, table in (("用户", self.per_user), ("群聊", self.per_group)):
+            if not table:
+                continue
+            top = sorted(table.items(), key=lambda item: item[1][OUTCOME_SUPPRESSED], reverse=True)[:top_n]
+            lines.append(f"拦截最多的{title}：")
+            for key, (s, p, g) in top:
+                lines.append(f"- {key}：拦截 {s} / 概率放行 {p} / 保底放行 {g}")
+        return "\n".join(lines)
+
+    def render_prometheus(self) -> str:
+        """生成 Prometheus 文本格式（textfile collector）"""
+        out = [
+            "# HELP rrbot_messages_evaluated_total Messages evaluated by the weak blacklist.",
+            "# TYPE rrbot_messages_evaluated_total counter",
+            f"rrbot_messages_evaluated_total {self.messages_evaluated}",
+            "# HELP rrbot_listed_messages_total Messages from blacklisted users or groups.",
+            "# TYPE rrbot_listed_messages_total counter",
+            f"rrbot_listed_messages_total {self.listed_messages}",
+            "# HELP rrbot_decisions_total Decisions on blacklisted messages by outcome.",
+            "# TYPE rrbot_decisions_total counter",
+        ]
+        for idx, name in enumerate(OUTCOME_NAMES):
+            out.append(f'rrbot_decisions_total{{outcome="{name}"}} {self.outcomes[idx]}')
+        out += [
+            "# HELP rrbot_target_decisions_total Decisions per blacklisted user or group.",
+            "# TYPE rrbot_target_decisions_total counter",
+        ]
+        for kind, table in (("user", self.per_user), ("group", self.per_group)):
+            for key, row in table.items():
+                label = escape_label_value(key)
+                for idx, name in enumerate(OUTCOME_NAMES):
+                    out.append(f'rrbot_target_decisions_total{{kind="{kind}",id="{label}",outcome="{name}"}} {row[idx]}')
+        out += [
+            "# HELP rrbot_llm_calls_prevented_total LLM requests stopped by the plugin.",
+            "# TYPE rrbot_llm_calls_prevented_total counter",
+            f"rrbot_llm_calls_prevented_total {self.llm_calls_prevented}",
+            "# HELP rrbot_llm_budget_denied_total LLM requests denied by the per-group or per-user budget.",
+            "# TYPE rrbot_llm_budget_denied_total counter",
+            f"rrbot_llm_budget_denied_total {self.llm_budget_denied}",
+            "# HELP rrbot_estimated_tokens_saved_total Estimated tokens of the LLM requests stopped by the plugin.",
+            "# TYPE rrbot_estimated_tokens_saved_total counter",
+            f'rrbot_estimated_tokens_saved_total{{reason="all"}} {self.estimated_tokens_saved}',
+            f'rrbot_estimated_tokens_saved_total{{reason="budget"}} {self.budget_tokens_saved}',
+            "# HELP rrbot_echo_detected_total Blacklisted messages that nearly duplicate recent group messages.",
+            "# TYPE rrbot_echo_detected_total counter",
+            f"rrbot_echo_detected_total {self.echo_detected}",
+            "# HELP rrbot_chain_capped_total Blacklisted messages suppressed because their reply chain reached max_depth.",
+            "# TYPE rrbot_chain_capped_total counter",
+            f"rrbot_chain_capped_total {self.chain_capped}",
+        ]
+        for name, hist in (("rrbot_decision_latency_microseconds", self.decision_latency),
+                           ("rrbot_intercept_latency_microseconds", self.intercept_latency)):
+            out += [f"# HELP {name} Handler latency in microseconds.", f"# TYPE {name} histogram"]
+            cumulative = 0
+            for idx, bound in enumerate(hist.bounds):
+                cumulative += hist.counts[idx]
+                out.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            out.append(f'{name}_bucket{{le="+Inf"}} {hist.count}')
+            out.append(f"{name}_sum {hist.total:.3f}")
+            out.append(f"{name}_count {hist.count}")
+        return "\n".join(out) + "\n"
+
+
+class PrometheusTextfileExporter:
+    """定期把指标写入 Prometheus textfile：在事件循环中生成文本，由插件的写入线程原子替换文件"""
+
+    def __init__(self, metrics: PluginMetrics, path: Path, writer: PersistenceWriter, interval: float = 60.0):
+        self.metrics = metrics
+        self.path = path
+        self.writer = writer
+        self.interval = max(5.0, float(interval))
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_started(self):
+        if self._task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.export()
+
+    async def export(self):
+        text = self.metrics.render_prometheus()
+        self.writer.schedule("prometheus", "写入 Prometheus 指标文件", atomic_write_text, self.path, text)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self.export()
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from astrbot.api import logger
+
+from .counter_store import CounterStore
+
+# (类型, ID) -> (最新值, 变更时间)；值为 None 表示删除
+CounterBatch = Dict[Tuple[str, str], Tuple[Optional[int], float]]
+# 类型 -> ID -> (计数, 最后更新时间)
+CounterSnapshot = Dict[str, Dict[str, Tuple[int, float]]]
+
+
+def atomic_write_text(path: Path, text: str):
+    """先写入同目录临时文件再原子替换，避免进程中断时留下半截文件"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def atomic_write_json(path: Path, data: Any, indent: Optional[int] = 2):
+    """以原子替换的方式写入 JSON 文件"""
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=indent))
+
+
+class PersistenceWriter:
+    """专用的单线程写入器，事件循环上的持久化操作都交给它执行
+
+    所有写入按提交顺序在同一个后台线程中串行执行，事件循环线程不做磁盘 I/O。
+    带 key 的写入（如整文件快照、保存配置）在尚未执行前会被同 key 的新写入替换，
+    连续多次变更只落盘最新状态。
+    """
+
+    def __init__(self, name: str = "rrbot-writer"):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        # key -> (待执行的写入, 描述)；key 被执行时才从表中取出
+        self._queued: Dict[str, Tuple[Callable[[], Any], str]] = {}
+        self._keyed_futures: Dict[str, Future] = {}
+        self.failures = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        return self._executor
+
+    def schedule(self, key: Optional[str], label: str, fn: Callable[..., Any], *args: Any) -> Future:
+        """提交一次写入但不等待结果，失败时记录日志"""
+        job = (lambda: fn(*args)) if args else fn
+        if key is None:
+            return self._executor.submit(self._run_logged, job, label)
+        with self._lock:
+            if key in self._queued:
+                self._queued[key] = (job, label)
+                return self._keyed_futures[key]
+            self._queued[key] = (job, label)
+            future = self._executor.submit(self._run_keyed, key)
+            self._keyed_futures[key] = future
+            return future
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """在写入线程中执行并等待结果，异常原样抛出"""
+        return await asyncio.wrap_future(self._executor.submit(fn, *args))
+
+    def _run_keyed(self, key: str):
+        with self._lock:
+            job, label = self._queued.pop(key)
+            self._keyed_futures.pop(key, None)
+        self._run_logged(job, label)
+
+    def _run_logged(self, job: Callable[[], Any], label: str):
+        try:
+            job()
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"[RandomReply] {label}失败: {e}")
+
+    async def drain(self):
+        """等待此前提交的全部写入完成"""
+        await asyncio.wrap_future(self._executor.submit(lambda: None))
+
+    async def close(self):
+        """落盘全部待写内容并停止写入线程"""
+        await self.drain()
+        self._executor.shutdown(wait=False)
+
+
+class WriteBehindBuffer(ABC):
+    """计数变更的后写（write-behind）缓冲
+
+    消息路径上只在内存中合并变更；后台任务按时间或数量阈值把合并后的
+    变更交给子类的 _write_batch 在线程池中写入，事件循环不做磁盘 I/O。
+    记录的是变更后的绝对值及变更时间，重复写入是幂等的。
+    executor 为 None 时使用事件循环的默认线程池。
+    """
+
+    executor: Optional[Executor] = None
+
+    def __init__(self, flush_interval: float = 30.0, flush_threshold: int = 100):
+        self.flush_interval = max(1.0, float(flush_interval))
+        self.flush_threshold = max(1, int(flush_threshold))
+
+        self._pending: CounterBatch = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._closed = False
+
+    def record(self, kind: str, key: str, value: Optional[int]):
+        """记录一次计数变更（仅内存操作）"""
+        self._pending[(kind, key)] = (value, time.time())
+        if self._task is None and not self._closed:
+            self._start()
+        if len(self._pending) >= self.flush_threshold and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _start(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"[RandomReply] 写入拦截计数失败: {e}")
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def flush(self):
+        """把待写变更交给后台线程写入"""
+        async with self._get_lock():
+            if self._pending:
+                batch = self._pending
+                self._pending = {}
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self.executor, self._write_batch, batch)
+            await self._after_flush_locked()
+
+    @abstractmethod
+    def _write_batch(self, batch: CounterBatch):
+        """在线程池中写入一批变更"""
+
+    async def _after_flush_locked(self):
+        """flush 完成后的附加操作（持有锁）"""
+
+    def replay(self, counters: Dict[str, CounterStore]) -> int:
+        """启动时恢复未合并的变更，返回应用的条目数"""
+        return 0
+
+    async def close(self):
+        """停止后台任务并落盘全部变更"""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self.flush()
+
+
+class CounterJournal(WriteBehindBuffer):
+    """基于 JSON 文件的拦截计数后写日志
+
+    变更被追加到增量日志，日志过长时原子重写完整快照并清空日志。
+    """
+
+    def __init__(self, journal_path: Path, snapshot_paths: Dict[str, Path],
+                 snapshot_source: Callable[[], CounterSnapshot],
+                 flush_interval: float = 30.0, flush_threshold: int = 100,
+                 compact_threshold: int = 5000):
+        super().__init__(flush_interval, flush_threshold)
+        self.journal_path = journal_path
+        self.snapshot_paths = snapshot_paths
+        self._snapshot_source = snapshot_source
+        self.compact_threshold = max(self.flush_threshold, int(compact_threshold))
+        self._journal_entries = 0
+
+    def _write_batch(self, batch: CounterBatch):
+        lines = [json.dumps({"t": kind, "k": key, "v": value, "s": round(changed_at, 3)}, ensure_ascii=False)
+                 for (kind, key), (value, changed_at) in batch.items()]
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_entries += len(lines)
+
+    async def _after_flush_locked(self):
+        if self._journal_entries >= self.compact_threshold:
+            await self._compact_locked()
+
+    async def compact(self):
+        """立即写入完整快照并清空增量日志"""
+        async with self._get_lock():
+            await self._compact_locked()
+
+    async def _compact_locked(self):
+        # 快照在事件循环线程中复制，写盘放到线程池
+        snapshot = self._snapshot_source()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._write_snapshot, snapshot)
+        self._journal_entries = 0
+
+    def _write_snapshot(self, snapshot: CounterSnapshot):
+        # 每项保存为 [计数, 最后更新时间]，重启后衰减与按时间排序不受影响
+        for kind, path in self.snapshot_paths.items():
+            atomic_write_json(path, snapshot.get(kind, {}))
+        # 快照已包含日志中的全部变更
+        if self.journal_path.exists():
+            os.remove(self.journal_path)
+
+    def replay(self, counters: Dict[str, CounterStore]) -> int:
+        """把增量日志重放到已加载的快照上，按记录的变更时间恢复，返回应用的条目数"""
+        if not self.journal_path.exists():
+            return 0
+        applied = 0
+        try:
+            # 旧版本的日志没有变更时间，退回使用日志文件的修改时间
+            fallback_time = os.path.getmtime(self.journal_path)
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                        target = counters[entry["t"]]
+                        key = str(entry["k"])
+                        value = entry["v"]
+                        changed_at = float(entry.get("s", fallback_time))
+                    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                        # 崩溃时可能留下不完整的最后一行
+                        continue
+                    if value is None:
+                        target.pop(key, None)
+                    else:
+                        target.restore(key, int(value), changed_at)
+                    applied += 1
+        except (OSError, ValueError) as e:
+            logger.error(f"[RandomReply] 重放拦截计数日志失败: {e}")
+            return applied
+
+        # 重放完成后立即压缩，避免日志无限增长
+        self._write_snapshot(self._snapshot_source())
+        return applied
+
+    async def close(self):
+        await super().close()
+        await self.compact()
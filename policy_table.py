@@ -0,0 +1,183 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from astrbot.api import logger
+
+
+class Policy(NamedTuple):
+    """单个目标的回复策略；字段为 None 表示沿用下一级（用户 → 群 → 全局默认）"""
+
+    reply_probability: Optional[float]
+    max_interception_count: Optional[float]
+
+
+# 各类型的全局默认值与旧版顶层配置键
+_DEFAULTS = {
+    "user": (0.3, 5, "reply_probability", "max_interception_count"),
+    "group": (0.3, 8, "group_reply_probability", "max_group_interception_count"),
+}
+
+# 策略键：("user", 用户ID, None) / ("group", 群号, None) / ("pair", 群号, 用户ID)
+PolicyKey = Tuple[str, str, Optional[str]]
+
+
+def parse_probability(value: Any) -> float:
+    """解析回复概率并限制在 0-1 之间"""
+    return max(0.0, min(1.0, float(value)))
+
+
+def parse_max_interception_count(value: Any) -> float:
+    """解析最大拦截次数，0 或负数表示禁用保底机制（返回 float('inf')），否则保持整数"""
+    count = int(value)
+    return float("inf") if count <= 0 else count
+
+
+def parse_target(text: str) -> PolicyKey:
+    """解析策略目标：user:<QQ号>、group:<群号> 或 group:<群号>/user:<QQ号>"""
+    parts = [part.strip() for part in text.strip().split("/")]
+    parsed: Dict[str, str] = {}
+    for part in parts:
+        kind, sep, target_id = part.partition(":")
+        kind = kind.strip().lower()
+        target_id = target_id.strip()
+        if not sep or kind not in ("user", "group") or not target_id or kind in parsed:
+            raise ValueError(f"无法识别的目标 '{text}'")
+        parsed[kind] = target_id
+    if len(parsed) == 2:
+        return "pair", parsed["group"], parsed["user"]
+    kind, target_id = next(iter(parsed.items()))
+    return kind, target_id, None
+
+
+def format_target(key: PolicyKey) -> str:
+    kind, first, second = key
+    if kind == "pair":
+        return f"group:{first}/user:{second}"
+    return f"{kind}:{first}"
+
+
+def parse_override(line: str) -> Tuple[PolicyKey, Policy]:
+    """解析一条覆盖规则：<目标>=<回复概率>[,<最大拦截次数>]，两项均可留空表示沿用"""
+    target, sep, values = line.partition("=")
+    if not sep:
+        raise ValueError(f"缺少 '=': '{line}'")
+    key = parse_target(target)
+    probability_text, _, max_text = values.partition(",")
+    probability = parse_probability(probability_text) if probability_text.strip() else None
+    max_count = parse_max_interception_count(max_text) if max_text.strip() else None
+    if probability is None and max_count is None:
+        raise ValueError(f"未设置任何策略: '{line}'")
+    return key, Policy(probability, max_count)
+
+
+def format_override(key: PolicyKey, policy: Policy) -> str:
+    probability = "" if policy.reply_probability is None else f"{policy.reply_probability:g}"
+    if policy.max_interception_count is None:
+        return f"{format_target(key)}={probability}"
+    max_count = 0 if policy.max_interception_count == float("inf") else int(policy.max_interception_count)
+    return f"{format_target(key)}={probability},{max_count}"
+
+
+def _format_max(max_count: float) -> str:
+    return "禁用" if max_count == float("inf") else f"{max_count:g}"
+
+
+class PolicyTable:
+    """编译后的回复策略表
+
+    全局默认值与 policy_settings.overrides 中的覆盖规则在构建时一次性解析为不可变记录，
+    每条消息最多做三次字典查找（群+用户 → 用户 → 群），其余字段回退到全局默认。
+    只有配置节被替换或通过命令修改规则时才重新编译。
+    """
+
+    __slots__ = ("defaults", "users", "groups", "pairs", "overrides", "errors", "_sections")
+
+    def __init__(self, defaults: Dict[str, Tuple[float, float]], overrides: Dict[PolicyKey, Policy],
+                 errors: List[str], sections: Tuple[Any, ...]):
+        self.defaults = defaults
+        self.overrides = overrides
+        self.users = {key[1]: policy for key, policy in overrides.items() if key[0] == "user"}
+        self.groups = {key[1]: policy for key, policy in overrides.items() if key[0] == "group"}
+        self.pairs = {(key[1], key[2]): policy for key, policy in overrides.items() if key[0] == "pair"}
+        self.errors = errors
+        self._sections = sections
+
+    @staticmethod
+    def _sections_of(config: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (config.get("user_settings"), config.get("group_settings"), config.get("policy_settings"))
+
+    @classmethod
+    def build(cls, config: Dict[str, Any]) -> "PolicyTable":
+        """从配置编译策略表，非法值记录警告并回退默认值"""
+        errors: List[str] = []
+        defaults: Dict[str, Tuple[float, float]] = {}
+        for kind, (default_probability, default_max, legacy_probability, legacy_max) in _DEFAULTS.items():
+            section = config.get(f"{kind}_settings")
+            section = section if isinstance(section, dict) else {}
+            value = section.get("reply_probability", config.get(legacy_probability, default_probability))
+            try:
+                probability = parse_probability(value)
+            except (TypeError, ValueError):
+                errors.append(f"{kind} reply_probability 配置值 '{value}' 非法，使用默认值 {default_probability}")
+                probability = default_probability
+            value = section.get("max_interception_count", config.get(legacy_max, default_max))
+            try:
+                max_count = parse_max_interception_count(value)
+            except (TypeError, ValueError):
+                errors.append(f"max_interception_count 配置值 '{value}' 非法，使用默认值 {default_max}")
+                max_count = default_max
+            defaults[kind] = (probability, max_count)
+
+        overrides: Dict[PolicyKey, Policy] = {}
+        policy_section = config.get("policy_settings")
+        raw_overrides = policy_section.get("overrides", []) if isinstance(policy_section, dict) else []
+        for line in raw_overrides if isinstance(raw_overrides, list) else []:
+            try:
+                key, policy = parse_override(str(line))
+            except ValueError as e:
+                errors.append(f"忽略非法的策略覆盖规则: {e}")
+                continue
+            overrides[key] = policy
+
+        for message in errors:
+            logger.warning(message)
+        return cls(defaults, overrides, errors, cls._sections_of(config))
+
+    def is_stale(self, config: Dict[str, Any]) -> bool:
+        """配置节对象被整体替换（如后台重载配置）时视为过期"""
+        return any(a is not b for a, b in zip(self._sections_of(config), self._sections))
+
+    def lookup(self, kind: str, user_id: str, group_id: Optional[str]) -> Tuple[float, float]:
+        """返回 (回复概率, 最大拦截次数)，按 群+用户 → 用户 → 群 → 全局默认 的顺序取值"""
+        probability, max_count = self.defaults[kind]
+        if not self.overrides:
+            return probability, max_count
+        chain = (
+            self.pairs.get((group_id, user_id)) if group_id and self.pairs else None,
+            self.users.get(user_id),
+            self.groups.get(group_id) if group_id else None,
+        )
+        resolved_probability = resolved_max = None
+        for policy in chain:
+            if policy is None:
+                continue
+            if resolved_probability is None:
+                resolved_probability = policy.reply_probability
+            if resolved_max is None:
+                resolved_max = policy.max_interception_count
+        return (probability if resolved_probability is None else resolved_probability,
+                max_count if resolved_max is None else resolved_max)
+
+    def render_text(self) -> str:
+        """生成 /rrbot policy 的文本"""
+        user_probability, user_max = self.defaults["user"]
+        group_probability, group_max = self.defaults["group"]
+        lines = [
+            "回复策略（群+用户 → 用户 → 群 → 全局默认）：",
+            f"全局默认 - 用户：概率 {user_probability:g}，保底 {_format_max(user_max)}；"
+            f"群聊：概率 {group_probability:g}，保底 {_format_max(group_max)}",
+        ]
+        if not self.overrides:
+            lines.append("暂无覆盖规则。")
+        for key, policy in sorted(self.overrides.items(), key=lambda item: format_target(item[0])):
+            lines.append(f"- {format_override(key, policy)}")
+        return "\n".join(lines)
@@ -0,0 +1,124 @@
+import cProfile
+import functools
+import io
+import pstats
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+# 内存快照中单独统计的模块：计数器与黑名单相关的数据结构
+STRUCTURE_MODULES = ("counter_store.py", "blacklist_index.py", "rate_tracker.py", "echo_detector.py",
+                     "behavior_detector.py", "reply_chain.py", "member_cache.py",
+                     "llm_budget.py")
+
+
+class PluginProfiler:
+    """按需开启的插件性能分析
+
+    作为上下文管理器包裹被分析的处理函数：进入时启用 cProfile，退出时关闭；
+    多个协程交错执行时按嵌套深度计数，最后一个退出时才关闭。
+    未开启分析时插件不持有该对象，处理函数只多一次 None 判断。
+    注意协程在 await 期间让出的事件循环工作也会计入统计。
+    """
+
+    def __init__(self, memory: bool = False, frames: int = 10):
+        self.profile = cProfile.Profile()
+        self.memory = memory
+        self.started_at = time.time()
+        self.entries = 0
+        self._depth = 0
+        self._owns_tracemalloc = False
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self._owns_tracemalloc = True
+            self._baseline = tracemalloc.take_snapshot()
+
+    def __enter__(self):
+        self.entries += 1
+        if self._depth == 0:
+            try:
+                self.profile.enable()
+            except ValueError:
+                # 同一线程已有其他分析器在运行
+                pass
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0:
+            self.profile.disable()
+        return False
+
+    def stop(self, plugin_dir: Path, structure_sizes: Dict[str, int], top: int = 30) -> str:
+        """结束分析，返回包含调用统计与内存分配的报告文本"""
+        self.profile.disable()
+        self._depth = 0
+        duration = time.time() - self.started_at
+        stream = io.StringIO()
+        stream.write(f"分析时长 {duration:.1f} 秒，进入被分析的处理函数 {self.entries} 次\n\n")
+        stream.write("== 调用统计（按累计耗时） ==\n")
+        try:
+            stats = pstats.Stats(self.profile, stream=stream)
+        except TypeError:
+            # 分析期间没有任何被分析的调用
+            stream.write("（无调用记录）\n")
+        else:
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+
+        stream.write("\n== 数据结构估算大小 ==\n")
+        for name, size in structure_sizes.items():
+            stream.write(f"{name}: {size / 1024:.1f} KB\n")
+
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+            self._write_memory_section(stream, snapshot, plugin_dir, top)
+        return stream.getvalue()
+
+    def _write_memory_section(self, stream: io.StringIO, snapshot: tracemalloc.Snapshot,
+                              plugin_dir: Path, top: int):
+        plugin_filter = tracemalloc.Filter(True, str(plugin_dir / "*"))
+        snapshot = snapshot.filter_traces([plugin_filter])
+        stream.write("\n== 插件内存分配（当前存活，按行） ==\n")
+        _write_statistics(stream, snapshot.statistics("lineno")[:top])
+
+        structures = snapshot.filter_traces(
+            [tracemalloc.Filter(True, str(plugin_dir / name)) for name in STRUCTURE_MODULES])
+        stream.write("\n== 计数器与黑名单结构的内存分配 ==\n")
+        _write_statistics(stream, structures.statistics("filename"))
+
+        if self._baseline is not None:
+            baseline = self._baseline.filter_traces([plugin_filter])
+            stream.write("\n== 分析期间的内存增长（按行） ==\n")
+            _write_statistics(stream, snapshot.compare_to(baseline, "lineno")[:top])
+
+    def dump(self, path: Path):
+        """写出 pstats 二进制文件，可用 snakeviz 等工具查看（在写入线程中调用）"""
+        self.profile.dump_stats(str(path))
+
+
+def _write_statistics(stream: io.StringIO, statistics: Sequence):
+    if not statistics:
+        stream.write("（无）\n")
+    for stat in statistics:
+        stream.write(f"{stat}\n")
+
+
+def profiled(func):
+    """包装异步的 LLM 工具：插件开启分析时在 PluginProfiler 中执行"""
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        profiler = self._profiler
+        if profiler is None:
+            return await func(self, *args, **kwargs)
+        with profiler:
+            return await func(self, *args, **kwargs)
+
+    return wrapper
+
@@ -0,0 +1,56 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class _RateState:
+    """单个目标的速率状态：指数衰减的速率估计与上次更新时间"""
+
+    __slots__ = ("rate", "last")
+
+    def __init__(self, rate: float, last: float):
+        self.rate = rate
+        self.last = last
+
+
+class RateTracker:
+    """按目标统计消息速率的指数衰减估计器
+
+    每个目标只保存两个浮点数，相当于时间常数为 window 秒的平滑滑动窗口：
+    稳定以 r 条/秒发送时估计值收敛到 r。目标数量超过上限时按最近最少使用淘汰。
+    """
+
+    def __init__(self, window: float = 60.0, max_entries: int = 4096):
+        self.window = max(1.0, float(window))
+        self.max_entries = max(1, int(max_entries))
+        self._states: "OrderedDict[str, _RateState]" = OrderedDict()
+
+    def observe(self, key: str, now: Optional[float] = None) -> float:
+        """记录一条消息并返回该目标当前的速率（条/秒）"""
+        if now is None:
+            now = time.monotonic()
+        state = self._states.get(key)
+        if state is None:
+            state = _RateState(1.0 / self.window, now)
+            self._states[key] = state
+            if len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+            return state.rate
+        elapsed = now - state.last
+        if elapsed > 0:
+            state.rate *= math.exp(-elapsed / self.window)
+        state.rate += 1.0 / self.window
+        state.last = now
+        self._states.move_to_end(key)
+        return state.rate
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+def scale_probability(probability: float, rate: float, threshold: float) -> float:
+    """速率超过阈值时按 阈值/速率 的比例降低回复概率"""
+    if threshold <= 0 or rate <= threshold:
+        return probability
+    return probability * threshold / rate
@@ -0,0 +1,104 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Sequence, Tuple
+
+import astrbot.api.message_components as Comp
+
+# 回复引用组件通常位于消息链开头，只检查前几个组件
+_REPLY_SCAN = 3
+
+
+def find_reply_id(chain: Optional[Sequence[Any]]) -> Optional[str]:
+    """从消息链中取出被回复（引用）消息的ID，没有引用时返回 None"""
+    if not chain:
+        return None
+    for component in chain[:_REPLY_SCAN]:
+        if isinstance(component, Comp.Reply):
+            reply_id = getattr(component, "id", None)
+            return str(reply_id) if reply_id not in (None, "") else None
+    return None
+
+
+class _Turn:
+    """某个群中最近一条消息的发送者与深度"""
+
+    __slots__ = ("sender_id", "depth", "time", "listed", "replied")
+
+    def __init__(self, sender_id: str, depth: int, now: float, listed: bool):
+        self.sender_id = sender_id
+        self.depth = depth
+        self.time = now
+        self.listed = listed
+        self.replied = False
+
+
+class ReplyChainTracker:
+    """按群跟踪对话链深度，用于识别机器人之间你来我往的长对话
+
+    深度有两个来源：
+    - 回复/引用：引用一条已知消息时深度为其深度加一，引用未知消息（已过期或插件启动前）时为 1；
+    - 黑名单发送者交替发言：上一条消息也来自黑名单发送者且在 window 秒内，并且换了发送者
+      （或者插件回复了上一条），深度为上一条加一。非黑名单发送者的消息会打断交替。
+    消息ID -> 深度的映射按插入顺序保存，超过 ttl 的条目从头部淘汰，条目数超过 max_entries
+    时淘汰最早的条目；每条消息只做常数次字典操作。
+    """
+
+    def __init__(self, max_entries: int = 8192, ttl: float = 600.0, window: float = 60.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = max(1.0, float(ttl))
+        self.window = max(0.0, float(window))
+        # (群号, 消息ID) -> (深度, 记录时间)
+        self._depths: "OrderedDict[Tuple[str, str], Tuple[int, float]]" = OrderedDict()
+        # 群号 -> 最近一条消息；与深度映射共用容量上限
+        self._last: "OrderedDict[str, _Turn]" = OrderedDict()
+
+    def observe(self, group_id: str, message_id: Optional[str], sender_id: str, listed: bool,
+                reply_to: Optional[str] = None, now: Optional[float] = None) -> int:
+        """记录一条群消息并返回它的对话深度（0 表示不在对话链中）"""
+        if now is None:
+            now = time.monotonic()
+        self._expire(now)
+
+        depth = 0
+        if reply_to:
+            parent = self._depths.get((group_id, reply_to))
+            depth = parent[0] + 1 if parent is not None else 1
+
+        last = self._last.get(group_id)
+        if (listed and last is not None and last.listed and now - last.time <= self.window
+                and (last.sender_id != sender_id or last.replied)):
+            depth = max(depth, last.depth + 1)
+
+        self._last[group_id] = _Turn(sender_id, depth, now, listed)
+        self._last.move_to_end(group_id)
+        if len(self._last) > self.max_entries:
+            self._last.popitem(last=False)
+
+        if message_id:
+            key = (group_id, message_id)
+            # 重复投递的消息先删除再插入，保持映射按记录时间排列
+            self._depths.pop(key, None)
+            self._depths[key] = (depth, now)
+            if len(self._depths) > self.max_entries:
+                self._depths.popitem(last=False)
+        return depth
+
+    def mark_replied(self, group_id: str, sender_id: str):
+        """插件确实回复了该群中 sender_id 的最近一条消息时调用，同一发送者接着发言也计为对话的下一跳
+
+        期间已有其他人发言时，最近一条消息不再是被回复的那条，不做标记。
+        """
+        last = self._last.get(group_id)
+        if last is not None and last.sender_id == sender_id:
+            last.replied = True
+
+    def _expire(self, now: float):
+        depths = self._depths
+        while depths:
+            _, recorded = next(iter(depths.values()))
+            if now - recorded <= self.ttl:
+                break
+            depths.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._depths)
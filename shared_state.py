@@ -0,0 +1,395 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from astrbot.api import logger
+
+from .counter_store import CounterStore
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_counters (
+    kind TEXT NOT NULL,
+    target_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (kind, target_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_shared_counters_updated ON shared_counters (updated_at);
+CREATE TABLE IF NOT EXISTS shared_counter_messages (
+    kind TEXT NOT NULL,
+    target_id TEXT NOT NULL,
+    message_key TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (kind, target_id, message_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_shared_counter_messages_seen ON shared_counter_messages (seen_at);
+CREATE TABLE IF NOT EXISTS shared_members (
+    target_type TEXT NOT NULL,
+    target_id TEXT NOT NULL,
+    added_by TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (target_type, target_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS shared_member_removals (
+    target_type TEXT NOT NULL,
+    target_id TEXT NOT NULL,
+    removed_at REAL NOT NULL,
+    PRIMARY KEY (target_type, target_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS shared_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO shared_meta (key, value) VALUES ('members_version', 0);
+CREATE TABLE IF NOT EXISTS reply_leases (
+    lease_key TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_reply_leases_expires ON reply_leases (expires_at);
+"""
+
+# 拉取变更时向前多取的时间（秒），容忍各实例写入时间戳的先后交错
+_PULL_OVERLAP = 5.0
+
+# 已处理消息的保留时间（秒）：落后的实例在此时间内推送同一条消息不会重复计数
+_MESSAGE_RETENTION = 600.0
+# 共享计数中表示“已删除”的值，其他实例拉取后删除本地计数
+_TOMBSTONE = -1
+
+
+class PendingCounter:
+    """某个目标在两次同步之间的本地计数变更
+
+    计数按消息累加：多个实例收到同一条消息时各自记录同一个消息键，
+    共享文件只为第一次出现的消息键加一。
+    """
+
+    __slots__ = ("reset", "deleted", "messages", "seen")
+
+    def __init__(self):
+        # 先把共享计数清零（放行）再累加 messages
+        self.reset = False
+        # 目标已移出黑名单；之后没有新的拦截时共享计数标记为删除
+        self.deleted = False
+        # 重置之后被拦截的消息键
+        self.messages: List[str] = []
+        # 已处理但不计数的消息键（放行的消息以及重置之前的拦截）
+        self.seen: List[str] = []
+
+    def clear(self, message_key: Optional[str], deleted: bool):
+        self.seen.extend(self.messages)
+        if message_key is not None:
+            self.seen.append(message_key)
+        self.messages = []
+        self.reset = True
+        self.deleted = deleted
+
+    def merge_older(self, older: "PendingCounter"):
+        """同步失败时把更早的变更合并到本对象之前"""
+        self.seen[:0] = older.seen
+        if self.reset:
+            self.seen[:0] = older.messages
+        else:
+            self.reset, self.deleted = older.reset, older.deleted
+            self.messages[:0] = older.messages
+
+
+# (类型, ID) -> 本地计数变更
+CounterDelta = Dict[Tuple[str, str], PendingCounter]
+# (类型, ID) -> True 添加 / False 移除
+MemberChanges = Dict[Tuple[str, str], bool]
+# 启动时本地已有的动态黑名单：(类型, ID)
+MemberOffers = Set[Tuple[str, str]]
+
+
+class SharedStateStore:
+    """多个 AstrBot 实例共享的 SQLite 状态文件
+
+    保存共享的拦截计数与动态黑名单。计数按消息键去重后原子累加：
+    每条消息无论被多少个实例拦截都只计一次；删除以墓碑值记录，保留一段时间供其他实例拉取。
+    从共享黑名单移除的目标记录在 shared_member_removals 中，离线的实例重新上线时
+    不会把已被其他实例移除的目标重新加入。
+    各实例之间通过 SQLite 的文件锁串行化写入，适用于同一主机上的共享路径。
+    """
+
+    def __init__(self, db_path: Path, instance_id: str, busy_timeout: float = 5.0):
+        self.db_path = db_path
+        self.instance_id = instance_id
+        self._lock = threading.Lock()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), timeout=busy_timeout,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def sync(self, deltas: CounterDelta, members: MemberChanges, offered: MemberOffers, since: float,
+             members_version: int) -> Tuple[List[Tuple[str, str, int]], Optional[Tuple[FrozenSet[str], FrozenSet[str]]], int, float]:
+        """在单个事务中推送本地变更并拉取其他实例的变更
+
+        members 是运行期的黑名单变更，按原样推送；offered 是启动时本地已有的动态黑名单，
+        只加入共享文件中没有移除记录的目标，已被其他实例移除的目标随拉取结果从本地删除。
+        返回 (since 之后更新的计数（-1 表示已删除）, 变化后的共享黑名单或 None, 黑名单版本, 本次同步时间)。
+        """
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE 事务：一开始就取得写锁，保证读改写的原子性
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for (kind, key), pending in deltas.items():
+                    self._push_counter(kind, key, pending, now)
+                self._conn.execute(
+                    "DELETE FROM shared_counter_messages WHERE seen_at < ?", (now - _MESSAGE_RETENTION,))
+                self._conn.execute(
+                    "DELETE FROM shared_counters WHERE count = ? AND updated_at < ?",
+                    (_TOMBSTONE, now - _MESSAGE_RETENTION))
+                if members or offered:
+                    for (target_type, target_id), added in members.items():
+                        if added:
+                            self._conn.execute(
+                                "INSERT OR IGNORE INTO shared_members (target_type, target_id, added_by, added_at) "
+                                "VALUES (?, ?, ?, ?)", (target_type, target_id, self.instance_id, now))
+                            self._conn.execute(
+                                "DELETE FROM shared_member_removals WHERE target_type = ? AND target_id = ?",
+                                (target_type, target_id))
+                        else:
+                            self._conn.execute(
+                                "DELETE FROM shared_members WHERE target_type = ? AND target_id = ?",
+                                (target_type, target_id))
+                            self._conn.execute(
+                                "INSERT OR REPLACE INTO shared_member_removals (target_type, target_id, removed_at) "
+                                "VALUES (?, ?, ?)", (target_type, target_id, now))
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO shared_members (target_type, target_id, added_by, added_at) "
+                        "SELECT ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM shared_member_removals "
+                        "WHERE target_type = ? AND target_id = ?)",
+                        ((target_type, target_id, self.instance_id, now, target_type, target_id)
+                         for target_type, target_id in offered))
+                    self._conn.execute(
+                        "UPDATE shared_meta SET value = value + 1 WHERE key = 'members_version'")
+
+                self._conn.execute("DELETE FROM reply_leases WHERE expires_at < ?", (now,))
+                rows = [
+                    (kind, key, int(count)) for kind, key, count in self._conn.execute(
+                        "SELECT kind, target_id, count FROM shared_counters WHERE updated_at >= ?",
+                        (since - _PULL_OVERLAP if since > 0 else 0.0,))
+                ]
+                version = int(self._conn.execute(
+                    "SELECT value FROM shared_meta WHERE key = 'members_version'").fetchone()[0])
+                shared_members = None
+                if version != members_version:
+                    users, groups = set(), set()
+                    for target_type, target_id in self._conn.execute(
+                            "SELECT target_type, target_id FROM shared_members"):
+                        (groups if target_type == "group" else users).add(target_id)
+                    shared_members = (frozenset(users), frozenset(groups))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return rows, shared_members, version, now
+
+    def _push_counter(self, kind: str, key: str, pending: PendingCounter, now: float):
+        """写入一个目标的变更：已见过的消息键不再计数，推送的目标总会刷新更新时间以便本次拉取"""
+        if pending.seen:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO shared_counter_messages (kind, target_id, message_key, seen_at) "
+                "VALUES (?, ?, ?, ?)", ((kind, key, message_key, now) for message_key in pending.seen))
+        added = 0
+        for message_key in pending.messages:
+            added += self._conn.execute(
+                "INSERT OR IGNORE INTO shared_counter_messages (kind, target_id, message_key, seen_at) "
+                "VALUES (?, ?, ?, ?)", (kind, key, message_key, now)).rowcount
+        if pending.deleted and not pending.messages:
+            update, value = "count = excluded.count", _TOMBSTONE
+        elif pending.reset:
+            update, value = "count = excluded.count", added
+        else:
+            update, value = "count = MAX(count, 0) + excluded.count", added
+        self._conn.execute(
+            "INSERT INTO shared_counters (kind, target_id, count, updated_at) VALUES (?, ?, ?, ?) "
+            f"ON CONFLICT (kind, target_id) DO UPDATE SET {update}, updated_at = excluded.updated_at",
+            (kind, key, value, now))
+
+    def try_acquire_lease(self, lease_key: str, ttl: float) -> bool:
+        """尝试取得某条消息的回复租约；租约未过期且属于其他实例时返回 False"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT holder, expires_at FROM reply_leases WHERE lease_key = ?", (lease_key,)).fetchone()
+                if row is None or row[1] < now:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO reply_leases (lease_key, holder, expires_at) VALUES (?, ?, ?)",
+                        (lease_key, self.instance_id, now + ttl))
+                    won = True
+                else:
+                    won = row[0] == self.instance_id
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return won
+
+
+class SharedStateSync:
+    """共享状态的本地缓存与后台同步
+
+    消息路径只修改本地计数并在内存中记录被拦截或放行的消息键；后台任务每隔
+    sync_interval 秒在线程池中把变更推送到共享文件，同时拉取其他实例的变更合并回本地，
+    因此各实例看到的计数与黑名单最多落后一个同步周期。合并回本地的计数通过
+    on_counter_changed 交给本实例的持久化，其他实例删除的计数也会在本地删除。
+    """
+
+    def __init__(self, store: SharedStateStore, counters: Dict[str, CounterStore],
+                 on_members_changed: Callable[[FrozenSet[str], FrozenSet[str]], None],
+                 on_counter_changed: Callable[[str, str, Optional[int]], None],
+                 sync_interval: float = 2.0, executor: Optional[ThreadPoolExecutor] = None):
+        self.store = store
+        self.counters = counters
+        self.on_members_changed = on_members_changed
+        self.on_counter_changed = on_counter_changed
+        self.sync_interval = max(0.2, float(sync_interval))
+        # 共享文件的读写可能等待其他实例释放文件锁，使用独立线程，不占用插件的持久化写入线程
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="rrbot-shared")
+        self.last_sync = 0.0
+        self.sync_failures = 0
+        self._deltas: CounterDelta = {}
+        self._members: MemberChanges = {}
+        self._offered: MemberOffers = set()
+        self._members_version = -1
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._closed = False
+
+    def _pending(self, kind: str, key: str) -> PendingCounter:
+        pending = self._deltas.get((kind, key))
+        if pending is None:
+            pending = self._deltas[(kind, key)] = PendingCounter()
+        return pending
+
+    def increment(self, kind: str, key: str, message_key: str):
+        """记录一次拦截（计数加一），同一消息键在所有实例中只计一次"""
+        self._pending(kind, key).messages.append(message_key)
+
+    def reset(self, kind: str, key: str, message_key: str):
+        """记录一次放行（计数清零）"""
+        self._pending(kind, key).clear(message_key, deleted=False)
+
+    def delete(self, kind: str, key: str):
+        """目标移出黑名单，删除共享计数"""
+        self._pending(kind, key).clear(None, deleted=True)
+
+    def member_changed(self, target_type: str, target_ids: List[str], added: bool):
+        """记录运行期的动态黑名单变更，下次同步时推送给其他实例"""
+        for target_id in target_ids:
+            self._members[(target_type, target_id)] = added
+
+    def offer_members(self, target_type: str, target_ids: List[str]):
+        """登记启动时本地已有的动态黑名单：已被其他实例移除的目标不会重新加入共享"""
+        self._offered.update((target_type, target_id) for target_id in target_ids)
+
+    async def elect(self, lease_key: str, ttl: float) -> bool:
+        """回复选举：只有取得租约的实例回复；共享文件不可用时视为当选，按原逻辑回复"""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.store.try_acquire_lease, lease_key, ttl)
+        except Exception as e:
+            logger.error(f"[RandomReply] 回复选举失败，按本实例决策处理: {e}")
+            return True
+
+    def ensure_started(self):
+        if self._task is not None or self._closed:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        # 启动后立即同步一次，加载其他实例已有的状态
+        while not self._closed:
+            await self.sync()
+            await asyncio.sleep(self.sync_interval)
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def sync(self):
+        """推送本地增量并合并其他实例的变更"""
+        async with self._get_lock():
+            deltas, members, offered = self._take_pending()
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.store.sync, deltas, members, offered, self.last_sync, self._members_version)
+            except Exception as e:
+                self.sync_failures += 1
+                self._restore_pending(deltas, members, offered)
+                logger.error(f"[RandomReply] 同步共享状态失败: {e}")
+                return
+            self._apply(*result)
+
+    def _take_pending(self) -> Tuple[CounterDelta, MemberChanges, MemberOffers]:
+        deltas, self._deltas = self._deltas, {}
+        members, self._members = self._members, {}
+        offered, self._offered = self._offered, set()
+        return deltas, members, offered
+
+    def _restore_pending(self, deltas: CounterDelta, members: MemberChanges, offered: MemberOffers):
+        """同步失败时把未推送的变更放回，新变更优先"""
+        for key, pending in deltas.items():
+            newer = self._deltas.get(key)
+            if newer is None:
+                self._deltas[key] = pending
+            else:
+                newer.merge_older(pending)
+        for key, added in members.items():
+            self._members.setdefault(key, added)
+        self._offered.update(offered)
+
+    def _apply(self, rows: List[Tuple[str, str, int]],
+               shared_members: Optional[Tuple[FrozenSet[str], FrozenSet[str]]], version: int, now: float):
+        for kind, key, count in rows:
+            store = self.counters.get(kind)
+            # 同步期间本地又有新变更的目标暂不覆盖：这些变更会在下次同步推送，届时一并拉取合并结果
+            if store is None or (kind, key) in self._deltas:
+                continue
+            if count == _TOMBSTONE:
+                if key in store:
+                    store.pop(key)
+                    self.on_counter_changed(kind, key, None)
+            elif store.get(key) != count:
+                store[key] = count
+                self.on_counter_changed(kind, key, count)
+        self.last_sync = now
+        self._members_version = version
+        if shared_members is not None:
+            self.on_members_changed(*shared_members)
+
+    async def close(self):
+        """停止后台任务并推送剩余变更"""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self.sync()
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.store.close)
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,198 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+from .persistence import CounterBatch, CounterSnapshot, WriteBehindBuffer
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blacklist_users (
+    user_id TEXT PRIMARY KEY,
+    added_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS blacklist_groups (
+    group_id TEXT PRIMARY KEY,
+    added_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS counters (
+    kind TEXT NOT NULL,
+    target_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (kind, target_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    action TEXT NOT NULL,
+    target_type TEXT NOT NULL,
+    target_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_audit_target ON audit_log (target_type, target_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+_MEMBER_TABLES = {
+    "user": ("blacklist_users", "user_id"),
+    "group": ("blacklist_groups", "group_id"),
+}
+
+
+class SqliteStorage:
+    """基于标准库 sqlite3（WAL 模式）的持久化后端
+
+    每次添加、移除或计数变更只写入一行，不再整文件重写。
+    连接可被事件循环线程与线程池共享，内部以锁串行化访问。
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def is_migrated(self) -> bool:
+        """是否已完成从 JSON 文件的一次性迁移"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        return row is not None
+
+    def import_state(self, users: Iterable[str], groups: Iterable[str], counters: CounterSnapshot):
+        """在单个事务中导入完整状态并标记迁移完成"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO blacklist_users (user_id, added_at) VALUES (?, ?)",
+                    ((str(uid), now) for uid in users))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO blacklist_groups (group_id, added_at) VALUES (?, ?)",
+                    ((str(gid), now) for gid in groups))
+                for kind, values in counters.items():
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO counters (kind, target_id, count, updated_at) VALUES (?, ?, ?, ?)",
+                        ((kind, str(key), int(count), float(updated_at))
+                         for key, (count, updated_at) in values.items()))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)", (str(now),))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def load_blacklist(self) -> Tuple[Set[str], Set[str]]:
+        """读取动态黑名单"""
+        with self._lock:
+            users = {row[0] for row in self._conn.execute("SELECT user_id FROM blacklist_users")}
+            groups = {row[0] for row in self._conn.execute("SELECT group_id FROM blacklist_groups")}
+        return users, groups
+
+    def load_counters(self) -> CounterSnapshot:
+        """读取全部拦截计数及其最后更新时间"""
+        counters: CounterSnapshot = {"user": {}, "group": {}}
+        with self._lock:
+            for kind, target_id, count, updated_at in self._conn.execute(
+                    "SELECT kind, target_id, count, updated_at FROM counters"):
+                counters.setdefault(kind, {})[target_id] = (int(count), float(updated_at))
+        return counters
+
+    def add_member(self, target_type: str, target_id: str):
+        """添加一条动态黑名单记录"""
+        self.add_members(target_type, [target_id])
+
+    def add_members(self, target_type: str, target_ids: List[str]):
+        """在单个事务中批量添加动态黑名单记录"""
+        table, column = _MEMBER_TABLES[target_type]
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO {table} ({column}, added_at) VALUES (?, ?)",
+                    ((target_id, now) for target_id in target_ids))
+                self._conn.executemany(
+                    "INSERT INTO audit_log (ts, action, target_type, target_id) VALUES (?, 'add', ?, ?)",
+                    ((now, target_type, target_id) for target_id in target_ids))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def remove_member(self, target_type: str, target_id: str):
+        """移除一条动态黑名单记录及其计数"""
+        table, column = _MEMBER_TABLES[target_type]
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (target_id,))
+                self._conn.execute(
+                    "DELETE FROM counters WHERE kind = ? AND target_id = ?", (target_type, target_id))
+                self._audit(now, "remove", target_type, target_id)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _audit(self, ts: float, action: str, target_type: str, target_id: str):
+        self._conn.execute(
+            "INSERT INTO audit_log (ts, action, target_type, target_id) VALUES (?, ?, ?, ?)",
+            (ts, action, target_type, target_id))
+
+    def apply_counter_changes(self, batch: CounterBatch):
+        """在单个事务中写入一批计数变更及其变更时间，值为 None 表示删除"""
+        upserts = [(kind, key, value, changed_at)
+                   for (kind, key), (value, changed_at) in batch.items() if value is not None]
+        deletes = [(kind, key) for (kind, key), (value, _) in batch.items() if value is None]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if upserts:
+                    self._conn.executemany(
+                        "INSERT INTO counters (kind, target_id, count, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (kind, target_id) DO UPDATE SET count = excluded.count, "
+                        "updated_at = excluded.updated_at",
+                        upserts)
+                if deletes:
+                    self._conn.executemany(
+                        "DELETE FROM counters WHERE kind = ? AND target_id = ?", deletes)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def recent_audit(self, limit: int = 20, target_type: Optional[str] = None,
+                     target_id: Optional[str] = None) -> List[Tuple[float, str, str, str]]:
+        """读取最近的黑名单变更记录，可只查询某个目标（使用 idx_audit_target 索引）"""
+        with self._lock:
+            if target_id is not None:
+                return list(self._conn.execute(
+                    "SELECT ts, action, target_type, target_id FROM audit_log "
+                    "WHERE target_type = ? AND target_id = ? ORDER BY id DESC LIMIT ?",
+                    (target_type or "user", target_id, int(limit))))
+            return list(self._conn.execute(
+                "SELECT ts, action, target_type, target_id FROM audit_log ORDER BY id DESC LIMIT ?",
+                (int(limit),)))
+
+
+class SqliteCounterWriter(WriteBehindBuffer):
+    """把合并后的拦截计数变更批量 upsert 到 SQLite"""
+
+    def __init__(self, storage: SqliteStorage, flush_interval: float = 30.0, flush_threshold: int = 100):
+        super().__init__(flush_interval, flush_threshold)
+        self.storage = storage
+
+    def _write_batch(self, batch: CounterBatch):
+        self.storage.apply_counter_changes(batch)